@@ -1,24 +1,46 @@
 import os
+import sys
 import json
+import shutil
 from TTS.api import TTS
 
+# In the image server/ sits next to this script (/app); in the repo it is one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import artifacts
+
 def initialize_tts_models():
-    """Initialize and cache TTS models for Nigerian voices"""
+    """Initialize and cache TTS models for Nigerian voices, and export fast-start artifacts"""
     print("Initializing Nigerian TTS models...")
-    
+
     # Load voice configuration
-    with open('/app/voices/voice_config.json', 'r') as f:
+    with open(os.getenv('TTS_VOICE_CONFIG', '/app/voices/voice_config.json'), 'r') as f:
         config = json.load(f)
-    
+
+    # Each model once, plus the fallback model voices without a config entry use
+    models = {}
     for voice_name, voice_config in config['voices'].items():
+        models.setdefault(voice_config['model'], voice_name)
+    models.setdefault(os.getenv('COQUI_MODEL_NAME', 'tts_models/en/vctk/vits'), 'default')
+
+    for model_name, voice_name in models.items():
         try:
             print(f"Loading model for {voice_name}...")
-            tts = TTS(model_name=voice_config['model'])
+            tts = TTS(model_name=model_name)
             print(f"Voice {voice_name} model loaded successfully")
+            # Memory-mappable weights the server loads instead of going through the model manager
+            dest = artifacts.export(tts, model_name)
+            # The server falls back to the model manager when no artifacts exist; never ship ones that do not load
+            try:
+                artifacts.verify(tts, model_name)
+                print(f"Exported artifacts to {dest}")
+            except Exception as e:
+                shutil.rmtree(dest, ignore_errors=True)
+                print(f"Discarded artifacts for {voice_name}, they do not load back: {e}")
         except Exception as e:
             print(f"Failed to load {voice_name}: {e}")
-    
+
     print("TTS model initialization complete")
 
 if __name__ == "__main__":
-    initialize_tts_models()
\ No newline at end of file
+    initialize_tts_models()
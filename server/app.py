@@ -1,13 +1,17 @@
 # server/app.py
-import os, io, time, hashlib, json
-from typing import Optional
+import os, io, time, uuid, hashlib, json, threading, logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from fastapi import FastAPI, HTTPException, Header, Response, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+from . import encoders, jobs, warm
 from .engine import TTSEngine
 from .security import sha256_hex, supabase_select_api_key, check_and_consume_rate
 
@@ -19,8 +23,51 @@ ALLOWED_ORIGINS = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "*").split(",
 S3_BUCKET = os.getenv("S3_BUCKET_TTS", "")
 AWS_REGION = os.getenv("AWS_REGION", "af-south-1")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# background: warm up after startup, gate /ready; blocking: finish before serving; off: lazy load
+TTS_WARMUP = os.getenv("TTS_WARMUP", "background").lower()
 
-app = FastAPI(title="ODIADEV TTS API", version="0.1.0")
+log = logging.getLogger("odiadev.tts")
+
+_engine = TTSEngine()
+_warmup_state = {"status": "pending", "ms": None, "error": None}
+
+def _warmup():
+    _warmup_state["status"] = "warming"
+    try:
+        _warmup_state["ms"] = _engine.warmup()
+        _warmup_state["status"] = "ready"
+        log.info("TTS warm-up finished in %s ms", _warmup_state["ms"])
+    except Exception as e:
+        # Stay alive (liveness) but never report ready
+        _warmup_state["status"] = "failed"
+        _warmup_state["error"] = str(e)
+        log.exception("TTS warm-up failed")
+
+# Cache warms started from /admin/cache/warm, oldest first: run id -> state and, once done, report
+_warm_runs = {}
+WARM_RUNS_KEPT = 20
+
+def _warm_run(run_id: str, *args):
+    try:
+        _warm_runs[run_id].update(status="done", report=warm.warm(_engine, *args))
+    except Exception as e:
+        _warm_runs[run_id].update(status="failed", error=str(e))
+        log.exception("cache warm %s failed", run_id)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if TTS_WARMUP == "blocking":
+        await run_in_threadpool(_warmup)
+    elif TTS_WARMUP != "off":
+        threading.Thread(target=_warmup, name="tts-warmup", daemon=True).start()
+    else:
+        _warmup_state["status"] = "ready"
+    _jobs.start()
+    yield
+    _jobs.close()
+    _engine.flush()
+
+app = FastAPI(title="ODIADEV TTS API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,13 +77,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-_engine = TTSEngine()
-
 # ---------- Models
 class TTSRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=2000)
     voice: Optional[str] = "naija_female"
-    format: str = Field(default="mp3", pattern="^(mp3|wav|ogg)$")
+    # mp3|wav|ogg, a low-bandwidth profile (opus_16k, opus_24k, aac_32k, mp3_48k),
+    # or auto to pick one from `network` / the Save-Data, ECT, Downlink and RTT client hints
+    format: str = Field(default="mp3", pattern=f"^({'|'.join(encoders.FORMATS)}|auto)$")
+    network: Optional[str] = Field(default=None, pattern="^(2g|3g|4g)$")
+    speed: float = Field(default=1.0, ge=0.5, le=1.5)
+    # Send audio sentence by sentence as it renders (lower time-to-first-audio)
+    stream: bool = False
+
+class JobRequest(BaseModel):
+    # Long-form text, rendered in the background; see server/jobs.py
+    text: str = Field(..., min_length=1, max_length=jobs.TTS_JOB_MAX_CHARS)
+    voice: Optional[str] = "naija_female"
+    format: str = Field(default="mp3", pattern=f"^({'|'.join(encoders.FORMATS)})$")
     speed: float = Field(default=1.0, ge=0.5, le=1.5)
 
 class IssueKeyRequest(BaseModel):
@@ -46,6 +103,22 @@ class IssueKeyRequest(BaseModel):
     # optionally pre-create with plaintext provided
     plaintext_key: Optional[str] = None
 
+class CacheWarmRequest(BaseModel):
+    phrases: List[str] = []
+    # Also render the TTS_WARM_PHRASES files (the odiadev_*_script.txt prompts)
+    scripts: bool = False
+    voices: List[str] = []  # default: every configured voice
+    speeds: List[float] = [1.0]
+    formats: List[str] = ["mp3"]
+    concurrency: int = Field(default=warm.TTS_WARM_CONCURRENCY, ge=1, le=16)
+
+class CachePurgeRequest(BaseModel):
+    # Every given field must match; at least one is required
+    voice: Optional[str] = None
+    model: Optional[str] = None
+    engine: Optional[str] = None
+    format: Optional[str] = None
+
 # ---------- Helpers
 def _s3_client():
     # Works with IAM role or static keys
@@ -68,27 +141,58 @@ def _put_usage_async(api_key_id: str, char_count: int, ms: int, cache_hit: bool)
             pass
     threading.Thread(target=_send, daemon=True).start()
 
-def _upload_to_s3(file_path: str, cache_key: str) -> Optional[str]:
-    if not S3_BUCKET:
-        return None
-    key = f"tts-cache/{cache_key}"
-    s3 = _s3_client()
+def _put_s3(data: bytes, key: str, content_type: str) -> bool:
+    try:
+        _s3_client().put_object(Bucket=S3_BUCKET, Key=key, Body=data, ContentType=content_type)
+        return True
+    except (BotoCoreError, ClientError):
+        return False
+
+def _presign(key: str) -> Optional[str]:
     try:
-        s3.upload_file(file_path, S3_BUCKET, key, ExtraArgs={"ContentType": "audio/mpeg"})
-        url = s3.generate_presigned_url(
+        return _s3_client().generate_presigned_url(
             "get_object",
             Params={"Bucket": S3_BUCKET, "Key": key},
             ExpiresIn=3600,
         )
-        return url
     except (BotoCoreError, ClientError):
         return None
 
+def _upload_to_s3(data: bytes, cache_key: str, content_type: str) -> Optional[str]:
+    if not S3_BUCKET:
+        return None
+    key = f"tts-cache/{cache_key}"
+    return _presign(key) if _put_s3(data, key, content_type) else None
+
+def _job_done(job: dict, path: str) -> Optional[dict]:
+    # Runs on the job thread once the audio is written: report usage, mirror to S3 if configured.
+    # Only the key is kept; links expire long before the job does, so status requests presign afresh
+    _put_usage_async(job["owner"], job["chars"], int((time.time() - job["created"]) * 1000), False)
+    if not S3_BUCKET:
+        return None
+    key = f"tts-cache/jobs/{job['id']}.{job['fmt']}"
+    with open(path, "rb") as f:
+        stored = _put_s3(f.read(), key, encoders.media_type(job["fmt"]))
+    return {"s3_key": key} if stored else None
+
+_jobs = jobs.JobManager(_engine, on_done=_job_done)
+
 # ---------- Routes
 @app.get("/health")
 def health():
+    # Liveness only: answers as soon as the process is up, warm or not
     return {"status": "ok", "engine": os.getenv("TTS_ENGINE", "coqui")}
 
+@app.get("/ready")
+def ready():
+    # Readiness: green only once the model is loaded and warmed
+    body = {"ready": _warmup_state["status"] == "ready", **_warmup_state}
+    return JSONResponse(content=body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+def metrics():
+    return {"engine": _engine.stats(), "encoders": encoders.stats()}
+
 def _auth(x_api_key: Optional[str] = Header(default=None)):
     if not x_api_key:
         raise HTTPException(status_code=401, detail="Missing API key")
@@ -98,32 +202,92 @@ def _auth(x_api_key: Optional[str] = Header(default=None)):
     check_and_consume_rate(rec["id"], rec["rate_limit_per_min"])
     return rec
 
+def _stream_tts(req: TTSRequest, fmt: str, api_key_id: str):
+    start = time.time()
+    yield from _engine.synth_stream(req.text, req.voice, req.speed, fmt)
+    _put_usage_async(api_key_id, len(req.text), int((time.time() - start) * 1000), False)
+
 @app.post("/v1/tts")
-def tts(req: TTSRequest, auth=Depends(_auth)):
-    path, cache_hit, ms = _engine.synth(req.text, req.voice, req.speed, req.format)
-    cache_key = hashlib.sha1(open(path, "rb").read()).hexdigest() + f".{req.format}"
-    s3_url = _upload_to_s3(path, cache_key)
+def tts(req: TTSRequest, auth=Depends(_auth),
+        save_data: Optional[str] = Header(default=None), ect: Optional[str] = Header(default=None),
+        downlink: Optional[str] = Header(default=None), rtt: Optional[str] = Header(default=None)):
+    fmt = req.format
+    # Responses to format=auto depend on the hints; ask for them and let caches vary on them
+    headers = {"X-Audio-Format": fmt}
+    if fmt == "auto":
+        fmt = encoders.auto_format(network=req.network, save_data=save_data, ect=ect, downlink=downlink, rtt=rtt)
+        hints = ", ".join(encoders.CLIENT_HINTS)
+        headers = {"X-Audio-Format": fmt, "Accept-CH": hints, "Vary": hints}
+    media = encoders.media_type(fmt)
+
+    if req.stream:
+        return StreamingResponse(_stream_tts(req, fmt, auth["id"]), media_type=media, headers=headers)
+
+    data, cache_hit, ms, duration_ms = _engine.synth(req.text, req.voice, req.speed, fmt)
+    cache_key = hashlib.sha1(data).hexdigest() + f".{fmt}"
+    s3_url = _upload_to_s3(data, cache_key, media)
     _put_usage_async(auth["id"], len(req.text), ms, cache_hit)
 
     # Prefer returning a signed URL if S3 configured
     if s3_url:
-        return {"url": s3_url, "format": req.format, "cache_hit": cache_hit, "ms": ms}
+        return {"url": s3_url, "format": fmt, "cache_hit": cache_hit, "ms": ms,
+                "bytes": len(data), "duration_ms": duration_ms}
 
-    # Else, stream the bytes
-    data = open(path, "rb").read()
-    media = "audio/mpeg" if req.format == "mp3" else "audio/wav"
-    return Response(content=data, media_type=media)
+    # Else, return the bytes
+    headers.update({"X-Audio-Bytes": str(len(data)), "X-Cache-Hit": str(cache_hit).lower()})
+    if duration_ms is not None:
+        headers["X-Audio-Duration-Ms"] = str(duration_ms)
+    return Response(content=data, media_type=media, headers=headers)
+
+@app.post("/v1/tts/jobs", status_code=202)
+def create_job(req: JobRequest, auth=Depends(_auth)):
+    try:
+        job = _jobs.submit(req.text, req.voice, req.speed, req.format, owner=auth["id"])
+    except OverflowError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {**job, "status_url": f"/v1/tts/jobs/{job['id']}", "events_url": f"/v1/tts/jobs/{job['id']}/events"}
+
+def _job(job_id: str, auth: dict) -> dict:
+    # Other keys' jobs are indistinguishable from missing ones
+    job = _jobs.get(job_id, owner=auth["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/v1/tts/jobs/{job_id}")
+def job_status(job_id: str, auth=Depends(_auth)):
+    job = _job(job_id, auth)
+    out = jobs.public(job)
+    if job["status"] == "done":
+        out["audio_url"] = (job["s3_key"] and _presign(job["s3_key"])) or f"/v1/tts/jobs/{job_id}/audio"
+    return out
+
+@app.get("/v1/tts/jobs/{job_id}/events")
+def job_events(job_id: str, auth=Depends(_auth)):
+    _job(job_id, auth)
+    return StreamingResponse(jobs.events(_jobs, job_id, owner=auth["id"]), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/v1/tts/jobs/{job_id}/audio")
+def job_audio(job_id: str, auth=Depends(_auth)):
+    job = _job(job_id, auth)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return FileResponse(job["path"], media_type=encoders.media_type(job["fmt"]),
+                        headers={"X-Audio-Duration-Ms": str(job["duration_ms"])})
 
 @app.get("/v1/voices")
 def voices():
-    # Static logical voices; at Stage 2 we'll map to real embeddings/models
-    return {"voices": ["naija_female", "naija_male"], "engine": os.getenv("TTS_ENGINE", "coqui")}
+    # Logical voices from voice_config.json, each mapped to a model (+ speaker) by the engine
+    return {"voices": _engine.voices(), "engine": os.getenv("TTS_ENGINE", "coqui")}
 
-@app.post("/admin/keys/issue")
-def issue_key(payload: IssueKeyRequest, x_admin_token: Optional[str] = Header(default=None)):
+def _admin(x_admin_token: Optional[str] = Header(default=None)):
     if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
         raise HTTPException(status_code=403, detail="Forbidden")
 
+@app.post("/admin/keys/issue")
+def issue_key(payload: IssueKeyRequest, _=Depends(_admin)):
+
     import secrets, requests
     plaintext = payload.plaintext_key or secrets.token_urlsafe(32)
     key_hash = sha256_hex(plaintext)
@@ -145,3 +309,42 @@ def issue_key(payload: IssueKeyRequest, x_admin_token: Optional[str] = Header(de
     if r.status_code not in (200, 201):
         raise HTTPException(status_code=500, detail=f"Supabase insert failed: {r.text}")
     return {"plaintext_key": plaintext, "record": r.json()[0]}
+
+@app.post("/admin/cache/warm", status_code=202)
+def warm_cache(payload: CacheWarmRequest, _=Depends(_admin)):
+    phrases = list(dict.fromkeys(p.strip() for p in payload.phrases if p.strip()))
+    if payload.scripts:
+        phrases = list(dict.fromkeys(phrases + warm.load_phrases()))
+    voices = payload.voices or _engine.voices()
+    if not phrases:
+        raise HTTPException(status_code=400, detail="Give phrases or set scripts")
+    if any(f not in encoders.FORMATS for f in payload.formats) or any(not 0.5 <= s <= 1.5 for s in payload.speeds):
+        raise HTTPException(status_code=400, detail=f"formats must be in {list(encoders.FORMATS)}; speeds in 0.5-1.5")
+    total = len(phrases) * len(voices) * len(payload.speeds) * len(payload.formats)
+    if total > warm.TTS_WARM_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{total} variants requested; the limit is {warm.TTS_WARM_MAX_ITEMS}")
+    # Thousands of renders take minutes: run them in the background and report through the status URL
+    run_id = uuid.uuid4().hex
+    finished = [k for k, v in _warm_runs.items() if v["status"] != "running"]
+    for old in finished[:max(0, len(_warm_runs) + 1 - WARM_RUNS_KEPT)]:
+        del _warm_runs[old]
+    _warm_runs[run_id] = {"id": run_id, "status": "running", "total": total, "started": time.time()}
+    threading.Thread(target=_warm_run, args=(run_id, phrases, voices, payload.speeds, payload.formats, payload.concurrency),
+                     name="tts-cache-warm", daemon=True).start()
+    return {**_warm_runs[run_id], "status_url": f"/admin/cache/warm/{run_id}"}
+
+@app.get("/admin/cache/warm/{run_id}")
+def warm_status(run_id: str, _=Depends(_admin)):
+    run = _warm_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Warm run not found")
+    return run
+
+@app.post("/admin/cache/purge")
+def purge_cache(payload: CachePurgeRequest, _=Depends(_admin)):
+    filters = {k: v for k, v in payload.model_dump().items() if v is not None}
+    if "format" in filters:
+        filters["fmt"] = filters.pop("format")
+    if not filters:
+        raise HTTPException(status_code=400, detail="Give at least one of voice, model, engine, format")
+    return {"purged": _engine.cache.purge(**filters), "filters": filters}
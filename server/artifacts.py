@@ -0,0 +1,186 @@
+# server/artifacts.py
+"""
+Pre-exported model artifacts for fast cold starts. At image build time
+(scripts/init_tts.py) each Coqui model is loaded once and written to
+<TTS_ARTIFACT_DIR>/<model>/ as safetensors weights plus its configs, with
+every file the configs point at (speaker maps, normalization stats) copied
+alongside. At run time the model is rebuilt from the config and the
+weights are memory-mapped straight into it instead of going through the
+model manager and torch.load: pages are read on first touch, and
+processes on one host share them through the page cache.
+"""
+import os, re, json, shutil, logging, tempfile
+from typing import Dict, Optional
+
+log = logging.getLogger("odiadev.tts.artifacts")
+
+# 'on' loads from artifacts when present (falling back to Coqui's loader); 'off' always uses Coqui's
+TTS_ARTIFACTS = os.getenv("TTS_ARTIFACTS", "on").lower()
+# Defaults to <TTS_MODEL_DIR>/artifacts
+TTS_ARTIFACT_DIR = os.getenv("TTS_ARTIFACT_DIR") or None
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+# Config paths are stored relative to the artifact directory behind this prefix
+ASSET_PREFIX = "@artifact/"
+PARTS = ("tts", "vocoder")
+
+def artifact_dir(model_name: str, root: Optional[str] = None) -> str:
+    root = root or TTS_ARTIFACT_DIR or os.path.join(os.getenv("TTS_MODEL_DIR") or tempfile.gettempdir(), "artifacts")
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "--", model_name))
+
+def available(model_name: str, root: Optional[str] = None) -> bool:
+    return os.path.isfile(os.path.join(artifact_dir(model_name, root), MANIFEST))
+
+def _relocate(value, assets_dir: str, copied: Dict[str, str]):
+    # Copies every file a config refers to into assets/ and points the config there
+    if isinstance(value, dict):
+        return {k: _relocate(v, assets_dir, copied) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_relocate(v, assets_dir, copied) for v in value]
+    if isinstance(value, str) and os.path.isabs(value) and os.path.isfile(value):
+        if value not in copied:
+            name = f"{len(copied)}-{os.path.basename(value)}"
+            shutil.copy2(value, os.path.join(assets_dir, name))
+            copied[value] = f"{ASSET_PREFIX}assets/{name}"
+        return copied[value]
+    return value
+
+def _dedupe(state: dict):
+    # safetensors refuses tensors sharing storage (tied weights); keep one and record the rest as aliases
+    tensors, aliases, seen = {}, {}, {}
+    for key, tensor in state.items():
+        if not hasattr(tensor, "data_ptr"):
+            continue
+        ident = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape))
+        if tensor.numel() and ident in seen:
+            aliases[key] = seen[ident]
+            continue
+        seen[ident] = key
+        tensors[key] = tensor.detach().contiguous()
+    return tensors, aliases
+
+def export(tts, model_name: str, root: Optional[str] = None) -> str:
+    """
+    Writes a loaded Coqui TTS's acoustic model and vocoder (weights, configs
+    and referenced files) as an artifact directory, replacing any previous
+    one atomically. Returns the directory.
+    """
+    import TTS
+    from safetensors.torch import save_file
+    dest = artifact_dir(model_name, root)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, "assets"))
+    synth = tts.synthesizer
+    manifest = {"format": FORMAT_VERSION, "model": model_name, "coqui": getattr(TTS, "__version__", None), "parts": {}}
+    copied = {}
+    try:
+        for part in PARTS:
+            model, config = getattr(synth, f"{part}_model", None), getattr(synth, f"{part}_config", None)
+            if model is None or config is None:
+                continue
+            tensors, aliases = _dedupe(model.state_dict())
+            save_file(tensors, os.path.join(tmp, f"{part}.safetensors"))
+            with open(os.path.join(tmp, f"{part}_config.json"), "w", encoding="utf-8") as f:
+                json.dump(_relocate(config.to_dict(), os.path.join(tmp, "assets"), copied), f, indent=2)
+            # Tacotron's reduction factor lives in the checkpoint, not the config
+            r = getattr(getattr(model, "decoder", None), "r", None)
+            manifest["parts"][part] = {"aliases": aliases, "r": r if isinstance(r, int) else None}
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(dest, ignore_errors=True)
+        os.replace(tmp, dest)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    log.info("exported %s to %s", model_name, dest)
+    return dest
+
+def _config(path: str, part: str):
+    from TTS.config import load_config
+    with open(os.path.join(path, f"{part}_config.json"), "r", encoding="utf-8") as f:
+        text = f.read().replace(ASSET_PREFIX, json.dumps(path + os.sep)[1:-1])
+    # load_config only takes a path; resolve the asset prefix into a scratch copy
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        f.write(text)
+    try:
+        return load_config(f.name)
+    finally:
+        os.remove(f.name)
+
+def _weight_normed(keys) -> bool:
+    return any(k.endswith(("weight_g", "parametrizations.weight.original0")) for k in keys)
+
+def _match_layout(model, keys):
+    # Exports are taken after Coqui's load_checkpoint(eval=True), which reshapes some
+    # models for inference; replay whichever of those steps the exported keys show
+    keys = list(keys)
+    model.eval()
+    # Glow-TTS caches inverted flow weights (weight_inv) and drops weight norm inside its flows
+    if hasattr(model, "store_inverse") and any(k.endswith("weight_inv") for k in keys) \
+            and not any(k.endswith("weight_inv") for k in model.state_dict()):
+        model.store_inverse()
+    # GAN vocoders drop weight norm throughout
+    if hasattr(model, "remove_weight_norm") and _weight_normed(model.state_dict()) and not _weight_normed(keys):
+        model.remove_weight_norm()
+
+def _restore(model, path: str, part: str, meta: dict):
+    from safetensors.torch import load_file
+    # load_file maps the file; assign=True keeps those tensors instead of copying into fresh ones
+    state = load_file(os.path.join(path, f"{part}.safetensors"))
+    for alias, key in meta.get("aliases", {}).items():
+        state[alias] = state[key]
+    _match_layout(model, state.keys())
+    model.load_state_dict(state, assign=True)
+    if meta.get("r") and hasattr(getattr(model, "decoder", None), "set_r"):
+        model.decoder.set_r(meta["r"])
+    return model.eval()
+
+def verify(tts, model_name: str, root: Optional[str] = None):
+    """
+    Loads model_name back from its artifacts and checks every part has the
+    same weights (names and shapes) as the loaded Coqui TTS it came from.
+    Raises ValueError on a mismatch.
+    """
+    loaded = load(model_name, root).synthesizer
+    for part in PARTS:
+        source, restored = getattr(tts.synthesizer, f"{part}_model", None), getattr(loaded, f"{part}_model", None)
+        if source is None:
+            continue
+        want = {k: tuple(v.shape) for k, v in source.state_dict().items()}
+        got = {k: tuple(v.shape) for k, v in restored.state_dict().items()} if restored is not None else {}
+        if want != got:
+            diff = sorted(set(want.items()) ^ set(got.items()))[:5]
+            raise ValueError(f"{part} weights differ after the round trip, e.g. {diff}")
+
+def load(model_name: str, root: Optional[str] = None):
+    """
+    Rebuilds a Coqui TTS for model_name from its artifact directory without
+    the model manager or torch.load. Raises if the artifacts are missing or
+    do not fit the installed Coqui version.
+    """
+    from TTS.api import TTS as COQUI_TTS
+    from TTS.tts.models import setup_model as setup_tts_model
+    from TTS.utils.audio import AudioProcessor
+    from TTS.utils.synthesizer import Synthesizer
+    from TTS.vocoder.models import setup_model as setup_vocoder_model
+    path = artifact_dir(model_name, root)
+    with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION or manifest.get("model") != model_name:
+        raise ValueError(f"{path} holds {manifest.get('model')!r} in format {manifest.get('format')}")
+    parts = manifest["parts"]
+
+    synth = Synthesizer(use_cuda=False)
+    synth.tts_config = _config(path, "tts")
+    synth.tts_model = _restore(setup_tts_model(config=synth.tts_config), path, "tts", parts["tts"])
+    synth.output_sample_rate = synth.tts_config.audio["sample_rate"]
+    if "vocoder" in parts:
+        synth.vocoder_config = _config(path, "vocoder")
+        synth.vocoder_ap = AudioProcessor(verbose=False, **synth.vocoder_config.audio)
+        synth.vocoder_model = _restore(setup_vocoder_model(synth.vocoder_config), path, "vocoder", parts["vocoder"])
+        synth.output_sample_rate = synth.vocoder_config.audio["sample_rate"]
+    # No model name: TTS() skips the model manager's lookup and download
+    tts = COQUI_TTS(progress_bar=False)
+    tts.synthesizer = synth
+    return tts
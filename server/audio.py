@@ -0,0 +1,123 @@
+# server/audio.py
+import io, struct, wave
+from typing import List, Tuple
+
+import numpy as np
+
+def to_int16(pcm: np.ndarray) -> np.ndarray:
+    if pcm.dtype == np.int16:
+        return pcm
+    return (np.clip(pcm, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+def to_float32(pcm: np.ndarray) -> np.ndarray:
+    if pcm.dtype == np.int16:
+        return pcm.astype(np.float32) / 32768.0
+    return np.asarray(pcm, dtype=np.float32)
+
+def wav_stream_header(sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    # RIFF/data sizes unknown up front; 0xFFFFFFFF is what streaming players expect
+    byte_rate = sample_rate * channels * sample_width
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                    channels * sample_width, sample_width * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+def wav_bytes(pcm: np.ndarray, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(to_int16(pcm).tobytes())
+    return buf.getvalue()
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Returns (float32 mono pcm, sample_rate) for 16-bit PCM wav bytes.
+    """
+    with wave.open(io.BytesIO(data), "rb") as w:
+        sr, channels = w.getframerate(), w.getnchannels()
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return to_float32(pcm), sr
+
+def concat(pieces: List[np.ndarray], sample_rate: int, pause_ms: int) -> np.ndarray:
+    gap = np.zeros(int(sample_rate * pause_ms / 1000), dtype=np.float32)
+    out = []
+    for i, pcm in enumerate(pieces):
+        if i:
+            out.append(gap)
+        out.append(to_float32(pcm))
+    return np.concatenate(out) if out else gap[:0]
+
+def crossfade(a: np.ndarray, b: np.ndarray, sample_rate: int, fade_ms: float, gap_ms: float = 0) -> np.ndarray:
+    """
+    Joins a and b with gap_ms of silence between them. a's tail fades out
+    and b's head fades in over fade_ms on equal-power curves, overlapping
+    each other when there is no gap, so neither edge starts or stops
+    abruptly. With a gap the result is as long as a, the gap and b
+    together; without one the overlap shortens it by fade_ms.
+    """
+    a, b = to_float32(a), to_float32(b)
+    n = min(int(sample_rate * fade_ms / 1000), len(a), len(b))
+    t = np.linspace(0.0, np.pi / 2, n, dtype=np.float32)
+    tail, head = a[len(a) - n:] * np.cos(t), b[:n] * np.sin(t)
+    gap = np.zeros(int(sample_rate * gap_ms / 1000), dtype=np.float32)
+    middle = np.concatenate([tail, gap, head]) if len(gap) else tail + head
+    return np.concatenate([a[:len(a) - n], middle, b[n:]])
+
+def resample(pcm: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Band-limited (FFT) resampling of mono PCM; returns pcm unchanged when
+    the rates already match.
+    """
+    if not target_rate or target_rate == sample_rate or len(pcm) == 0:
+        return pcm
+    pcm = to_float32(pcm)
+    n_out = int(round(len(pcm) * target_rate / sample_rate))
+    spectrum = np.fft.rfft(pcm)
+    bins = n_out // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, n_out) * (n_out / len(pcm))).astype(np.float32)
+
+def _log_bands(pcm: np.ndarray, n_fft: int = 1024, hop: int = 256, bands: int = 40) -> np.ndarray:
+    # Log-energy in log-spaced bands per frame, floored 60 dB below the loudest band
+    pcm = to_float32(pcm)
+    if len(pcm) < n_fft:
+        pcm = np.pad(pcm, (0, n_fft - len(pcm)))
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, n_fft)[::hop] * np.hanning(n_fft)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    edges = np.unique(np.geomspace(1, power.shape[1], bands + 1).astype(int))[:-1]
+    logs = np.log10(np.add.reduceat(power, edges, axis=1) + 1e-12)
+    logs = np.clip(logs - (logs.max() - 6.0), 0.0, None)
+    # Spectral shape only: loudness differences between renders are not compared
+    return logs - logs.mean(axis=1, keepdims=True)
+
+def spectral_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Objective similarity of two renderings of the same text, up to 1 for
+    identical spectra (unrelated audio scores near or below 0): frame-wise
+    correlation of log band energies along the best time alignment (DTW),
+    so small duration differences are not penalized. Both inputs must
+    share a sample rate.
+    """
+    x, y = _log_bands(a), _log_bands(b)
+    nx, ny = np.linalg.norm(x, axis=1), np.linalg.norm(y, axis=1)
+    sim = (x @ y.T) / np.maximum(np.outer(nx, ny), 1e-12)
+    # Two flat (silent) frames match; silence against sound does not
+    sim[np.outer(nx == 0, ny == 0)] = 1.0
+    cost = 1.0 - sim
+    n, m = cost.shape
+    acc = np.full((n + 1, m + 1), np.inf)
+    steps = np.zeros((n + 1, m + 1))
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            prev = min((acc[i - 1, j - 1], i - 1, j - 1), (acc[i - 1, j], i - 1, j), (acc[i, j - 1], i, j - 1))
+            acc[i, j] = prev[0] + cost[i - 1, j - 1]
+            steps[i, j] = steps[prev[1], prev[2]] + 1
+    return float(1.0 - acc[n, m] / steps[n, m])
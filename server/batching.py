@@ -0,0 +1,101 @@
+# server/batching.py
+import time, queue, logging, threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+log = logging.getLogger("odiadev.tts.batching")
+
+class _Item:
+    __slots__ = ("text", "voice", "speed", "future")
+
+    def __init__(self, text: str, voice: Optional[str], speed: float):
+        self.text, self.voice, self.speed = text, voice, speed
+        self.future = Future()
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching in front of TTSEngine.render_batch. Requests that
+    arrive within window_ms of the first queued one are grouped by
+    (voice, speed, length bucket) and rendered as one padded batch of at most
+    max_batch items; each caller gets back only its own PCM. Up to
+    `concurrency` batches run at once (one per synthesis worker, or per
+    concurrent in-process inference).
+    """
+
+    def __init__(self, engine, window_ms: float = 15, max_batch: int = 8, bucket_chars: int = 64, concurrency: int = 1):
+        self._engine = engine
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.bucket_chars = max(1, bucket_chars)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = defaultdict(int)
+        self.concurrency = max(1, concurrency)
+        self._slots = threading.Semaphore(self.concurrency)
+        self._runner = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="tts-batch")
+        self._thread = threading.Thread(target=self._run, name="tts-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, voice: Optional[str], speed: float = 1.0) -> Future:
+        item = _Item(text, voice, speed)
+        self._queue.put(item)
+        return item.future
+
+    def render(self, text: str, voice: Optional[str], speed: float = 1.0) -> np.ndarray:
+        return self.submit(text, voice, speed).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = dict(self._batch_sizes)
+        batches = sum(sizes.values())
+        items = sum(size * n for size, n in sizes.items())
+        return {
+            "window_ms": self.window_s * 1000,
+            "max_batch": self.max_batch,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 3) if batches else None,
+            "batch_size_histogram": {str(k): v for k, v in sorted(sizes.items())},
+        }
+
+    def _collect(self) -> List[_Item]:
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(items) < self.max_batch * 4:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            groups = defaultdict(list)
+            for item in self._collect():
+                groups[(item.voice, item.speed, len(item.text) // self.bucket_chars)].append(item)
+            for (voice, speed, _), group in groups.items():
+                for i in range(0, len(group), self.max_batch):
+                    # Keep collecting only once a runner is free, so batches grow under load
+                    self._slots.acquire()
+                    self._runner.submit(self._run_batch, voice, speed, group[i:i + self.max_batch])
+
+    def _run_batch(self, voice: Optional[str], speed: float, batch: List[_Item]):
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+        try:
+            pcms = self._engine.render_batch([item.text for item in batch], voice, speed)
+        except Exception as e:
+            log.exception("batch synthesis failed")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        for item, pcm in zip(batch, pcms):
+            item.future.set_result(pcm)
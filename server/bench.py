@@ -0,0 +1,221 @@
+# server/bench.py
+"""
+Offline synthesis benchmark for TTSEngine (no HTTP server involved).
+
+    python -m server.bench --engine coqui --engine onnx --format mp3 --threads 1x4 --threads 2x2 -o bench.json
+    python -m server.bench --compare before.json after.json
+
+Every engine x voice x format x thread setting runs in its own process
+with a fresh cache directory. Each process reports its startup time,
+a cache-cold pass over the corpus (every prompt synthesized), a
+cache-warm pass (every prompt served from the cache), real-time factor,
+p50/p95 latency per prompt-length bucket and peak RSS. The report is
+sorted, rounded JSON, so runs on two commits can be diffed or compared
+with --compare. Requests are issued one at a time; throughput under
+concurrency is `python -m server.cpu`'s job.
+"""
+import os, sys, json, time, shutil, hashlib, logging, argparse, platform, resource, tempfile, subprocess
+from typing import Dict, List, Optional
+
+from .cpu import percentile
+from .warm import config_voices, load_phrases
+
+log = logging.getLogger("odiadev.tts.bench")
+
+# Prompt-length buckets (characters): short <= 80 < medium <= 300 < long
+BUCKETS = (("short", 80), ("medium", 300), ("long", None))
+DEFAULT_PER_BUCKET = 3
+# Children run from the repo root so relative paths (voice config, phrase globs) resolve as here
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Metrics --compare reports; lower is better for all of them
+COMPARED = ("startup_ms", "cold.rtf", "cold.p50_ms", "cold.p95_ms", "warm.p50_ms", "warm.p95_ms", "peak_rss_mb")
+
+def bucket(text: str) -> str:
+    for name, limit in BUCKETS:
+        if limit is None or len(text) <= limit:
+            return name
+
+def corpus(paths: List[str] = (), per_bucket: int = DEFAULT_PER_BUCKET) -> List[dict]:
+    """
+    A fixed corpus: the first per_bucket prompts of each length bucket from
+    the phrase files (TTS_WARM_PHRASES, i.e. the odiadev_*_script.txt
+    files, when none are given), in file order.
+    """
+    out = {name: [] for name, _ in BUCKETS}
+    for text in load_phrases(paths):
+        items = out[bucket(text)]
+        if len(items) < per_bucket:
+            items.append({"bucket": bucket(text), "text": text})
+    return [item for name, _ in BUCKETS for item in out[name]]
+
+def summarize(samples: List[dict]) -> dict:
+    """
+    samples: [{"ms", "audio_ms"}] -> latency percentiles and real-time factor
+    (synthesis time / audio duration; below 1 is faster than real time).
+    """
+    ms = [s["ms"] for s in samples]
+    audio_ms = sum(s["audio_ms"] or 0 for s in samples)
+    return {"n": len(samples), "p50_ms": percentile(ms, 0.5), "p95_ms": percentile(ms, 0.95),
+            "mean_ms": round(sum(ms) / len(ms), 1) if ms else None,
+            "audio_s": round(audio_ms / 1000, 2),
+            "rtf": round(sum(ms) / audio_ms, 4) if audio_ms else None}
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def run_config(items: List[dict], voice: Optional[str], fmt: str, warm_passes: int = 1) -> dict:
+    """
+    Benchmarks one engine configuration (taken from the environment) in
+    this process. The cache directory must start empty.
+    """
+    from .engine import TTSEngine
+    start = time.perf_counter()
+    engine = TTSEngine(workers=0)
+    # What a fresh server pays before it reports ready: model load plus one priming render
+    engine.warmup()
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    def one_pass():
+        samples = []
+        for item in items:
+            t0 = time.perf_counter()
+            _, hit, _, duration_ms = engine.synth(item["text"], voice, 1.0, fmt)
+            samples.append({"bucket": item["bucket"], "ms": (time.perf_counter() - t0) * 1000,
+                            "audio_ms": duration_ms, "hit": hit})
+        engine.flush()
+        return samples
+
+    cold = one_pass()
+    warm = [s for _ in range(max(1, warm_passes)) for s in one_pass()]
+    return {
+        "startup_ms": round(startup_ms, 1),
+        "sample_rate": engine.sample_rate,
+        "cold": dict(summarize(cold), hits=sum(s["hit"] for s in cold)),
+        "warm": dict(summarize(warm), hits=sum(s["hit"] for s in warm)),
+        "by_bucket": {name: {"cold": summarize([s for s in cold if s["bucket"] == name]),
+                             "warm": summarize([s for s in warm if s["bucket"] == name])}
+                      for name, _ in BUCKETS if any(s["bucket"] == name for s in cold)},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def config_id(config: dict) -> str:
+    return "/".join(str(config[k]) for k in ("engine", "voice", "format", "threads"))
+
+def _child(config: dict, items: List[dict], warm_passes: int, timeout_s: float) -> dict:
+    cache_dir = tempfile.mkdtemp(prefix="odiadev-bench-")
+    env = dict(os.environ, TTS_ENGINE=config["engine"], TTS_CACHE_DIR=cache_dir, TTS_WARMUP="off")
+    if config["threads"] != "auto":
+        concurrency, _, threads = config["threads"].partition("x")
+        env.update(TTS_SYNTH_CONCURRENCY=concurrency, TTS_INFER_THREADS=threads)
+    payload = json.dumps({"config": config, "items": items, "warm_passes": warm_passes})
+    try:
+        proc = subprocess.run([sys.executable, "-m", "server.bench", "--child"], input=payload, env=env,
+                              cwd=ROOT, capture_output=True, text=True, timeout=timeout_s)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout_s:.0f} s"}
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    # Coqui prints progress to stdout; the result is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run(engines: List[str], voices: List[Optional[str]], formats: List[str], threads: List[str],
+        items: List[dict], warm_passes: int = 1, timeout_s: float = 1800) -> dict:
+    results = {}
+    for engine in engines:
+        # Piper has one voice per model path; the voice names only apply to Coqui
+        for voice in (voices if engine != "piper" else [None]):
+            for fmt in formats:
+                for setting in threads:
+                    config = {"engine": engine, "voice": voice, "format": fmt, "threads": setting}
+                    log.info("benchmarking %s", config_id(config))
+                    results[config_id(config)] = dict(config=config, **_child(config, items, warm_passes, timeout_s))
+    return {
+        "meta": {"commit": _commit(), "python": platform.python_version(), "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "warm_passes": warm_passes,
+                 "corpus": {"sha1": hashlib.sha1(json.dumps(items).encode("utf-8")).hexdigest()[:12],
+                            "prompts": {name: sum(1 for i in items if i["bucket"] == name) for name, _ in BUCKETS},
+                            "chars": sum(len(i["text"]) for i in items)}},
+        "results": results,
+    }
+
+def _metric(result: dict, path: str):
+    for part in path.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+def compare(before: dict, after: dict) -> Dict[str, dict]:
+    """
+    Per configuration present in both reports: old and new value of each
+    COMPARED metric and the relative change (+ = slower/bigger).
+    """
+    out = {}
+    for cid in sorted(set(before["results"]) & set(after["results"])):
+        rows = {}
+        for path in COMPARED:
+            old, new = _metric(before["results"][cid], path), _metric(after["results"][cid], path)
+            if old is None or new is None:
+                continue
+            rows[path] = {"before": old, "after": new, "change": round((new - old) / old, 4) if old else None}
+        out[cid] = rows
+    if before["meta"]["corpus"]["sha1"] != after["meta"]["corpus"]["sha1"]:
+        log.warning("the two reports used different corpora; timings are not comparable")
+    return out
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="bench", description="Offline RTF / latency / memory benchmark for TTSEngine")
+    parser.add_argument("phrases", nargs="*", help="phrase files or globs (default: the odiadev_*_script.txt files)")
+    parser.add_argument("--engine", action="append", dest="engines", help="repeatable: coqui | onnx | piper (default: TTS_ENGINE)")
+    parser.add_argument("--voice", action="append", dest="voices", help="repeatable (default: every configured voice)")
+    parser.add_argument("--format", action="append", dest="formats", help="repeatable (default: wav)")
+    parser.add_argument("--threads", action="append", help="repeatable CONCURRENCYxTHREADS, e.g. 1x4 (default: auto)")
+    parser.add_argument("--per-bucket", type=int, default=DEFAULT_PER_BUCKET, help="prompts per length bucket")
+    parser.add_argument("--warm-passes", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds per configuration")
+    parser.add_argument("-o", "--output", help="write the report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two reports")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        job = json.loads(sys.stdin.read())
+        result = run_config(job["items"], job["config"]["voice"], job["config"]["format"], job["warm_passes"])
+        print(json.dumps(result))
+        return 0
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print(json.dumps(compare(*reports), indent=2, sort_keys=True))
+        return 0
+
+    items = corpus(args.phrases, args.per_bucket)
+    if not items:
+        parser.error("no phrases found")
+    bad = [t for t in args.threads or [] if t != "auto" and not all(p.isdigit() for p in t.partition("x")[::2])]
+    if bad:
+        parser.error(f"bad --threads value(s): {', '.join(bad)}")
+    report = run(args.engines or [os.getenv("TTS_ENGINE", "coqui").lower()], args.voices or config_voices(),
+                 args.formats or ["wav"], args.threads or ["auto"], items, args.warm_passes, args.timeout)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any("error" in r for r in report["results"].values()) else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,515 @@
+# server/cache.py
+import os, time, sqlite3, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+log = logging.getLogger("odiadev.tts.cache")
+
+INDEX_FILE = "index.sqlite3"
+# Subdirectories of the cache root that hold no entries (single-flight locks, phoneme memo, job output)
+RESERVED_DIRS = ("locks", "frontend", "jobs")
+# Metadata columns callers may attach to an entry and filter on
+META_FIELDS = ("engine", "model", "voice", "fmt", "duration_ms")
+# Index rows written per SQLite commit at most; fewer when the write queue drains first
+DB_BATCH = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    name        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    engine      TEXT,
+    model       TEXT,
+    voice       TEXT,
+    fmt         TEXT,
+    duration_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_voice ON entries(voice);
+CREATE INDEX IF NOT EXISTS entries_model ON entries(model);
+"""
+
+def _write_atomic(path: str, data: bytes):
+    # Readers must never see a half-written file as a cache hit
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _wav_duration_ms(path: str) -> Optional[int]:
+    import wave
+    try:
+        with wave.open(path, "rb") as w:
+            return int(w.getnframes() * 1000 / w.getframerate())
+    except Exception:
+        return None
+
+class DiskCache:
+    """
+    Size-bounded on-disk cache of synthesized audio. Entries are addressed by
+    a logical name ("fragments/<key>.wav", "<key>.mp3") and stored in
+    sharded subdirectories (<kind>/<k0k1>/<k2k3>/<key>.<ext>).
+
+    Lookups are answered from an in-memory index mirrored in SQLite
+    (index.sqlite3) along with per-entry metadata: size, duration, creation
+    and access time, hit count, engine, model, voice and format. A miss
+    costs neither a filesystem probe nor a query; get(shared=True) also asks
+    SQLite, for callers that must see what another process sharing the
+    directory just wrote. Otherwise the sweeper, and every eviction, first
+    reconciles with SQLite: other processes' new entries, their deletions
+    and their hits (hit counts are added up, not overwritten), so no process
+    evicts an entry that is hot elsewhere.
+    The index is rebuilt from the files on disk when the database is missing.
+
+    Writes happen behind the request on one writer thread (queued writes are
+    served from memory until they land, and land atomically; their index rows
+    are committed in batches when the queue drains); once the byte or
+    entry budget is exceeded, the least recently (lru) or least frequently
+    (lfu) used entries are evicted down to `low_water` of the budget. A
+    background sweeper re-checks the budget and persists access stats every
+    sweep_interval_s.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0, max_entries: int = 0, policy: str = "lru",
+                 sweep_interval_s: float = 60.0, low_water: float = 0.9, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.low_water = low_water
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # name -> {"size", "created", "last_access", "hits", *META_FIELDS}
+        self._index = {}
+        # name -> hits not yet added to SQLite
+        self._dirty = {}
+        # name -> (data, meta) queued on the writer but not yet on disk
+        self._pending = {}
+        # Index rows written to disk but not yet committed to SQLite
+        self._rows = []
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "evicted_bytes": 0}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-cache-writer")
+        self._closed = threading.Event()
+        self._db = None
+        self._db_lock = threading.Lock()
+        if not enabled:
+            return
+        os.makedirs(root, exist_ok=True)
+        self._open_index()
+        if sweep_interval_s > 0:
+            threading.Thread(target=self._sweep_loop, args=(sweep_interval_s,), name="tts-cache-sweeper", daemon=True).start()
+
+    # ---------- Layout
+    def _path(self, name: str) -> str:
+        kind, fn = os.path.split(name)
+        return os.path.join(self.root, kind, fn[:2], fn[2:4], fn)
+
+    # ---------- Index
+    def _open_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        fresh = not os.path.exists(path)
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        except sqlite3.DatabaseError:
+            log.warning("cache index %s is corrupt; rebuilding", path)
+            if self._db is not None:
+                self._db.close()
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            fresh = True
+        if fresh:
+            self.rebuild()
+        else:
+            self._load_index()
+
+    def _load_index(self):
+        cols = ("name", "size", "created", "last_access", "hits") + META_FIELDS
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT {', '.join(cols)} FROM entries").fetchall()
+        with self._lock:
+            self._index = {row[0]: dict(zip(cols[1:], row[1:])) for row in rows}
+            self._bytes = sum(e["size"] for e in self._index.values())
+
+    def rebuild(self) -> int:
+        """
+        Re-creates the index from the files on disk, moving any entry not at
+        its sharded location (e.g. from the old flat layout) into place.
+        Returns the number of entries indexed.
+        """
+        index, total = {}, 0
+        for dirpath, dirs, files in os.walk(self.root):
+            if dirpath == self.root:
+                dirs[:] = [d for d in dirs if d not in RESERVED_DIRS]
+            for fn in files:
+                path = os.path.join(dirpath, fn)
+                if fn.startswith(INDEX_FILE):
+                    continue
+                if fn.endswith(".tmp"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                parts = os.path.relpath(path, self.root).split(os.sep)
+                name = os.path.join("fragments", fn) if parts[0] == "fragments" else fn
+                target = self._path(name)
+                try:
+                    if path != target:
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(path, target)
+                    st = os.stat(target)
+                except OSError:
+                    continue
+                ext = fn.rsplit(".", 1)[-1]
+                index[name] = {
+                    "size": st.st_size, "created": st.st_mtime, "last_access": st.st_mtime, "hits": 0,
+                    "engine": None, "model": None, "voice": None, "fmt": ext,
+                    "duration_ms": _wav_duration_ms(target) if ext == "wav" else None,
+                }
+                total += st.st_size
+        with self._lock:
+            self._index, self._bytes = index, total
+            self._dirty.clear()
+        with self._db_lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.executemany(
+                f"INSERT INTO entries (name, size, created, last_access, hits, {', '.join(META_FIELDS)}) "
+                f"VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(META_FIELDS))})",
+                [self._row(name, e) for name, e in index.items()],
+            )
+            self._db.commit()
+        log.info("cache index rebuilt: %s entries, %s bytes", len(index), total)
+        return len(index)
+
+    @staticmethod
+    def _row(name: str, e: dict) -> tuple:
+        return (name, e["size"], e["created"], e["last_access"], e["hits"]) + tuple(e.get(f) for f in META_FIELDS)
+
+    def _commit_rows(self):
+        # One transaction for every index row written since the last commit. Rows leave
+        # self._rows under the database lock, so _sync always finds them in one place or the other
+        with self._db_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if rows:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO entries (name, size, created, last_access, hits, {', '.join(META_FIELDS)}) "
+                    f"VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(META_FIELDS))})",
+                    rows,
+                )
+                self._db.commit()
+
+    def _sync(self):
+        # Reconcile with other processes sharing the directory: their new entries, their
+        # deletions and their hits. Our own rows and hits go to SQLite first.
+        self._commit_rows()
+        self._persist_access()
+        cols = ("name", "size", "created", "last_access", "hits") + META_FIELDS
+        started = time.time()
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT {', '.join(cols)} FROM entries").fetchall()
+        with self._lock:
+            for row in rows:
+                entry = self._index.get(row[0])
+                if entry is None:
+                    self._index[row[0]] = dict(zip(cols[1:], row[1:]))
+                    self._bytes += row[1]
+                else:
+                    entry["last_access"] = max(entry["last_access"], row[3])
+                    entry["hits"] = max(entry["hits"], row[4])
+            # Gone from SQLite: deleted elsewhere, unless written here after the query
+            present = {row[0] for row in rows} | {row[0] for row in self._rows}
+            for name in [n for n, e in self._index.items() if n not in present and e["created"] < started]:
+                self._bytes -= self._index.pop(name)["size"]
+                self._dirty.pop(name, None)
+
+    def _db_lookup(self, name: str) -> Optional[dict]:
+        # Another process sharing the directory may have written it
+        cols = ("size", "created", "last_access", "hits") + META_FIELDS
+        with self._db_lock:
+            row = self._db.execute(f"SELECT {', '.join(cols)} FROM entries WHERE name = ?", (name,)).fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def _persist_access(self):
+        # Hits are added to the stored count: other processes sharing the index count theirs too
+        with self._lock:
+            rows = [(self._index[n]["last_access"], hits, n) for n, hits in self._dirty.items() if n in self._index]
+            self._dirty.clear()
+        if rows:
+            with self._db_lock:
+                self._db.executemany("UPDATE entries SET last_access = MAX(last_access, ?), hits = hits + ? WHERE name = ?",
+                                     rows)
+                self._db.commit()
+
+    # ---------- Read/write
+    def get(self, name: str, shared: bool = False) -> Optional[bytes]:
+        """
+        Returns the cached bytes for name, or None. With shared, a name
+        missing from the in-memory index is also looked up in SQLite.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._index.get(name)
+            pending = self._pending.get(name)
+            if pending is not None:
+                self._stats["hits"] += 1
+                return pending[0]
+        if entry is None:
+            entry = self._db_lookup(name) if shared else None
+            if entry is None:
+                with self._lock:
+                    self._stats["misses"] += 1
+                return None
+            with self._lock:
+                if name not in self._index:
+                    self._index[name] = entry
+                    self._bytes += entry["size"]
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Removed behind our back; forget it
+            self._forget(name)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+            entry["last_access"] = time.time()
+            entry["hits"] += 1
+            self._dirty[name] = self._dirty.get(name, 0) + 1
+        return data
+
+    def contains(self, name: str, shared: bool = False) -> bool:
+        """
+        True if name is cached (or queued), without reading it or counting a
+        hit. shared as for get.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if name in self._index or name in self._pending:
+                return True
+        return shared and self._db_lookup(name) is not None and os.path.exists(self._path(name))
+
+    def meta(self, name: str) -> Optional[dict]:
+        """
+        Returns a copy of the indexed metadata for name, or None.
+        """
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None and name in self._pending:
+                entry = self._pending[name][1]
+            return dict(entry) if entry is not None else None
+
+    def put(self, name: str, data: bytes, **meta):
+        """
+        Queues a write-behind store of data under name. meta may carry any of
+        META_FIELDS for later queries and purges.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[name] = (data, meta)
+        self._writer.submit(self._put_now, name, data, meta)
+
+    def _put_now(self, name: str, data: bytes, meta: dict):
+        if not self._land(name, data, meta):
+            return
+        with self._lock:
+            commit = not self._pending or len(self._rows) >= DB_BATCH
+        if commit:
+            self._commit_rows()
+        if self._over_budget():
+            self.evict()
+
+    def _land(self, name: str, data: bytes, meta: dict) -> bool:
+        # Writes one queued entry and indexes it; False if land() already did (or a newer put replaced it)
+        with self._lock:
+            if self._pending.get(name, (None,))[0] is not data:
+                return False
+        path = self._path(name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, data)
+        except BaseException:
+            self._unpend(name, data)
+            raise
+        now = time.time()
+        meta.setdefault("fmt", name.rsplit(".", 1)[-1])
+        with self._lock:
+            # Swap the queued copy for the index entry under one lock so readers never miss both
+            if self._pending.get(name, (None,))[0] is not data:
+                return False
+            del self._pending[name]
+            old = self._index.get(name)
+            if old is not None:
+                self._bytes -= old["size"]
+            entry = {"size": len(data), "created": now, "last_access": now, "hits": old["hits"] if old else 0}
+            entry.update({f: meta.get(f) for f in META_FIELDS})
+            self._index[name] = entry
+            self._bytes += len(data)
+            self._stats["writes"] += 1
+            self._rows.append(self._row(name, entry))
+        return True
+
+    def _unpend(self, name: str, data: bytes):
+        with self._lock:
+            if self._pending.get(name, (None,))[0] is data:
+                del self._pending[name]
+
+    def flush(self):
+        """
+        Blocks until every queued write-behind cache write has landed and
+        is committed to the index.
+        """
+        self._writer.submit(self._commit_rows).result()
+
+    def land(self, name: str):
+        """
+        Writes name now if it is still queued and commits its index row, so
+        other processes sharing the directory can find it, without waiting
+        for the rest of the write queue. Eviction is left to the writer and
+        the sweeper.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            pending = self._pending.get(name)
+        if pending is not None:
+            self._land(name, *pending)
+        with self._lock:
+            uncommitted = any(row[0] == name for row in self._rows)
+        if uncommitted:
+            self._commit_rows()
+
+    def _forget(self, name: str, commit: bool = True) -> Optional[dict]:
+        with self._lock:
+            entry = self._index.pop(name, None)
+            self._dirty.pop(name, None)
+            if entry is not None:
+                self._bytes -= entry["size"]
+        if commit:
+            self._db_delete([name])
+        return entry
+
+    def _db_delete(self, names: List[str]):
+        # Uncommitted rows go first, or they would re-insert what is being deleted
+        self._commit_rows()
+        with self._db_lock:
+            self._db.executemany("DELETE FROM entries WHERE name = ?", [(n,) for n in names])
+            self._db.commit()
+
+    def _remove(self, name: str, commit: bool = True) -> Optional[dict]:
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+        return self._forget(name, commit)
+
+    # ---------- Queries and purges
+    def query(self, **filters) -> List[str]:
+        """
+        Returns entry names whose metadata matches every given filter, e.g.
+        query(voice="naija_male") or query(model="tts_models/en/vctk/vits").
+        """
+        unknown = set(filters) - set(META_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown cache filter(s): {', '.join(sorted(unknown))}")
+        if not self.enabled or not filters:
+            return []
+        where = " AND ".join(f"{k} = ?" for k in filters)
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT name FROM entries WHERE {where}", tuple(filters.values())).fetchall()
+        return [r[0] for r in rows]
+
+    def purge(self, **filters) -> int:
+        """
+        Removes every entry matching the filters (see query). Returns the
+        number of entries removed.
+        """
+        self.flush()
+        names = self.query(**filters)
+        removed = sum(self._remove(name, commit=False) is not None for name in names)
+        if names:
+            self._db_delete(names)
+        if removed:
+            log.info("purged %s cache entries matching %s", removed, filters)
+        return removed
+
+    # ---------- Eviction
+    def _over_budget(self, factor: float = 1.0) -> bool:
+        with self._lock:
+            return ((self.max_bytes > 0 and self._bytes > self.max_bytes * factor)
+                    or (self.max_entries > 0 and len(self._index) > self.max_entries * factor))
+
+    def evict(self) -> int:
+        """
+        Evicts entries until both budgets are under low_water, ranking them by
+        an up-to-date view of every process sharing the directory. Returns
+        the number of entries removed.
+        """
+        if not self._over_budget():
+            return 0
+        self._sync()
+        return self._evict()
+
+    def _evict(self) -> int:
+        with self._lock:
+            if self.policy == "lru":
+                rank = lambda kv: kv[1]["last_access"]
+            else:
+                rank = lambda kv: (kv[1]["hits"], kv[1]["last_access"])
+            victims = sorted(self._index.items(), key=rank)
+        removed = []
+        for name, entry in victims:
+            if not self._over_budget(self.low_water):
+                break
+            if self._remove(name, commit=False) is None:
+                continue
+            with self._lock:
+                self._stats["evictions"] += 1
+                self._stats["evicted_bytes"] += entry["size"]
+            removed.append(name)
+        if removed:
+            self._db_delete(removed)
+            log.info("evicted %s cache entries", len(removed))
+        return len(removed)
+
+    def _sweep_loop(self, interval_s: float):
+        while not self._closed.wait(interval_s):
+            try:
+                self._sync()
+                self._evict()
+            except Exception:
+                log.exception("cache sweep failed")
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        if self._db is not None:
+            self._persist_access()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, entries=len(self._index), size_bytes=self._bytes)
+        looked_up = out["hits"] + out["misses"]
+        out.update(
+            enabled=self.enabled,
+            policy=self.policy,
+            max_bytes=self.max_bytes,
+            max_entries=self.max_entries,
+            hit_ratio=round(out["hits"] / looked_up, 4) if looked_up else None,
+        )
+        return out
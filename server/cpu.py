@@ -0,0 +1,220 @@
+# server/cpu.py
+"""
+CPU governance for in-process inference. Every model call runs on a
+bounded executor of `concurrency` threads, and each of those threads gives
+torch `threads` intra-op threads, so concurrency x threads stays within
+the cores this process may use. Without this, every request thread that
+reaches the model spins up a full-width OpenMP team and the cores are
+oversubscribed exactly when load is highest.
+
+    python -m server.cpu --levels 1,2,4,8,16
+
+measures render throughput against client concurrency with and without
+governance.
+"""
+import os, sys, json, time, logging, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+log = logging.getLogger("odiadev.tts.cpu")
+
+# Concurrent inferences per process (0 = usable cores / TTS_INFER_THREADS)
+TTS_SYNTH_CONCURRENCY = int(os.getenv("TTS_SYNTH_CONCURRENCY", "0"))
+# Intra-op threads per inference (0 = usable cores / TTS_SYNTH_CONCURRENCY, or 4 when both are 0)
+TTS_INFER_THREADS = int(os.getenv("TTS_INFER_THREADS", "0"))
+# Pin the process to these cores, e.g. "0-3,8" (empty = inherit)
+TTS_CPU_AFFINITY = os.getenv("TTS_CPU_AFFINITY", "").strip()
+DEFAULT_INFER_THREADS = 4
+
+def usable_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def parse_cores(spec: str) -> List[int]:
+    """
+    "0-3,8" -> [0, 1, 2, 3, 8]. Raises ValueError on malformed input.
+    """
+    cores = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lo, _, hi = part.partition("-")
+        cores.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(cores)
+
+_affinity_lock = threading.Lock()
+_affinity_applied = False
+
+def apply_affinity(spec: str = TTS_CPU_AFFINITY) -> Optional[List[int]]:
+    """
+    Pins this process (and the workers it spawns later) to spec's cores,
+    once per process. Returns the cores, or None when unset or unsupported.
+    """
+    global _affinity_applied
+    if not spec or not hasattr(os, "sched_setaffinity"):
+        return None
+    with _affinity_lock:
+        if not _affinity_applied:
+            cores = parse_cores(spec)
+            os.sched_setaffinity(0, cores)
+            _affinity_applied = True
+            log.info("pinned to cores %s", cores)
+    return usable_cores()
+
+def pin(cores: List[int]):
+    """
+    Pins this process to exactly `cores` (a synthesis worker's slice) and
+    makes later apply_affinity calls in it no-ops, so the process-wide
+    TTS_CPU_AFFINITY set cannot widen it again.
+    """
+    global _affinity_applied
+    with _affinity_lock:
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        _affinity_applied = True
+
+def plan(cores: Optional[int] = None, concurrency: int = TTS_SYNTH_CONCURRENCY,
+         threads: int = TTS_INFER_THREADS) -> Tuple[int, int]:
+    """
+    Returns (concurrency, threads per inference) for `cores` usable cores,
+    filling in whichever of the two is unset (0) from the other.
+    """
+    cores = cores or len(usable_cores())
+    if threads <= 0:
+        threads = max(1, cores // concurrency) if concurrency > 0 else min(DEFAULT_INFER_THREADS, cores)
+    if concurrency <= 0:
+        concurrency = max(1, cores // threads)
+    return concurrency, threads
+
+def set_torch_threads(threads: int):
+    # No-op until something has imported torch; the Piper and ONNX paths never do
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # only settable before the first inter-op task; the default is harmless
+
+class InferenceExecutor:
+    """
+    Bounded pool that model calls run on. Each pool thread sets its own
+    torch intra-op thread count on start. Calls made from a pool thread run
+    inline, so a task may safely call back into code that submits.
+    """
+
+    def __init__(self, concurrency: int, threads: int):
+        self.concurrency = max(1, concurrency)
+        self.threads = max(1, threads)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"tasks": 0, "queued_peak": 0, "wait_ms": 0.0, "run_ms": 0.0}
+        self._waiting = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="tts-infer",
+                                        initializer=self._init_thread)
+
+    def _init_thread(self):
+        self._local.inside = True
+        set_torch_threads(self.threads)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        if getattr(self._local, "inside", False):
+            return fn(*args, **kwargs)
+        queued = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self._stats["queued_peak"] = max(self._stats["queued_peak"], self._waiting)
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                self._stats["wait_ms"] += (started - queued) * 1000
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._stats["tasks"] += 1
+                    self._stats["run_ms"] += (time.perf_counter() - started) * 1000
+
+        return self._pool.submit(task).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, waiting=self._waiting)
+        tasks = out["tasks"]
+        out.update(concurrency=self.concurrency, threads=self.threads,
+                   wait_ms=round(out["wait_ms"], 1), run_ms=round(out["run_ms"], 1),
+                   mean_wait_ms=round(out["wait_ms"] / tasks, 1) if tasks else None)
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    The q-quantile (0-1) of values by nearest rank, rounded to 0.1; None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+def bench_level(engine, texts: List[str], level: int, requests: int, voice: Optional[str] = None) -> dict:
+    """
+    Renders `requests` texts from `level` client threads at once (uncached,
+    straight through engine.render) and reports throughput and latency.
+    """
+    cores = len(usable_cores())
+    governed = engine._infer is not None
+    latencies = []
+
+    def one(i):
+        if not governed:
+            # What an ungoverned request thread gets: torch's default, one thread per core
+            set_torch_threads(cores)
+        start = time.perf_counter()
+        pcm = engine.render(texts[i % len(texts)], 1.0, voice)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return len(pcm)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level, thread_name_prefix="bench-client") as clients:
+        samples = sum(clients.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"concurrency": level, "requests": requests,
+            "renders_per_s": round(requests / elapsed, 3),
+            "audio_s_per_s": round(samples / engine.sample_rate / elapsed, 3),
+            "p50_ms": percentile(latencies, 0.5), "p95_ms": percentile(latencies, 0.95)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render throughput against concurrency, with and without thread governance")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="client concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="renders per level (default: 2 x level, at least 8)")
+    parser.add_argument("--voice")
+    parser.add_argument("--text", action="append", dest="texts", help="repeatable (default: lines of the company scripts)")
+    parser.add_argument("--modes", default="ungoverned,governed")
+    args = parser.parse_args(argv)
+
+    from .engine import TTSEngine
+    from .warm import load_phrases
+    texts = args.texts or load_phrases()[:16] or ["Welcome to ODIADEV."]
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    engine = TTSEngine(workers=0)
+    engine.warmup()
+    governed = engine._infer
+    report = {"cores": len(usable_cores()), "plan": {"concurrency": governed.concurrency, "threads": governed.threads}
+              if governed else None, "engine": engine.engine, "modes": {}}
+    for mode in args.modes.split(","):
+        engine._infer = governed if mode == "governed" else None
+        rows = []
+        for level in levels:
+            rows.append(bench_level(engine, texts, level, args.requests or max(8, 2 * level), args.voice))
+            log.info("%s %s", mode, rows[-1])
+        report["modes"][mode] = rows
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
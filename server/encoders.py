@@ -0,0 +1,393 @@
+# server/encoders.py
+import io, os, time, logging, threading, subprocess
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from .audio import resample, to_float32, to_int16, wav_bytes, wav_stream_header
+
+log = logging.getLogger("odiadev.tts.encoders")
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+# Per-format output settings; sample_rate 0 keeps the model's native rate.
+# wav is always the canonical render as synthesized (synth, streaming and jobs never re-encode it)
+FORMAT_SETTINGS = {
+    "mp3": {"bitrate_kbps": _env_int("TTS_MP3_BITRATE_KBPS", 64), "sample_rate": _env_int("TTS_MP3_SAMPLE_RATE", 0)},
+    "ogg": {"bitrate_kbps": _env_int("TTS_OGG_BITRATE_KBPS", 48), "sample_rate": _env_int("TTS_OGG_SAMPLE_RATE", 0)},
+    "wav": {"bitrate_kbps": None, "sample_rate": 0},
+}
+# Named low-bandwidth delivery profiles; each is cached as its own variant
+PROFILES = {
+    "opus_16k": {"codec": "opus", "bitrate_kbps": 16, "sample_rate": 16000},
+    "opus_24k": {"codec": "opus", "bitrate_kbps": 24, "sample_rate": 24000},
+    "aac_32k": {"codec": "aac", "bitrate_kbps": 32, "sample_rate": 22050},
+    "mp3_48k": {"codec": "mp3", "bitrate_kbps": 48, "sample_rate": 22050},
+}
+MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "ogg": "audio/ogg", "opus": "audio/ogg", "aac": "audio/aac"}
+# Every value accepted as an output format
+FORMATS = tuple(FORMAT_SETTINGS) + tuple(PROFILES)
+
+# format=auto: profile served per network class, and for clients that send no hints
+AUTO_PROFILES = {"2g": "opus_16k", "3g": "opus_24k", "4g": os.getenv("TTS_AUTO_DEFAULT", "mp3")}
+# Client hints the server asks for and varies on when choosing for format=auto
+CLIENT_HINTS = ("Save-Data", "ECT", "Downlink", "RTT")
+
+# Encoding is CPU-bound; bound it separately from synthesis
+ENCODE_CONCURRENCY = _env_int("TTS_ENCODE_CONCURRENCY", os.cpu_count() or 2)
+
+_slots = threading.BoundedSemaphore(max(1, ENCODE_CONCURRENCY))
+_stats_lock = threading.Lock()
+_stats = {}
+
+# Optional in-process codec bindings, guarded like the Coqui import
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+try:
+    import soundfile
+    _SF_OGG = soundfile.available_subtypes("OGG")
+    _SF_MP3 = soundfile.available_subtypes("MP3")
+except (ImportError, OSError):
+    soundfile, _SF_OGG, _SF_MP3 = None, {}, {}
+
+def _level(kbps: float, lo: float, hi: float) -> float:
+    # libsndfile maps compression_level 0..1 onto a codec's high..low bitrate range
+    return float(np.clip(1.0 - (kbps - lo) / (hi - lo), 0.0, 1.0))
+
+def _soundfile(pcm: np.ndarray, sample_rate: int, fmt: str, subtype: str, level: float) -> bytes:
+    buf = io.BytesIO()
+    soundfile.write(buf, to_float32(pcm), sample_rate, format=fmt, subtype=subtype,
+                    compression_level=level, bitrate_mode="CONSTANT" if fmt == "MP3" else None)
+    return buf.getvalue()
+
+def _ffmpeg(pcm: np.ndarray, sample_rate: int, args) -> bytes:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error",
+           "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0", *args, "pipe:1"]
+    proc = subprocess.run(cmd, input=to_int16(pcm).tobytes(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg encode failed: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return proc.stdout
+
+# ---------- Codecs: (pcm, sample_rate, bitrate_kbps) -> bytes
+def _mp3_lame(pcm, sample_rate, kbps):
+    enc = lameenc.Encoder()
+    enc.set_bit_rate(int(kbps))
+    enc.set_in_sample_rate(sample_rate)
+    enc.set_channels(1)
+    enc.set_quality(2)
+    return bytes(enc.encode(to_int16(pcm).tobytes()) + enc.flush())
+
+def _mp3_sndfile(pcm, sample_rate, kbps):
+    return _soundfile(pcm, sample_rate, "MP3", "MPEG_LAYER_III", _level(kbps, 32, 320))
+
+def _mp3_ffmpeg(pcm, sample_rate, kbps):
+    return _ffmpeg(pcm, sample_rate, ["-c:a", "libmp3lame", "-b:a", f"{int(kbps)}k", "-f", "mp3"])
+
+def _vorbis_sndfile(pcm, sample_rate, kbps):
+    return _soundfile(pcm, sample_rate, "OGG", "VORBIS", _level(kbps, 32, 256))
+
+def _vorbis_ffmpeg(pcm, sample_rate, kbps):
+    return _ffmpeg(pcm, sample_rate, ["-c:a", "libvorbis", "-b:a", f"{int(kbps)}k", "-f", "ogg"])
+
+def _opus_sndfile(pcm, sample_rate, kbps):
+    return _soundfile(pcm, sample_rate, "OGG", "OPUS", _level(kbps, 6, 256))
+
+def _opus_ffmpeg(pcm, sample_rate, kbps):
+    return _ffmpeg(pcm, sample_rate, ["-c:a", "libopus", "-b:a", f"{int(kbps)}k", "-application", "voip", "-f", "ogg"])
+
+def _aac_ffmpeg(pcm, sample_rate, kbps):
+    # ADTS framing streams and concatenates without a container index
+    return _ffmpeg(pcm, sample_rate, ["-c:a", "aac", "-b:a", f"{int(kbps)}k", "-f", "adts"])
+
+def _wav(pcm, sample_rate, kbps):
+    return wav_bytes(pcm, sample_rate)
+
+def _pick(candidates) -> Dict[str, Callable]:
+    for backend, available, fn in candidates:
+        if available:
+            return {"backend": backend, "fn": fn}
+    raise RuntimeError("no encoder available")
+
+# First available backend per format: in-process bindings, then ffmpeg over pipes
+ENCODERS = {
+    "mp3": _pick([("lameenc", lameenc is not None, _mp3_lame),
+                  ("soundfile", "MPEG_LAYER_III" in _SF_MP3, _mp3_sndfile),
+                  ("ffmpeg", True, _mp3_ffmpeg)]),
+    "ogg": _pick([("soundfile", "VORBIS" in _SF_OGG, _vorbis_sndfile),
+                  ("ffmpeg", True, _vorbis_ffmpeg)]),
+    "wav": _pick([("wave", True, _wav)]),
+    "opus": _pick([("soundfile", "OPUS" in _SF_OGG, _opus_sndfile),
+                   ("ffmpeg", True, _opus_ffmpeg)]),
+    # No maintained in-process AAC binding; ffmpeg's native encoder over pipes
+    "aac": _pick([("ffmpeg", True, _aac_ffmpeg)]),
+}
+
+def network_class(network: Optional[str] = None, save_data: Optional[str] = None, ect: Optional[str] = None,
+                  downlink: Optional[str] = None, rtt: Optional[str] = None) -> str:
+    """
+    Classifies the client link as 2g/3g/4g from an explicit network
+    parameter, else the standard client hints (Save-Data, ECT, Downlink
+    in Mbps, RTT in ms). Unknown links count as 4g.
+    """
+    if network in AUTO_PROFILES:
+        return network
+    if save_data and save_data.strip().lower() == "on":
+        return "2g"
+    ect = (ect or "").strip().lower()
+    if ect in ("slow-2g", "2g", "3g", "4g"):
+        return "2g" if ect.endswith("2g") else ect
+    try:
+        mbps = float(downlink) if downlink else None
+        ms = float(rtt) if rtt else None
+    except ValueError:
+        return "4g"
+    if (mbps is not None and mbps < 0.5) or (ms is not None and ms >= 1000):
+        return "2g"
+    if (mbps is not None and mbps < 2) or (ms is not None and ms >= 300):
+        return "3g"
+    return "4g"
+
+def auto_format(**hints) -> str:
+    """
+    Resolves format=auto to a concrete format or profile; see network_class.
+    """
+    return AUTO_PROFILES[network_class(**hints)]
+
+def media_type(fmt: str) -> str:
+    return MEDIA_TYPES[PROFILES[fmt]["codec"] if fmt in PROFILES else fmt]
+
+def _settings(fmt: str):
+    # (settings, codec) for a base format or a PROFILES name
+    if fmt in PROFILES:
+        return PROFILES[fmt], PROFILES[fmt]["codec"]
+    if fmt in FORMAT_SETTINGS:
+        return FORMAT_SETTINGS[fmt], fmt
+    raise ValueError(f"unsupported format: {fmt}")
+
+def _record(fmt: str, backend: str, ms: float, count: int = 1):
+    with _stats_lock:
+        entry = _stats.setdefault(fmt, {"backend": backend, "count": 0, "ms_total": 0.0})
+        entry["count"] += count
+        entry["ms_total"] += ms
+
+def encode(pcm: np.ndarray, sample_rate: int, fmt: str,
+           bitrate_kbps: Optional[int] = None, target_rate: Optional[int] = None) -> bytes:
+    """
+    Encodes mono PCM into fmt (a base format or a PROFILES name) in memory
+    using its configured bitrate and sample rate unless overridden. At most
+    ENCODE_CONCURRENCY encodes run at once.
+    """
+    settings, codec = _settings(fmt)
+    encoder = ENCODERS[codec]
+    kbps = bitrate_kbps or settings["bitrate_kbps"]
+    rate = target_rate or settings["sample_rate"] or sample_rate
+    with _slots:
+        start = time.time()
+        pcm = resample(pcm, sample_rate, rate)
+        data = encoder["fn"](pcm, rate, kbps)
+        ms = (time.time() - start) * 1000
+    _record(fmt, encoder["backend"], ms)
+    return data
+
+# ---------- Incremental encoding: one continuous stream fed piece by piece
+class _Drain(io.RawIOBase):
+    # Seekable sink for libsndfile that hands out bytes as they are written (Ogg never seeks
+    # back). Only the bytes written since the last drain are held, at their stream offsets
+    def __init__(self):
+        self._tail = bytearray()
+        self._base = 0
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _offset(self) -> int:
+        start = self._pos - self._base
+        if start < 0:
+            raise OSError("position is before bytes already drained")
+        return start
+
+    def read(self, n=-1):
+        start = self._offset()
+        data = bytes(self._tail[start:] if n is None or n < 0 else self._tail[start:start + n])
+        self._pos += len(data)
+        return data
+
+    def write(self, data):
+        start = self._offset()
+        size = memoryview(data).nbytes
+        if start > len(self._tail):
+            self._tail.extend(bytes(start - len(self._tail)))
+        self._tail[start:start + size] = data
+        self._pos += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._base + len(self._tail)
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = bytes(self._tail)
+        self._base += len(data)
+        self._tail.clear()
+        return data
+
+class _LameStream:
+    def __init__(self, sample_rate, kbps):
+        self._enc = lameenc.Encoder()
+        self._enc.set_bit_rate(int(kbps))
+        self._enc.set_in_sample_rate(sample_rate)
+        self._enc.set_channels(1)
+        self._enc.set_quality(2)
+
+    def write(self, pcm) -> bytes:
+        return bytes(self._enc.encode(to_int16(pcm).tobytes()))
+
+    def close(self) -> bytes:
+        return bytes(self._enc.flush())
+
+class _SoundfileStream:
+    def __init__(self, sample_rate, subtype, level):
+        self._sink = _Drain()
+        self._file = soundfile.SoundFile(self._sink, "w", samplerate=sample_rate, channels=1, format="OGG",
+                                         subtype=subtype, compression_level=level)
+
+    def write(self, pcm) -> bytes:
+        self._file.write(to_float32(pcm))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._file.close()
+        return self._sink.drain()
+
+class _FfmpegStream:
+    def __init__(self, sample_rate, args):
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error",
+               "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0", *args, "pipe:1"]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._out, self._lock = [], threading.Lock()
+        # Drain stdout concurrently so a full pipe never blocks our writes
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for data in iter(lambda: self._proc.stdout.read1(65536), b""):
+            with self._lock:
+                self._out.append(data)
+
+    def _take(self) -> bytes:
+        with self._lock:
+            data, self._out = b"".join(self._out), []
+        return data
+
+    def write(self, pcm) -> bytes:
+        self._proc.stdin.write(to_int16(pcm).tobytes())
+        return self._take()
+
+    def close(self) -> bytes:
+        self._proc.stdin.close()
+        self._reader.join()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg encode failed: {self._proc.stderr.read().decode('utf-8', 'replace').strip()}")
+        return self._take()
+
+class _WavStream:
+    def __init__(self, sample_rate):
+        self._head = wav_stream_header(sample_rate)
+
+    def write(self, pcm) -> bytes:
+        head, self._head = self._head, b""
+        return head + to_int16(pcm).tobytes()
+
+    def close(self) -> bytes:
+        return self._head
+
+# ---------- Stream codecs: (sample_rate, bitrate_kbps) -> stream with write(pcm)/close()
+def _mp3_ffmpeg_stream(sample_rate, kbps):
+    return _FfmpegStream(sample_rate, ["-c:a", "libmp3lame", "-b:a", f"{int(kbps)}k", "-f", "mp3"])
+
+def _vorbis_sndfile_stream(sample_rate, kbps):
+    return _SoundfileStream(sample_rate, "VORBIS", _level(kbps, 32, 256))
+
+def _vorbis_ffmpeg_stream(sample_rate, kbps):
+    return _FfmpegStream(sample_rate, ["-c:a", "libvorbis", "-b:a", f"{int(kbps)}k", "-f", "ogg"])
+
+def _opus_sndfile_stream(sample_rate, kbps):
+    return _SoundfileStream(sample_rate, "OPUS", _level(kbps, 6, 256))
+
+def _opus_ffmpeg_stream(sample_rate, kbps):
+    return _FfmpegStream(sample_rate, ["-c:a", "libopus", "-b:a", f"{int(kbps)}k", "-application", "voip", "-f", "ogg"])
+
+def _aac_ffmpeg_stream(sample_rate, kbps):
+    return _FfmpegStream(sample_rate, ["-c:a", "aac", "-b:a", f"{int(kbps)}k", "-f", "adts"])
+
+def _wav_stream(sample_rate, kbps):
+    return _WavStream(sample_rate)
+
+# As ENCODERS; libsndfile's MP3 writer seeks back to finish its header, so it cannot stream
+STREAM_ENCODERS = {
+    "mp3": _pick([("lameenc", lameenc is not None, _LameStream),
+                  ("ffmpeg", True, _mp3_ffmpeg_stream)]),
+    "ogg": _pick([("soundfile", "VORBIS" in _SF_OGG, _vorbis_sndfile_stream),
+                  ("ffmpeg", True, _vorbis_ffmpeg_stream)]),
+    "wav": _pick([("wave", True, _wav_stream)]),
+    "opus": _pick([("soundfile", "OPUS" in _SF_OGG, _opus_sndfile_stream),
+                   ("ffmpeg", True, _opus_ffmpeg_stream)]),
+    "aac": _pick([("ffmpeg", True, _aac_ffmpeg_stream)]),
+}
+
+class StreamEncoder:
+    """
+    Encodes one continuous stream fed piece by piece: write() returns the
+    bytes ready so far and close() the rest. The result is a single mp3
+    stream or Ogg logical stream, so there is no encoder delay at piece
+    boundaries and every decoder plays it through (separately encoded
+    pieces chain Ogg streams, which libsndfile stops after the first of).
+    wav is a streaming header followed by raw PCM. Pieces are resampled one
+    by one, so they should start and end near silence when the format's
+    rate differs from sample_rate.
+    """
+
+    def __init__(self, fmt: str, sample_rate: int, bitrate_kbps: Optional[int] = None):
+        settings, codec = _settings(fmt)
+        self.fmt, self.sample_rate = fmt, sample_rate
+        self.rate = settings["sample_rate"] or sample_rate
+        self._backend = STREAM_ENCODERS[codec]
+        self._stream = self._backend["fn"](self.rate, bitrate_kbps or settings["bitrate_kbps"])
+        self._ms = 0.0
+
+    def write(self, pcm: np.ndarray) -> bytes:
+        with _slots:
+            start = time.time()
+            data = self._stream.write(resample(pcm, self.sample_rate, self.rate))
+            self._ms += (time.time() - start) * 1000
+        return data
+
+    def close(self) -> bytes:
+        start = time.time()
+        data = self._stream.close()
+        _record(self.fmt, self._backend["backend"], self._ms + (time.time() - start) * 1000)
+        return data
+
+def stats() -> dict:
+    with _stats_lock:
+        out = {fmt: dict(e, ms_total=round(e["ms_total"], 1)) for fmt, e in _stats.items()}
+    return {"concurrency": ENCODE_CONCURRENCY,
+            "backends": {fmt: e["backend"] for fmt, e in ENCODERS.items()},
+            "formats": out}
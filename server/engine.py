@@ -1,90 +1,605 @@
 # server/engine.py
-import os, hashlib, time, tempfile, subprocess
-from typing import Optional, Tuple
-from pydub import AudioSegment
+import os, hashlib, time, tempfile, threading, logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import artifacts, cpu, onnx_backend, quantize
+from .audio import concat, read_wav, to_float32, wav_bytes
+from .batching import BatchScheduler
+from .cache import DiskCache
+from .encoders import StreamEncoder, encode
+from .frontend import CoquiFrontend, PhonemeMemo, merge_stats
+from .piper_pool import PiperPool
+from .workers import SynthesisPool
+from .singleflight import SingleFlight
+from .stretch import time_stretch
+from .text import normalize, split_sentences
+from .voices import TTS_VOICE_CONFIG, VoiceRegistry, VoiceSpec, load_voice_config, resolve_voice, voice_names
+
+# Silence inserted between sentences when fragments are stitched together
+SENTENCE_PAUSE_MS = int(os.getenv("TTS_SENTENCE_PAUSE_MS", "250"))
+# 'write_behind' persists renders to disk off the request path; 'off' disables the disk cache
+TTS_DISK_CACHE = os.getenv("TTS_DISK_CACHE", "write_behind").lower()
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or None
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "2048"))
+TTS_CACHE_MAX_ENTRIES = int(os.getenv("TTS_CACHE_MAX_ENTRIES", "200000"))
+TTS_CACHE_POLICY = os.getenv("TTS_CACHE_POLICY", "lru").lower()
+TTS_CACHE_SWEEP_S = float(os.getenv("TTS_CACHE_SWEEP_S", "60"))
+# Text normalization ahead of the cache: off | basic | full (see text.normalize)
+TTS_NORMALIZE = os.getenv("TTS_NORMALIZE", "full").lower()
+# Micro-batching: collect requests for this long (0 disables) into batches of at most TTS_BATCH_MAX
+TTS_BATCH_WINDOW_MS = float(os.getenv("TTS_BATCH_WINDOW_MS", "0"))
+TTS_BATCH_MAX = int(os.getenv("TTS_BATCH_MAX", "8"))
+# Speed: 'model' renders every speed; 'stretch' renders 1.0 once and time-stretches it (see stretch.py)
+TTS_SPEED_MODE = os.getenv("TTS_SPEED_MODE", "model").lower()
+TTS_STRETCH_QUALITY = os.getenv("TTS_STRETCH_QUALITY", "fast").lower()
+# Coalesce identical in-flight requests: 'on' (in-process + file locks across workers), 'process', 'off'
+TTS_SINGLE_FLIGHT = os.getenv("TTS_SINGLE_FLIGHT", "on").lower()
+# Word-level phoneme memo: 'on' (LRU + SQLite file shared by workers), 'memory' (LRU only), 'off'
+TTS_PHONEME_CACHE = os.getenv("TTS_PHONEME_CACHE", "on").lower()
+TTS_PHONEME_CACHE_SIZE = int(os.getenv("TTS_PHONEME_CACHE_SIZE", "50000"))
+# Logical voices map to Coqui models/speakers via TTS_VOICE_CONFIG ('off' = every voice uses COQUI_MODEL_NAME)
+TTS_VOICE_REGISTRY = os.getenv("TTS_VOICE_REGISTRY", "on").lower()
+# Loaded models' weights are kept under this; idle models are evicted LRU beyond it (0 = unbounded)
+TTS_MODEL_RAM_MB = int(os.getenv("TTS_MODEL_RAM_MB", "4096"))
+# Coqui synthesis processes, each with its own model and core slice (0 = synthesize in-process)
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "0"))
+PIPER_WORKERS = int(os.getenv("PIPER_WORKERS", "2"))
+PIPER_TIMEOUT_S = float(os.getenv("PIPER_TIMEOUT_S", "30"))
+
+log = logging.getLogger("odiadev.tts")
 
 # Optional imports guarded
 def _lazy_import_coqui():
     from TTS.api import TTS as COQUI_TTS
     return COQUI_TTS
 
+# Speed of the render running on this thread; see _per_call_speed
+_call_speed = threading.local()
+
+def _per_call_speed(model):
+    """
+    Coqui reads VITS / Glow-TTS duration scaling from model.length_scale and
+    forwards tts(speed=...) to XTTS only. This swaps the model's class for a
+    same-named subclass whose length_scale divides the configured value by
+    the speed set with _speed() on the calling thread, so every render
+    (batched or not) gets its own speed without touching shared state.
+    """
+    cls = type(model)
+    if getattr(cls, "_per_call_speed", False) or not isinstance(model.__dict__.get("length_scale"), (int, float)):
+        return
+    def get(self):
+        return self.__dict__["length_scale"] / getattr(_call_speed, "speed", 1.0)
+    def put(self, value):
+        self.__dict__["length_scale"] = value
+    model.__class__ = type(cls.__name__, (cls,), {"length_scale": property(get, put), "_per_call_speed": True,
+                                                  "__module__": cls.__module__})
+
+@contextmanager
+def _speed(speed: float):
+    saved = getattr(_call_speed, "speed", 1.0)
+    _call_speed.speed = speed
+    try:
+        yield
+    finally:
+        _call_speed.speed = saved
+
 class TTSEngine:
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, infer_plan: Optional[Tuple[int, int]] = None,
+                 model_ram_mb: Optional[int] = None, disk_cache: bool = True):
         self.engine = os.getenv("TTS_ENGINE", "coqui").lower()
-        if self.engine not in ("coqui", "piper"):
+        if self.engine not in ("coqui", "onnx", "piper"):
             self.engine = "coqui"
+        # 'onnx' is Coqui VITS run through onnxruntime; models, voices and tokenizers are Coqui's
+        self._coqui = self.engine in ("coqui", "onnx")
         self.model_loaded = False
         self._tts = None
         self._model_name = os.getenv("COQUI_MODEL_NAME", "tts_models/en/vctk/vits")
         self._speaker_wav = os.getenv("COQUI_SPEAKER_WAV") or None
         self._piper_model = os.getenv("PIPER_MODEL_PATH") or None
         self._piper_phon = os.getenv("PIPER_PHONEME_PATH") or None
+        self._piper_pool = None
+        self._voice_config = load_voice_config(TTS_VOICE_CONFIG) if TTS_VOICE_REGISTRY != "off" else {}
+        self._voices = None
+        self._model_ram_mb = TTS_MODEL_RAM_MB if model_ram_mb is None else model_ram_mb
+        # model name -> PhonemeMemo; kept across evictions so a reload starts warm
+        self._memos = {}
+        self._workers = TTS_WORKERS if workers is None else workers
+        self._pool = None
+        # (concurrency, threads per inference) for in-process model calls; None = cpu.plan()
+        self._infer_plan = infer_plan
+        self._infer = None
+        self._load_lock = threading.Lock()
+        self.warm = False
+        self._stats_lock = threading.Lock()
+        self._stats = {"full_hits": 0, "derived_hits": 0, "fragment_hits": 0, "fragment_misses": 0,
+                       "stretched_fragments": 0, "coalesced": 0}
+        self.sample_rate = None
+        self.cache = DiskCache(
+            TTS_CACHE_DIR or os.path.join(tempfile.gettempdir(), "odiadev_tts_cache"),
+            max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024,
+            max_entries=TTS_CACHE_MAX_ENTRIES,
+            policy=TTS_CACHE_POLICY,
+            sweep_interval_s=TTS_CACHE_SWEEP_S,
+            enabled=TTS_DISK_CACHE != "off" and disk_cache,
+        )
+        self._flights = None
+        if TTS_SINGLE_FLIGHT in ("on", "process"):
+            lock_dir = os.path.join(self.cache.root, "locks") if TTS_SINGLE_FLIGHT == "on" and self.cache.enabled else None
+            # Only the leader's own entry is landed; the rest of the write queue stays behind the request
+            self._flights = SingleFlight(lock_dir, before_unlock=self.cache.land)
+        self._batcher = None
+        if TTS_BATCH_WINDOW_MS > 0:
+            # One batch per synthesis worker, or per concurrent in-process inference
+            concurrency = self._workers if self._workers > 0 else (self._infer_plan or cpu.plan())[0]
+            self._batcher = BatchScheduler(self, TTS_BATCH_WINDOW_MS, TTS_BATCH_MAX, concurrency=concurrency)
 
     def _load_model(self):
         if self.model_loaded:
             return
-        if self.engine == "coqui":
-            COQUI_TTS = _lazy_import_coqui()
-            # Download & load model by name; CPU by default
-            self._tts = COQUI_TTS(self._model_name)
+        # Startup warm-up and the first requests may race to load
+        with self._load_lock:
+            if self.model_loaded:
+                return
+            try:
+                cpu.apply_affinity()
+            except (ValueError, OSError):
+                log.exception("ignoring TTS_CPU_AFFINITY=%r", cpu.TTS_CPU_AFFINITY)
+            if self._coqui and self._workers > 0:
+                # Models live in the worker processes, not here
+                self._pool = SynthesisPool(self._workers)
+                self.sample_rate = self._pool.start()
+            elif self._coqui:
+                self._infer = cpu.InferenceExecutor(*(self._infer_plan or cpu.plan()))
+                # Models load on first use of a voice; the default voice's model loads now
+                self._voices = VoiceRegistry(self._voice_config, self._model_name, self._load_coqui,
+                                             budget_bytes=self._model_ram_mb * 1024 * 1024)
+                with self._voices.use(None) as (tts, _):
+                    self.sample_rate = tts.synthesizer.output_sample_rate
+            else:
+                # Piper runs in long-lived worker processes that load the voice once
+                if not self._piper_model:
+                    raise RuntimeError("PIPER_MODEL_PATH not set")
+                self._piper_pool = PiperPool(self._piper_model, size=PIPER_WORKERS, timeout_s=PIPER_TIMEOUT_S,
+                                             phoneme_memo_size=TTS_PHONEME_CACHE_SIZE if TTS_PHONEME_CACHE != "off" else 0,
+                                             phoneme_db=self._phoneme_db())
+                self._piper_pool.start()
+                self.sample_rate = self._piper_pool.sample_rate
+            self.model_loaded = True
+
+    def _open_coqui(self, model_name: str):
+        # Pre-exported artifacts (see artifacts.py) map in without the model manager or torch.load
+        if artifacts.TTS_ARTIFACTS != "off" and artifacts.available(model_name):
+            try:
+                start = time.time()
+                tts = artifacts.load(model_name)
+                log.info("mapped %s from artifacts in %s ms", model_name, int((time.time() - start) * 1000))
+                return tts
+            except Exception:
+                log.exception("artifacts for %s unusable; loading through Coqui", model_name)
+        COQUI_TTS = _lazy_import_coqui()
+        # Download & load model by name; CPU by default
+        return COQUI_TTS(model_name)
+
+    def _load_coqui(self, model_name: str):
+        tts = self._open_coqui(model_name)
+        if self.engine == "onnx":
+            try:
+                tts.onnx_runner = onnx_backend.load(tts, model_name, keep_torch=self._needs_torch(model_name))
+            except Exception:
+                log.exception("ONNX backend unavailable for %s; using PyTorch", model_name)
+        elif self._quantize_mode(model_name) == "int8":
+            tts = self._quantize(self._open_coqui, tts, model_name)
+        model = getattr(getattr(tts, "synthesizer", None), "tts_model", None)
+        if model is not None:
+            _per_call_speed(model)
+        if TTS_PHONEME_CACHE != "off":
+            memo = self._memos.get(model_name) or PhonemeMemo(f"coqui|{model_name}", TTS_PHONEME_CACHE_SIZE, self._phoneme_db())
+            if CoquiFrontend.install(getattr(tts.synthesizer.tts_model, "tokenizer", None), memo) is not None:
+                self._memos[model_name] = memo
+        return tts
+
+    def _needs_torch(self, model_name: str) -> bool:
+        # Reference-wav voices clone through tts.tts(), which the ONNX graph does not cover
+        if self._speaker_wav:
+            return True
+        return any(entry.get("model") == model_name and entry.get("speaker_wav")
+                   for entry in self._voice_config.get("voices", {}).values())
+
+    def _quantize_mode(self, model_name: str) -> str:
+        # A voice_config.json entry's "quantize" wins for its model over TTS_QUANTIZE
+        if self.engine != "coqui":
+            return "off"
+        for entry in self._voice_config.get("voices", {}).values():
+            if entry.get("model") == model_name and entry.get("quantize") in quantize.QUANT_MODES:
+                return entry["quantize"]
+        return quantize.TTS_QUANTIZE if quantize.TTS_QUANTIZE in quantize.QUANT_MODES else "off"
+
+    def _quantize(self, factory, tts, model_name: str):
+        for attempt in range(2):
+            try:
+                quantize.apply(tts, model_name)
+                return tts
+            except Exception:
+                log.exception("int8 quantization of %s failed (attempt %s)", model_name, attempt + 1)
+                # The model may be half-converted; start again from the checkpoint
+                tts = factory(model_name)
+        log.warning("serving %s in fp32", model_name)
+        return tts
+
+    def voice_spec(self, voice: Optional[str]) -> VoiceSpec:
+        return resolve_voice(self._voice_config, voice, self._model_name)
+
+    def voices(self) -> List[str]:
+        return voice_names(self._voice_config)
+
+    @contextmanager
+    def _model(self, voice: Optional[str]):
+        # (Coqui instance, spec) for voice; a preset self._tts serves every voice
+        if self._voices is None:
+            yield self._tts, self.voice_spec(voice)
         else:
-            # Piper runs via CLI; ensure binary available
-            if not self._piper_model:
-                raise RuntimeError("PIPER_MODEL_PATH not set")
-        self.model_loaded = True
+            with self._voices.use(voice) as pair:
+                yield pair
+
+    def _voice_rate(self, voice: Optional[str]) -> int:
+        if self._pool is not None:
+            return self._pool.voice_rate(voice)
+        if self._voices is None:
+            return self.sample_rate
+        with self._voices.use(voice) as (tts, _):
+            return tts.synthesizer.output_sample_rate
+
+    def _phoneme_db(self) -> Optional[str]:
+        # Shared through the cache directory even when this engine keeps no audio cache (synthesis workers)
+        if TTS_PHONEME_CACHE != "on" or TTS_DISK_CACHE == "off":
+            return None
+        return os.path.join(self.cache.root, "frontend", "phonemes.sqlite3")
+
+    def _speaker_kwargs(self, tts, spec: VoiceSpec) -> dict:
+        # Multi-speaker models (e.g. VCTK) refuse to synthesize without a speaker
+        if tts is not None and getattr(tts, "is_multi_speaker", False) and not (spec.speaker_wav or self._speaker_wav):
+            speakers = getattr(tts, "speakers", None) or []
+            if spec.speaker in speakers:
+                return {"speaker": spec.speaker}
+            if speakers:
+                return {"speaker": speakers[0]}
+        return {}
 
-    def synth(self, text: str, voice: Optional[str], speed: float = 1.0, fmt: str = "mp3") -> Tuple[str, bool, int]:
+    def warmup(self, text: str = "Welcome to ODIADEV.") -> int:
         """
-        Returns (audio_path, cache_hit, elapsed_ms)
+        Loads the model and runs one throwaway synthesis so the first real
+        request does not pay for weight loading or kernel/cache priming.
+        With the voice registry, every configured voice's model is warmed
+        the same way, in config order, while the RAM budget has room.
+        Returns elapsed_ms.
         """
         start = time.time()
-        # basic cache key
-        key = hashlib.sha1(f"{self.engine}|{self._model_name}|{self._piper_model}|{voice}|{speed}|{text}".encode("utf-8")).hexdigest()
-        cache_dir = os.path.join(tempfile.gettempdir(), "odiadev_tts_cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        out_wav = os.path.join(cache_dir, f"{key}.wav")
-        out_final = os.path.join(cache_dir, f"{key}.{fmt}")
-
-        if os.path.exists(out_final):
-            elapsed = int((time.time() - start) * 1000)
-            return out_final, True, elapsed
+        self.render(text)
+        if self._voices is not None:
+            warmed = {self._voices.resolve(None).model}
+            for voice in self._voices.voices():
+                model = self._voices.resolve(voice).model
+                if model in warmed:
+                    continue
+                if not self._voices.has_room():
+                    log.info("model RAM budget reached; %s loads on first use", model)
+                    break
+                self.render(text, voice=voice)
+                warmed.add(model)
+        self.warm = True
+        return int((time.time() - start) * 1000)
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        looked_up = out["fragment_hits"] + out["fragment_misses"]
+        out["fragment_hit_ratio"] = round(out["fragment_hits"] / looked_up, 4) if looked_up else None
+        out["cache"] = self.cache.stats()
+        if self._batcher is not None:
+            out["batching"] = self._batcher.stats()
+        if self._flights is not None:
+            out["single_flight"] = self._flights.stats()
+        if self._memos:
+            out["frontend"] = merge_stats([memo.stats() for memo in list(self._memos.values())])
+        elif self._piper_pool is not None:
+            out["frontend"] = self._piper_pool.frontend_stats()
+        if self._voices is not None:
+            out["models"] = self._voices.stats()
+        if self._infer is not None:
+            out["inference"] = self._infer.stats()
+        return out
+
+    def flush(self):
+        """
+        Blocks until every queued write-behind cache write has landed.
+        """
+        self.cache.flush()
 
+    def render(self, text: str, speed: float = 1.0, voice: Optional[str] = None) -> np.ndarray:
+        """
+        Synthesizes text with voice's model and returns float32 mono PCM at
+        that model's sample rate. Nothing touches the disk.
+        """
         self._load_model()
+        if self._pool is not None:
+            return self._pool.render_batch([text], voice, speed)[0]
+
+        if self._coqui:
+            return self._run_model(self._render_coqui, text, speed, voice)
+
+        # Piper worker pool: raw 16-bit PCM
+        pcm = self._piper_pool.synthesize(text, length_scale=1.0/speed)
+        return to_float32(np.frombuffer(pcm, dtype=np.int16))
+
+    def _run_model(self, fn, *args):
+        # In-process model calls go through the bounded inference executor (cpu.py)
+        return fn(*args) if self._infer is None else self._infer.run(fn, *args)
+
+    def _render_coqui(self, text: str, speed: float, voice: Optional[str]) -> np.ndarray:
+        with self._model(voice) as (tts, spec):
+            # Speaker cloning if provided; some models reject speaker_wav
+            speaker_wav = spec.speaker_wav or self._speaker_wav
+            runner = getattr(tts, "onnx_runner", None)
+            if runner is not None and not speaker_wav:
+                return self._render_onnx(tts, spec, runner, text, speed)
+            # speed reaches VITS / Glow-TTS through _speed and XTTS through the keyword
+            with _speed(speed):
+                if speaker_wav:
+                    try:
+                        wav = tts.tts(text=text, speaker_wav=speaker_wav, speed=speed)
+                    except TypeError:
+                        wav = tts.tts(text=text, speed=speed)
+                else:
+                    wav = tts.tts(text=text, speed=speed, **self._speaker_kwargs(tts, spec))
+        return to_float32(np.asarray(wav))
+
+    def render_batch(self, texts: List[str], voice: Optional[str], speed: float = 1.0) -> List[np.ndarray]:
+        """
+        Renders several texts for one voice/speed, as a single padded forward
+        pass when the model supports it (Coqui VITS) and one by one otherwise.
+        """
+        self._load_model()
+        if self._pool is not None:
+            return self._pool.render_batch(texts, voice, speed)
+        if len(texts) > 1 and self._coqui:
+            with self._model(voice) as (tts, spec):
+                if self._batchable(tts, spec):
+                    try:
+                        return self._run_model(self._render_batch_vits, tts, spec, texts, speed)
+                    except Exception:
+                        log.exception("batched VITS inference failed; falling back to sequential")
+        return [self.render(text, speed, voice) for text in texts]
+
+    def _batchable(self, tts, spec: VoiceSpec) -> bool:
+        model = getattr(getattr(tts, "synthesizer", None), "tts_model", None)
+        return (not (spec.speaker_wav or self._speaker_wav) and type(model).__name__ == "Vits"
+                and getattr(tts, "onnx_runner", None) is None)
+
+    def _render_onnx(self, tts, spec: VoiceSpec, runner, text: str, speed: float) -> np.ndarray:
+        model = tts.synthesizer.tts_model
+        speaker = self._speaker_kwargs(tts, spec).get("speaker")
+        sid = model.speaker_manager.name_to_id[speaker] if speaker is not None else None
+        # Outside _speed, length_scale is the model's configured value
+        return runner.synthesize(model.tokenizer.text_to_ids(text), sid, length_scale=model.length_scale / speed)
+
+    def _render_batch_vits(self, tts, spec: VoiceSpec, texts: List[str], speed: float) -> List[np.ndarray]:
+        import torch
+        model = tts.synthesizer.tts_model
+        ids = [model.tokenizer.text_to_ids(text) for text in texts]
+        lengths = torch.tensor([len(i) for i in ids], dtype=torch.long)
+        x = torch.zeros(len(ids), int(lengths.max()), dtype=torch.long)
+        for row, seq in enumerate(ids):
+            x[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+        aux = {"x_lengths": lengths}
+        speaker = self._speaker_kwargs(tts, spec).get("speaker")
+        if speaker is not None:
+            sid = model.speaker_manager.name_to_id[speaker]
+            aux["speaker_ids"] = torch.full((len(ids),), sid, dtype=torch.long)
+        with _speed(speed), torch.no_grad():
+            out = model.inference(x, aux_input=aux)
+        # Trim each row's padding using its own decoder mask
+        hop = model.config.audio.hop_length
+        frames = out["y_mask"].sum(dim=(1, 2)).long().tolist()
+        wavs = out["model_outputs"].squeeze(1).cpu().numpy()
+        return [to_float32(wavs[row, :n * hop]) for row, n in enumerate(frames)]
 
-        if self.engine == "coqui":
-            # Coqui returns wav file; speaker cloning if provided
-            if self._speaker_wav and hasattr(self._tts, "tts_with_preset"):
-                # Some models support speaker_wav directly; fallback to normal tts
-                try:
-                    self._tts.tts_to_file(text=text, file_path=out_wav, speaker_wav=self._speaker_wav, speed=speed)
-                except TypeError:
-                    self._tts.tts_to_file(text=text, file_path=out_wav, speed=speed)
+    def _voice_model(self, voice: Optional[str]) -> str:
+        if not self._coqui:
+            return self._model_name
+        model = self.voice_spec(voice).model
+        # int8 renders sound slightly different; keep them apart from fp32 ones in the cache
+        return f"{model}+int8" if self._quantize_mode(model) == "int8" else model
+
+    def _cache_meta(self, voice: Optional[str], pcm: np.ndarray, sample_rate: int) -> dict:
+        model = self._voice_model(voice) if self._coqui else self._piper_model
+        return {"engine": self.engine, "model": model, "voice": voice, "duration_ms": int(len(pcm) * 1000 / sample_rate)}
+
+    def _stretched(self, speed: float) -> bool:
+        return TTS_SPEED_MODE == "stretch" and speed != 1.0
+
+    def _speed_tag(self, speed: float) -> str:
+        # Stretched and model-rendered speeds sound different; never serve one for the other
+        return f"{speed}~{TTS_STRETCH_QUALITY}" if self._stretched(speed) else str(speed)
+
+    def _fragment_name(self, sentence: str, voice: Optional[str], speed: float) -> str:
+        key = hashlib.sha1(f"{self.engine}|{self._voice_model(voice)}|{self._piper_model}|{voice}|{self._speed_tag(speed)}|{sentence}".encode("utf-8")).hexdigest()
+        return os.path.join("fragments", f"{key}.wav")
+
+    def _fragments(self, sentences: List[str], voice: Optional[str], speed: float) -> List[Tuple[np.ndarray, int, bool]]:
+        """
+        Returns [(pcm, sample_rate, cache_hit)] per sentence. Fragments are
+        keyed on (engine, model, voice, speed, normalized sentence) so prompts
+        that share sentences share renders. Misses are rendered together so
+        the batch scheduler can group them. In stretch mode other speeds are
+        derived from the (cached) 1.0 fragments rather than re-synthesized.
+        """
+        sentences = [" ".join(s.split()) for s in sentences]
+        names = [self._fragment_name(s, voice, speed) for s in sentences]
+        out, missing = [None] * len(sentences), []
+        for i, name in enumerate(names):
+            data = self.cache.get(name)
+            if data is None:
+                missing.append(i)
+                continue
+            pcm, sr = read_wav(data)
+            out[i] = (pcm, sr, True)
+        self._count("fragment_hits", len(sentences) - len(missing))
+        if not missing:
+            return out
+        texts = [sentences[i] for i in missing]
+        if self._stretched(speed):
+            self._count("stretched_fragments", len(missing))
+            base = self._fragments(texts, voice, 1.0)
+            rendered = [(time_stretch(pcm, sr, speed, TTS_STRETCH_QUALITY), sr) for pcm, sr, _ in base]
+        else:
+            self._count("fragment_misses", len(missing))
+            if self._batcher is not None:
+                futures = [self._batcher.submit(text, voice, speed) for text in texts]
+                pcms = [f.result() for f in futures]
             else:
-                self._tts.tts_to_file(text=text, file_path=out_wav, speed=speed)
+                pcms = [self.render(text, speed, voice) for text in texts]
+            sr = self._voice_rate(voice)
+            rendered = [(pcm, sr) for pcm in pcms]
+        for i, (pcm, sr) in zip(missing, rendered):
+            out[i] = (pcm, sr, False)
+            self.cache.put(names[i], wav_bytes(pcm, sr), **self._cache_meta(voice, pcm, sr))
+        return out
+
+    def _fragment(self, sentence: str, voice: Optional[str], speed: float) -> Tuple[np.ndarray, int, bool]:
+        return self._fragments([sentence], voice, speed)[0]
+
+    def _key(self, text: str, voice: Optional[str], speed: float) -> str:
+        return hashlib.sha1(f"{self.engine}|{self._voice_model(voice)}|{self._piper_model}|{voice}|{self._speed_tag(speed)}|{text}".encode("utf-8")).hexdigest()
 
+    def _canonical(self, key: str, text: str, voice: Optional[str], speed: float) -> Tuple[np.ndarray, int, bool]:
+        """
+        Returns (pcm, sample_rate, cache_hit) for the whole text. The canonical
+        rendering is stored once as <key>.wav; every other format is derived
+        from it. Without one, it is assembled from per-sentence fragments and
+        only sentences missing from the fragment cache are synthesized.
+        """
+        data = self.cache.get(f"{key}.wav")
+        if data is not None:
+            pcm, sr = read_wav(data)
+            return pcm, sr, True
+
+        sentences = split_sentences(text) or [text]
+        fragments = self._fragments(sentences, voice, speed)
+        sr = fragments[0][1]
+        pcm = concat([pcm for pcm, _, _ in fragments], sr, SENTENCE_PAUSE_MS)
+        self.cache.put(f"{key}.wav", wav_bytes(pcm, sr), **self._cache_meta(voice, pcm, sr))
+        return pcm, sr, all(hit for _, _, hit in fragments)
+
+    def render_sentences(self, sentences: List[str], voice: Optional[str], speed: float = 1.0) -> Tuple[np.ndarray, int]:
+        """
+        Returns (pcm, sample_rate) for already normalized sentences joined
+        with sentence pauses, through the fragment cache. Nothing is stored
+        for the whole; long-form jobs (jobs.py) assemble their own output.
+        """
+        fragments = self._fragments(sentences, voice, speed)
+        sr = fragments[0][1]
+        return concat([pcm for pcm, _, _ in fragments], sr, SENTENCE_PAUSE_MS), sr
+
+    def parallelism(self) -> int:
+        """
+        How many renders can usefully run at once: one per synthesis worker
+        process, or the in-process inference executor's concurrency.
+        """
+        self._load_model()
+        if self._pool is not None:
+            return self._pool.size
+        if self._piper_pool is not None:
+            return self._piper_pool.size
+        return self._infer.concurrency if self._infer is not None else 1
+
+    def cached(self, text: str, voice: Optional[str], speed: float = 1.0, fmt: str = "mp3") -> bool:
+        """
+        True when synth would serve this variant straight from the cache.
+        """
+        key = self._key(normalize(text, TTS_NORMALIZE), voice, speed)
+        return self.cache.contains(f"{key}.{fmt}")
+
+    def synth(self, text: str, voice: Optional[str], speed: float = 1.0, fmt: str = "mp3") -> Tuple[bytes, bool, int, Optional[int]]:
+        """
+        Returns (audio_bytes, cache_hit, elapsed_ms, duration_ms)
+        Lookup order: the encoded variant, then the canonical PCM rendering
+        (re-encoded, no inference), then per-sentence fragments. Cache keys
+        and the synthesizer both see the normalized text. Concurrent misses
+        for the same variant wait on a single synthesis (see SingleFlight);
+        the callers that waited report a cache hit.
+        """
+        start = time.time()
+        text = normalize(text, TTS_NORMALIZE)
+        key = self._key(text, voice, speed)
+        out_final = f"{key}.{fmt}"
+
+        data = self.cache.get(out_final)
+        if data is not None:
+            self._count("full_hits")
+            duration_ms = (self.cache.meta(out_final) or {}).get("duration_ms")
+            elapsed = int((time.time() - start) * 1000)
+            return data, True, elapsed, duration_ms
+
+        produce = lambda: self._produce(key, out_final, text, voice, speed, fmt)
+        if self._flights is None:
+            data, cache_hit, duration_ms = produce()
         else:
-            # Piper CLI usage
-            if not shutil.which("piper"):
-                raise RuntimeError("piper binary not found in PATH")
-            with open(out_wav, "wb") as f:
-                proc = subprocess.Popen(["piper", "--model", self._piper_model, "--length_scale", str(1.0/speed)], stdin=subprocess.PIPE, stdout=f)
-                proc.communicate(text.encode("utf-8"))
-                if proc.returncode != 0:
-                    raise RuntimeError("piper synthesis failed")
-
-        # Convert to final format if needed
+            (data, cache_hit, duration_ms), shared = self._flights.do(out_final, produce)
+            if shared:
+                self._count("coalesced")
+                cache_hit = True
+        elapsed = int((time.time() - start) * 1000)
+        return data, cache_hit, elapsed, duration_ms
+
+    def _produce(self, key: str, out_final: str, text: str, voice: Optional[str], speed: float,
+                 fmt: str) -> Tuple[bytes, bool, Optional[int]]:
+        # Another worker process may have rendered it while we queued for the lock; only SQLite knows yet
+        data = self.cache.get(out_final, shared=True)
+        if data is not None:
+            self._count("full_hits")
+            return data, True, (self.cache.meta(out_final) or {}).get("duration_ms")
+
+        pcm, sr, cache_hit = self._canonical(key, text, voice, speed)
         if fmt == "wav":
-            final_path = out_wav
+            data = wav_bytes(pcm, sr)
         else:
-            audio = AudioSegment.from_wav(out_wav)
-            if fmt == "mp3":
-                final_path = out_final
-                audio.export(final_path, format="mp3")
-            elif fmt == "ogg":
-                final_path = out_final
-                audio.export(final_path, format="ogg")
-            else:
-                final_path = out_wav  # default
+            if cache_hit:
+                self._count("derived_hits")
+            data = encode(pcm, sr, fmt)
+            self.cache.put(out_final, data, **self._cache_meta(voice, pcm, sr))
+        return data, cache_hit, int(len(pcm) * 1000 / sr)
 
-        elapsed = int((time.time() - start) * 1000)
-        return final_path, False, elapsed
+    def synth_stream(self, text: str, voice: Optional[str], speed: float = 1.0, fmt: str = "mp3") -> Iterator[bytes]:
+        """
+        Yields encoded audio one sentence at a time, rendering the next sentence
+        while the current one is being sent. Every sentence goes through one
+        StreamEncoder, so the response is a single mp3/Ogg/ADTS stream; wav is
+        sent as one header followed by raw PCM.
+        """
+        text = normalize(text, TTS_NORMALIZE)
+        sentences = split_sentences(text) or [text]
+        encoder = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-stream") as pool:
+            pending = pool.submit(self._fragment, sentences[0], voice, speed)
+            for i in range(len(sentences)):
+                pcm, sr, _ = pending.result()
+                if i + 1 < len(sentences):
+                    pending = pool.submit(self._fragment, sentences[i + 1], voice, speed)
+                if encoder is None:
+                    encoder = StreamEncoder(fmt, sr)
+                if i > 0:
+                    pcm = concat([np.zeros(0, dtype=np.float32), pcm], sr, SENTENCE_PAUSE_MS)
+                data = encoder.write(pcm)
+                if data:
+                    yield data
+        tail = encoder.close()
+        if tail:
+            yield tail
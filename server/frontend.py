@@ -0,0 +1,192 @@
+# server/frontend.py
+"""
+Memoized text frontend. Synthesis repeats text cleaning, espeak-ng
+phonemization and tokenization for the same small vocabulary (brand names,
+place names, currency phrases) on every request. Here phonemization happens
+once per word: each word's phoneme-ID (Coqui) or phoneme (Piper) sequence is
+memoized in a bounded LRU, optionally backed by a SQLite file that every
+worker process shares, and a sentence's tokens are assembled from the
+cached pieces before they reach the acoustic model.
+
+Words are phonemized in isolation, so espeak's cross-word effects within a
+sentence are lost; for English prompts the difference is negligible.
+"""
+import os, re, json, time, sqlite3, logging, threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+log = logging.getLogger("odiadev.tts.frontend")
+
+# Words (with inner apostrophes), single punctuation marks, and whitespace runs
+_TOKEN = re.compile(r"\w+(?:['’]\w+)*|\s+|[^\w\s]")
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text)
+
+class PhonemeMemo:
+    """
+    Thread-safe LRU of word -> sequence for one frontend (namespace, e.g.
+    the model name). With db_path set, misses fall through to a SQLite table
+    shared by every process using the same file before being computed.
+    """
+
+    def __init__(self, namespace: str, size: int = 50000, db_path: Optional[str] = None):
+        self.namespace = namespace
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "miss_ms": 0.0}
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS phonemes (namespace TEXT, word TEXT, seq TEXT, "
+                                 "PRIMARY KEY (namespace, word))")
+                self._db.commit()
+            except sqlite3.Error:
+                log.exception("phoneme cache %s unusable; memoizing in memory only", db_path)
+                self._db = None
+
+    def lookup(self, word: str, compute: Callable[[str], list]) -> list:
+        with self._lock:
+            seq = self._lru.get(word)
+            if seq is not None:
+                self._lru.move_to_end(word)
+                self._stats["hits"] += 1
+                return seq
+        seq = self._db_get(word)
+        if seq is not None:
+            with self._lock:
+                self._stats["disk_hits"] += 1
+        else:
+            start = time.perf_counter()
+            seq = list(compute(word))
+            ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats["misses"] += 1
+                self._stats["miss_ms"] += ms
+            self._db_put(word, seq)
+        with self._lock:
+            self._lru[word] = seq
+            self._lru.move_to_end(word)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+        return seq
+
+    def _db_get(self, word: str) -> Optional[list]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT seq FROM phonemes WHERE namespace = ? AND word = ?",
+                                       (self.namespace, word)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _db_put(self, word: str, seq: list):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute("INSERT OR REPLACE INTO phonemes VALUES (?, ?, ?)",
+                                 (self.namespace, word, json.dumps(seq, ensure_ascii=False)))
+                self._db.commit()
+        except sqlite3.Error:
+            log.warning("could not persist phonemes for %r", word)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, entries=len(self._lru), size=self.size, shared=self._db is not None)
+        # Every hit skips one phonemizer call of the average measured cost
+        per_miss = out["miss_ms"] / out["misses"] if out["misses"] else 0.0
+        looked_up = out["hits"] + out["disk_hits"] + out["misses"]
+        out.update(
+            miss_ms=round(out["miss_ms"], 1),
+            saved_ms=round((out["hits"] + out["disk_hits"]) * per_miss, 1),
+            hit_ratio=round((out["hits"] + out["disk_hits"]) / looked_up, 4) if looked_up else None,
+        )
+        return out
+
+def merge_stats(reports: List[dict]) -> Optional[dict]:
+    """
+    Sums PhonemeMemo.stats() reports (several models or worker processes).
+    """
+    reports = [r for r in reports if r]
+    if not reports:
+        return None
+    out = {k: round(sum(r.get(k) or 0 for r in reports), 1)
+           for k in ("hits", "disk_hits", "misses", "miss_ms", "saved_ms", "entries")}
+    looked_up = out["hits"] + out["disk_hits"] + out["misses"]
+    out["hit_ratio"] = round((out["hits"] + out["disk_hits"]) / looked_up, 4) if looked_up else None
+    return out
+
+class CoquiFrontend:
+    """
+    Drop-in for TTSTokenizer.text_to_ids: cleans the whole text, then
+    assembles IDs from memoized per-word phoneme IDs before adding blanks
+    and BOS/EOS exactly as the tokenizer would.
+    """
+
+    def __init__(self, tokenizer, memo: PhonemeMemo):
+        self.tokenizer = tokenizer
+        self.memo = memo
+        self._text_to_ids = tokenizer.text_to_ids
+
+    @classmethod
+    def install(cls, tokenizer, memo: PhonemeMemo) -> Optional["CoquiFrontend"]:
+        # Only phoneme-based tokenizers pay for espeak; character models keep their own path
+        if tokenizer is None or not getattr(tokenizer, "use_phonemes", False) or getattr(tokenizer, "phonemizer", None) is None:
+            return None
+        frontend = cls(tokenizer, memo)
+        tokenizer.text_to_ids = frontend.text_to_ids
+        return frontend
+
+    def _word_ids(self, language: Optional[str]):
+        tok = self.tokenizer
+        return lambda word: tok.encode(tok.phonemizer.phonemize(word, separator="", language=language))
+
+    def text_to_ids(self, text: str, language: Optional[str] = None) -> List[int]:
+        tok = self.tokenizer
+        if tok.text_cleaner is not None:
+            text = tok.text_cleaner(text)
+        ids, word_ids = [], self._word_ids(language)
+        for piece in tokens(text):
+            if piece[0].isspace():
+                ids.extend(tok.encode(" "))
+            elif piece[0].isalnum() or piece[0] == "_":
+                ids.extend(self.memo.lookup(f"{language}|{piece}" if language else piece, lambda _: word_ids(piece)))
+            else:
+                ids.extend(tok.encode(piece))
+        if tok.add_blank:
+            ids = tok.intersperse_blank_char(ids, True)
+        if tok.use_eos_bos:
+            ids = tok.pad_with_bos_eos(ids)
+        return ids
+
+class PiperFrontend:
+    """
+    Builds Piper phoneme IDs for a text from memoized per-word phonemes;
+    punctuation and spaces pass through as phonemes of their own.
+    """
+
+    def __init__(self, voice, memo: PhonemeMemo):
+        self.voice = voice
+        self.memo = memo
+
+    def _phonemize(self, word: str) -> List[str]:
+        return [p for sentence in self.voice.phonemize(word) for p in sentence]
+
+    def phoneme_ids(self, text: str) -> List[int]:
+        phonemes = []
+        for piece in tokens(text):
+            if piece[0].isspace():
+                phonemes.append(" ")
+            elif piece[0].isalnum() or piece[0] == "_":
+                phonemes.extend(self.memo.lookup(piece, self._phonemize))
+            else:
+                phonemes.append(piece)
+        return self.voice.phonemes_to_ids(phonemes)
@@ -0,0 +1,371 @@
+# server/jobs.py
+"""
+Long-form asynchronous synthesis (/v1/tts/jobs). A job's text (up to
+TTS_JOB_MAX_CHARS) is normalized and split at sentence boundaries (sentences
+too long for one model call at clauses or words) into chunks of about
+TTS_JOB_CHUNK_CHARS. Chunks render in parallel, one per
+synthesis worker, through the engine's fragment cache, and are stitched in
+order with short equal-power crossfades through the sentence pause before
+the result is written under <cache root>/jobs.
+
+Job state lives in SQLite next to the output, so a restart requeues jobs
+that were queued or running; sentences that had already rendered come
+back from the fragment cache, so resuming costs little.
+"""
+import os, json, time, uuid, wave, sqlite3, asyncio, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import AsyncIterator, Callable, List, Optional
+
+import numpy as np
+
+from .audio import crossfade, to_float32, to_int16
+from .encoders import StreamEncoder
+from .engine import SENTENCE_PAUSE_MS, TTS_NORMALIZE
+from .text import normalize, split_sentences
+
+log = logging.getLogger("odiadev.tts.jobs")
+
+TTS_JOB_MAX_CHARS = int(os.getenv("TTS_JOB_MAX_CHARS", "100000"))
+TTS_JOB_CHUNK_CHARS = int(os.getenv("TTS_JOB_CHUNK_CHARS", "600"))
+# Chunks rendered at once per job (0 = engine.parallelism())
+TTS_JOB_CONCURRENCY = int(os.getenv("TTS_JOB_CONCURRENCY", "0"))
+# Jobs rendered at once; the rest wait in the queue
+TTS_JOB_WORKERS = int(os.getenv("TTS_JOB_WORKERS", "1"))
+# Queued + running jobs accepted before submissions are refused
+TTS_JOB_MAX_ACTIVE = int(os.getenv("TTS_JOB_MAX_ACTIVE", "50"))
+TTS_JOB_CROSSFADE_MS = float(os.getenv("TTS_JOB_CROSSFADE_MS", "20"))
+# Finished jobs (and their audio) are deleted after this many hours
+TTS_JOB_TTL_H = float(os.getenv("TTS_JOB_TTL_H", "24"))
+TTS_JOB_DIR = os.getenv("TTS_JOB_DIR") or None
+
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    owner        TEXT,
+    status       TEXT NOT NULL,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL,
+    voice        TEXT,
+    speed        REAL NOT NULL,
+    fmt          TEXT NOT NULL,
+    chars        INTEGER NOT NULL,
+    text         TEXT NOT NULL,
+    chunks_total INTEGER NOT NULL,
+    chunks_done  INTEGER NOT NULL DEFAULT 0,
+    path         TEXT,
+    bytes        INTEGER,
+    duration_ms  INTEGER,
+    s3_key       TEXT,
+    error        TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+"""
+# Never shown to clients
+_PRIVATE = ("owner", "text", "path", "s3_key")
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    # A sentence over max_chars breaks after a comma, semicolon or colon in its second
+    # half, else at the last space, else hard at max_chars
+    pieces, rest = [], sentence
+    while len(rest) > max_chars:
+        head = rest[:max_chars + 1]
+        cut = max(head.rfind(", "), head.rfind("; "), head.rfind(": ")) + 1
+        if cut <= max_chars // 2:
+            cut = head.rfind(" ")
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(rest[:cut].strip())
+        rest = rest[cut:].strip()
+    return pieces + ([rest] if rest else [])
+
+def chunk_text(text: str, max_chars: Optional[int] = None) -> List[List[str]]:
+    """
+    Packs consecutive sentences into chunks of at most max_chars (default
+    TTS_JOB_CHUNK_CHARS). A longer sentence is split at clause punctuation,
+    then between words, so no single model call exceeds max_chars.
+    """
+    max_chars = max_chars or TTS_JOB_CHUNK_CHARS
+    chunks, current, size = [], [], 0
+    for sentence in split_sentences(text) or [text]:
+        for piece in _split_long(sentence, max_chars):
+            if current and size + len(piece) > max_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append(current)
+    return chunks
+
+class JobStore:
+    """
+    SQLite-backed job records, safe to share across threads.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def insert(self, **row):
+        cols = ", ".join(row)
+        with self._lock:
+            self._db.execute(f"INSERT INTO jobs ({cols}) VALUES ({', '.join('?' * len(row))})", tuple(row.values()))
+            self._db.commit()
+
+    def update(self, job_id: str, **fields):
+        fields["updated"] = time.time()
+        sets = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {sets} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def ids(self, statuses) -> List[str]:
+        marks = ", ".join("?" * len(statuses))
+        with self._lock:
+            rows = self._db.execute(f"SELECT id FROM jobs WHERE status IN ({marks}) ORDER BY created", tuple(statuses))
+            return [r[0] for r in rows.fetchall()]
+
+    def count(self, statuses) -> int:
+        return len(self.ids(statuses))
+
+    def expired(self, before: float) -> List[dict]:
+        marks = ", ".join("?" * len(FINISHED))
+        with self._lock:
+            rows = self._db.execute(f"SELECT id, path FROM jobs WHERE status IN ({marks}) AND updated < ?",
+                                    (*FINISHED, before)).fetchall()
+        return [dict(r) for r in rows]
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.commit()
+
+def public(job: dict) -> dict:
+    out = {k: v for k, v in job.items() if k not in _PRIVATE}
+    out["progress"] = round(job["chunks_done"] / job["chunks_total"], 4) if job["chunks_total"] else 0.0
+    return out
+
+class _Stitcher:
+    """
+    Receives chunk PCM in order and writes it to `sink` as it goes,
+    holding back each chunk's last fade samples to crossfade them with the
+    next chunk's head.
+    """
+
+    def __init__(self, sink: Callable[[np.ndarray], None], sample_rate: int, fade_ms: float, gap_ms: float):
+        self.sink, self.sr, self.fade_ms, self.gap_ms = sink, sample_rate, fade_ms, gap_ms
+        self.fade = int(sample_rate * fade_ms / 1000)
+        self.held = None
+        self.samples = 0
+
+    def add(self, pcm: np.ndarray):
+        pcm = to_float32(pcm)
+        joined = pcm if self.held is None else crossfade(self.held, pcm, self.sr, self.fade_ms, self.gap_ms)
+        keep = min(self.fade, len(joined))
+        self._emit(joined[:len(joined) - keep])
+        self.held = joined[len(joined) - keep:]
+
+    def close(self):
+        if self.held is not None:
+            self._emit(self.held)
+            self.held = None
+
+    def _emit(self, pcm: np.ndarray):
+        if len(pcm):
+            self.samples += len(pcm)
+            self.sink(pcm)
+
+class JobManager:
+    """
+    Accepts jobs, renders them on a small pool and records progress in a
+    JobStore. on_done(job, data_path) runs after a job's audio is written
+    and may return fields to record (e.g. {"s3_key": ...}).
+    """
+
+    def __init__(self, engine, root: Optional[str] = None, on_done: Optional[Callable[[dict, str], Optional[dict]]] = None):
+        self.engine = engine
+        self.root = root or TTS_JOB_DIR or os.path.join(engine.cache.root, "jobs")
+        self.store = JobStore(os.path.join(self.root, "jobs.sqlite3"))
+        self._on_done = on_done
+        self._runner = None
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Requeues jobs a previous process left queued or running, and drops
+        expired ones. Idempotent until close().
+        """
+        with self._lock:
+            if self._runner is not None:
+                return
+            self._closing = threading.Event()
+            self._runner = ThreadPoolExecutor(max_workers=max(1, TTS_JOB_WORKERS), thread_name_prefix="tts-job")
+        self.purge_expired()
+        for job_id in self.store.ids(ACTIVE):
+            self.store.update(job_id, status="queued")
+            self._runner.submit(self._run, job_id, self._closing)
+            log.info("requeued job %s", job_id)
+
+    def close(self):
+        # Running jobs stop between chunks and stay 'running', so the next start requeues them
+        with self._lock:
+            runner, self._runner = self._runner, None
+        if runner is not None:
+            self._closing.set()
+            runner.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, text: str, voice: Optional[str], speed: float, fmt: str, owner: Optional[str] = None) -> dict:
+        """
+        Queues a job and returns its public record. Raises ValueError for
+        text over TTS_JOB_MAX_CHARS and OverflowError when TTS_JOB_MAX_ACTIVE
+        jobs are already queued or running.
+        """
+        self.start()
+        if len(text) > TTS_JOB_MAX_CHARS:
+            raise ValueError(f"text is {len(text)} characters; the limit is {TTS_JOB_MAX_CHARS}")
+        if self.store.count(ACTIVE) >= TTS_JOB_MAX_ACTIVE:
+            raise OverflowError(f"{TTS_JOB_MAX_ACTIVE} jobs are already queued or running")
+        self.purge_expired()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self.store.insert(id=job_id, owner=owner, status="queued", created=now, updated=now, voice=voice,
+                          speed=speed, fmt=fmt, chars=len(text), text=text,
+                          chunks_total=len(chunk_text(normalize(text, TTS_NORMALIZE))))
+        self._runner.submit(self._run, job_id, self._closing)
+        return public(self.store.get(job_id))
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None or (owner is not None and job["owner"] != owner):
+            return None
+        return job
+
+    def purge_expired(self) -> int:
+        expired = self.store.expired(time.time() - TTS_JOB_TTL_H * 3600)
+        for job in expired:
+            if job["path"]:
+                with suppress(FileNotFoundError):
+                    os.remove(job["path"])
+            self.store.delete(job["id"])
+        return len(expired)
+
+    def _run(self, job_id: str, closing: threading.Event):
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            return
+        start = time.time()
+        self.store.update(job_id, status="running", chunks_done=0, error=None)
+        path = os.path.join(self.root, f"{job_id}.{job['fmt']}")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            chunks = chunk_text(normalize(job["text"], TTS_NORMALIZE))
+            samples, sr = self._render(job, chunks, tmp, closing)
+            if samples is None:
+                return  # shutting down; requeued on the next start
+            os.replace(tmp, path)
+            fields = {"status": "done", "path": path, "bytes": os.path.getsize(path),
+                      "duration_ms": int(samples * 1000 / sr), "chunks_done": len(chunks)}
+            if self._on_done is not None:
+                try:
+                    fields.update(self._on_done(dict(job, **fields), path) or {})
+                except Exception:
+                    log.exception("on_done hook failed for job %s", job_id)
+            self.store.update(job_id, **fields)
+            log.info("job %s: %s chars, %s chunks in %s ms", job_id, job["chars"], len(chunks), int((time.time() - start) * 1000))
+        except Exception as e:
+            log.exception("job %s failed", job_id)
+            self.store.update(job_id, status="failed", error=str(e))
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+
+    def _render(self, job: dict, chunks: List[List[str]], out_path: str, closing: threading.Event):
+        """
+        Renders chunks with a bounded look-ahead window (so memory stays at a
+        few chunks however long the text) and streams them through a
+        _Stitcher into out_path. Returns (samples, sample_rate), or
+        (None, None) if the manager is closing.
+        """
+        width = max(1, TTS_JOB_CONCURRENCY or self.engine.parallelism())
+        done = [0]
+        done_lock = threading.Lock()
+
+        def render(sentences):
+            pcm = self.engine.render_sentences(sentences, job["voice"], job["speed"])
+            with done_lock:
+                done[0] += 1
+                self.store.update(job["id"], chunks_done=done[0])
+            return pcm
+
+        fmt, writer, encoder, stitcher = job["fmt"], None, None, None
+        with open(out_path, "wb") as f, ThreadPoolExecutor(max_workers=width, thread_name_prefix="tts-job-chunk") as pool:
+            futures = [pool.submit(render, c) for c in chunks[:2 * width]]
+            for i in range(len(chunks)):
+                if closing.is_set():
+                    for fut in futures[i:]:
+                        fut.cancel()
+                    return None, None
+                pcm, sr = futures[i].result()
+                if i + 2 * width < len(chunks):
+                    futures.append(pool.submit(render, chunks[i + 2 * width]))
+                futures[i] = None
+                if stitcher is None:
+                    if fmt == "wav":
+                        writer = wave.open(f, "wb")
+                        writer.setnchannels(1)
+                        writer.setsampwidth(2)
+                        writer.setframerate(sr)
+                        sink = lambda x: writer.writeframes(to_int16(x).tobytes())
+                    else:
+                        # One encoder for the whole job: a single mp3 stream / ogg logical stream
+                        encoder = StreamEncoder(fmt, sr)
+                        sink = lambda x: f.write(encoder.write(x))
+                    stitcher = _Stitcher(sink, sr, TTS_JOB_CROSSFADE_MS, SENTENCE_PAUSE_MS)
+                stitcher.add(pcm)
+            stitcher.close()
+            if writer is not None:
+                writer.close()
+            if encoder is not None:
+                f.write(encoder.close())
+        return stitcher.samples, stitcher.sr
+
+async def events(manager: JobManager, job_id: str, owner: Optional[str] = None,
+                 interval_s: float = 0.5, heartbeat_s: float = 15.0) -> AsyncIterator[str]:
+    """
+    Server-sent events for one job: a 'progress' event whenever its record
+    changes and a final 'done' or 'failed' event, with comment heartbeats
+    in between so proxies keep the connection open.
+    """
+    last, quiet = None, 0.0
+    while True:
+        job = manager.get(job_id, owner)
+        if job is None:
+            yield f"event: failed\ndata: {json.dumps({'id': job_id, 'error': 'job not found'})}\n\n"
+            return
+        state = public(job)
+        if state != last:
+            kind = job["status"] if job["status"] in FINISHED else "progress"
+            yield f"event: {kind}\ndata: {json.dumps(state)}\n\n"
+            last, quiet = state, 0.0
+            if kind != "progress":
+                return
+        elif quiet >= heartbeat_s:
+            yield ": keep-alive\n\n"
+            quiet = 0.0
+        await asyncio.sleep(interval_s)
+        quiet += interval_s
@@ -0,0 +1,164 @@
+# server/onnx_backend.py
+"""
+ONNX Runtime inference for Coqui VITS models (TTS_ENGINE=onnx). The model
+is exported once with Vits.export_onnx, the graph is cached on disk under
+TTS_ONNX_DIR, and inference runs in an onnxruntime session with
+explicit intra-/inter-op thread counts. The Coqui tokenizer (and the
+phoneme memo in front of it) still produces the input IDs.
+
+    python -m server.onnx_backend --model tts_models/en/vctk/vits --parity "Welcome to ODIADEV."
+
+exports (if needed) and compares ONNX against PyTorch output.
+"""
+import os, re, sys, json, time, logging, argparse, tempfile
+from typing import Optional
+
+import numpy as np
+
+from . import cpu
+from .audio import to_float32
+
+log = logging.getLogger("odiadev.tts.onnx")
+
+# Exported graphs; defaults to <TTS_MODEL_DIR>/onnx
+TTS_ONNX_DIR = os.getenv("TTS_ONNX_DIR") or None
+# 0 = TTS_SYNTH_CONCURRENCY x TTS_INFER_THREADS: concurrent runs share one session's pool
+TTS_ONNX_INTRA_THREADS = int(os.getenv("TTS_ONNX_INTRA_THREADS", "0"))
+TTS_ONNX_INTER_THREADS = int(os.getenv("TTS_ONNX_INTER_THREADS", "1"))
+
+def graph_path(model_name: str, root: Optional[str] = None) -> str:
+    root = root or TTS_ONNX_DIR or os.path.join(os.getenv("TTS_MODEL_DIR") or tempfile.gettempdir(), "onnx")
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "--", model_name) + ".onnx")
+
+def export(vits, path: str):
+    """
+    Exports a Coqui Vits model to path atomically (temp file, then rename),
+    so concurrent workers never load a half-written graph.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    start = time.time()
+    try:
+        vits.export_onnx(output_path=tmp, verbose=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    log.info("exported %s in %s ms", path, int((time.time() - start) * 1000))
+
+def session(path: str, intra_threads: int = TTS_ONNX_INTRA_THREADS, inter_threads: int = TTS_ONNX_INTER_THREADS):
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    concurrency, threads = cpu.plan()
+    opts.intra_op_num_threads = intra_threads or concurrency * threads
+    opts.inter_op_num_threads = max(1, inter_threads)
+    # Idle pool threads busy-wait by default, stealing cores from concurrent inferences
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "0" if concurrency > 1 else "1")
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+class OnnxVits:
+    """
+    Runs one exported VITS graph. Scales are passed per call, so concurrent
+    requests at different speeds never touch shared model state.
+    """
+
+    def __init__(self, vits, sess, graph_bytes: int = 0):
+        self.vits = vits
+        self.sess = sess
+        self.graph_bytes = graph_bytes
+        self._inputs = {i.name for i in sess.get_inputs()}
+
+    def synthesize(self, ids, speaker_id: Optional[int] = None, length_scale: Optional[float] = None,
+                   noise_scale: Optional[float] = None, noise_scale_dp: Optional[float] = None) -> np.ndarray:
+        vits = self.vits
+        feed = {
+            "input": np.asarray([ids], dtype=np.int64),
+            "input_lengths": np.asarray([len(ids)], dtype=np.int64),
+            "scales": np.asarray([
+                vits.inference_noise_scale if noise_scale is None else noise_scale,
+                vits.length_scale if length_scale is None else length_scale,
+                vits.inference_noise_scale_dp if noise_scale_dp is None else noise_scale_dp,
+            ], dtype=np.float32),
+        }
+        if "sid" in self._inputs and speaker_id is not None:
+            feed["sid"] = np.asarray([speaker_id], dtype=np.int64)
+        return to_float32(self.sess.run(["output"], feed)[0].reshape(-1))
+
+def release_torch(vits):
+    # Only the tokenizer, scales and speaker map are used once the graph runs
+    import torch
+    for p in vits.parameters():
+        p.data = torch.empty(0, dtype=p.dtype)
+
+def load(tts, model_name: str, root: Optional[str] = None, keep_torch: bool = False) -> OnnxVits:
+    """
+    Returns an OnnxVits for a loaded Coqui TTS, exporting its VITS model to
+    the on-disk graph cache the first time. Unless keep_torch, the PyTorch
+    weights are released afterwards. Raises TypeError for non-VITS models.
+    """
+    vits = tts.synthesizer.tts_model
+    if type(vits).__name__ != "Vits":
+        raise TypeError(f"{model_name} is {type(vits).__name__}, not VITS; ONNX export unsupported")
+    path = graph_path(model_name, root)
+    if not os.path.exists(path):
+        export(vits, path)
+    runner = OnnxVits(vits, session(path), os.path.getsize(path))
+    if not keep_torch:
+        release_torch(vits)
+    return runner
+
+def parity(tts, runner: OnnxVits, text: str, speaker_id: Optional[int] = None) -> dict:
+    """
+    Renders text through PyTorch and ONNX with sampling noise off and
+    compares them: lengths, max abs difference and SNR of ONNX vs PyTorch.
+    """
+    import torch
+    vits = runner.vits
+    ids = vits.tokenizer.text_to_ids(text)
+    aux = {"x_lengths": torch.tensor([len(ids)])}
+    if speaker_id is not None:
+        aux["speaker_ids"] = torch.tensor([speaker_id])
+    saved = vits.inference_noise_scale, vits.inference_noise_scale_dp
+    try:
+        vits.inference_noise_scale = vits.inference_noise_scale_dp = 0.0
+        start = time.time()
+        with torch.no_grad():
+            ref = vits.inference(torch.tensor([ids]), aux_input=aux)["model_outputs"].reshape(-1).cpu().numpy()
+        torch_ms = (time.time() - start) * 1000
+    finally:
+        vits.inference_noise_scale, vits.inference_noise_scale_dp = saved
+    start = time.time()
+    out = runner.synthesize(ids, speaker_id, noise_scale=0.0, noise_scale_dp=0.0)
+    onnx_ms = (time.time() - start) * 1000
+    n = min(len(ref), len(out))
+    err = out[:n] - ref[:n]
+    snr = 10 * np.log10(np.sum(ref[:n] ** 2) / max(np.sum(err ** 2), 1e-12)) if n else None
+    return {"torch_samples": int(len(ref)), "onnx_samples": int(len(out)),
+            "max_abs_diff": float(np.max(np.abs(err))) if n else None,
+            "snr_db": round(float(snr), 2) if snr is not None else None,
+            "torch_ms": round(torch_ms, 1), "onnx_ms": round(onnx_ms, 1)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export a Coqui VITS model to ONNX and check parity with PyTorch")
+    parser.add_argument("--model", default=os.getenv("COQUI_MODEL_NAME", "tts_models/en/vctk/vits"))
+    parser.add_argument("--parity", metavar="TEXT", help="compare ONNX and PyTorch output for TEXT")
+    parser.add_argument("--min-snr-db", type=float, default=30.0, help="parity threshold")
+    args = parser.parse_args(argv)
+
+    from TTS.api import TTS as COQUI_TTS
+    tts = COQUI_TTS(args.model)
+    runner = load(tts, args.model, keep_torch=True)
+    print(json.dumps({"graph": graph_path(args.model)}))
+    if not args.parity:
+        return 0
+    speakers = getattr(tts, "speakers", None) or []
+    sid = tts.synthesizer.tts_model.speaker_manager.name_to_id[speakers[0]] if speakers else None
+    report = parity(tts, runner, args.parity, sid)
+    print(json.dumps(report))
+    return 0 if report["snr_db"] is not None and report["snr_db"] >= args.min_snr_db else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
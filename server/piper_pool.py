@@ -0,0 +1,193 @@
+# server/piper_pool.py
+import os, sys, json, time, queue, select, logging, threading, subprocess, itertools
+from typing import Optional
+
+from .frontend import merge_stats
+
+log = logging.getLogger("odiadev.tts.piper")
+
+class PiperWorkerError(RuntimeError):
+    pass
+
+class PiperWorker:
+    """
+    One long-lived `server.piper_worker` process. Not thread-safe; the pool
+    hands each worker to one caller at a time.
+    """
+
+    def __init__(self, model: str, config: Optional[str], timeout_s: float,
+                 phoneme_memo_size: int = 0, phoneme_db: Optional[str] = None):
+        self._cmd = [sys.executable, "-m", f"{__package__}.piper_worker", "--model", model]
+        if config:
+            self._cmd += ["--config", config]
+        if phoneme_memo_size > 0:
+            self._cmd += ["--phoneme-memo-size", str(phoneme_memo_size)]
+            if phoneme_db:
+                self._cmd += ["--phoneme-db", phoneme_db]
+        self._timeout_s = timeout_s
+        self._ids = itertools.count()
+        self._proc = None
+        self._buf = bytearray()
+        self.sample_rate = None
+        # Latest phoneme memo stats reported by the process
+        self.frontend = None
+
+    def start(self, timeout_s: Optional[float] = None):
+        self.stop()
+        self._buf = bytearray()
+        # bufsize=0: reads go through select() on the raw pipe
+        self._proc = subprocess.Popen(self._cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        hello = self._read_header(time.time() + (timeout_s or self._timeout_s))
+        if not hello.get("ready"):
+            raise PiperWorkerError(f"unexpected worker handshake: {hello}")
+        self.sample_rate = int(hello["sample_rate"])
+
+    def stop(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=2)
+        except Exception:
+            self._proc.kill()
+        self._proc = None
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _read_exact(self, n: int, deadline: float) -> bytes:
+        fd = self._proc.stdout.fileno()
+        while len(self._buf) < n:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise PiperWorkerError("piper worker timed out")
+            chunk = os.read(fd, max(65536, n - len(self._buf)))
+            if not chunk:
+                raise PiperWorkerError("piper worker exited")
+            self._buf += chunk
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def _read_header(self, deadline: float) -> dict:
+        fd = self._proc.stdout.fileno()
+        while b"\n" not in self._buf:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise PiperWorkerError("piper worker timed out")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise PiperWorkerError("piper worker exited")
+            self._buf += chunk
+        line, _, rest = bytes(self._buf).partition(b"\n")
+        self._buf = bytearray(rest)
+        return json.loads(line)
+
+    def _request(self, payload: dict) -> bytes:
+        req_id = str(next(self._ids))
+        deadline = time.time() + self._timeout_s
+        try:
+            self._proc.stdin.write(json.dumps({"id": req_id, **payload}).encode("utf-8") + b"\n")
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError, AttributeError):
+            raise PiperWorkerError("piper worker exited")
+        pcm = bytearray()
+        while True:
+            header = self._read_header(deadline)
+            if header.get("id") != req_id:
+                raise PiperWorkerError(f"out-of-order reply from piper worker: {header}")
+            if "error" in header:
+                raise RuntimeError(f"piper synthesis failed: {header['error']}")
+            if header.get("done"):
+                self.frontend = header.get("frontend", self.frontend)
+                return bytes(pcm)
+            pcm += self._read_exact(int(header["bytes"]), deadline)
+
+    def synthesize(self, text: str, length_scale: float = 1.0) -> bytes:
+        """
+        Returns raw 16-bit mono PCM at self.sample_rate.
+        """
+        return self._request({"text": text, "length_scale": length_scale})
+
+    def ping(self, timeout_s: float = 5.0) -> bool:
+        saved, self._timeout_s = self._timeout_s, timeout_s
+        try:
+            self._request({"ping": True})
+            return True
+        except Exception:
+            return False
+        finally:
+            self._timeout_s = saved
+
+class PiperPool:
+    """
+    Fixed-size pool of PiperWorker processes. Each worker loads the ONNX voice
+    once; crashed or hung workers are restarted, and idle workers are pinged
+    every health_interval_s.
+    """
+
+    def __init__(self, model: str, config: Optional[str] = None, size: int = 2,
+                 timeout_s: float = 30.0, health_interval_s: float = 30.0,
+                 phoneme_memo_size: int = 0, phoneme_db: Optional[str] = None):
+        self.size = max(1, size)
+        self._workers = [PiperWorker(model, config, timeout_s, phoneme_memo_size, phoneme_db) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        self._closed = threading.Event()
+        self._health_interval_s = health_interval_s
+        self.restarts = 0
+        self.sample_rate = None
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+            self._idle.put(worker)
+        self.sample_rate = self._workers[0].sample_rate
+        if self._health_interval_s > 0:
+            threading.Thread(target=self._health_loop, name="piper-health", daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        for worker in self._workers:
+            worker.stop()
+
+    def _restart(self, worker: PiperWorker):
+        self.restarts += 1
+        log.warning("restarting piper worker")
+        try:
+            worker.start()
+        except Exception:
+            # Leave it dead; the next acquire or health pass tries again
+            log.exception("piper worker restart failed")
+
+    def synthesize(self, text: str, length_scale: float = 1.0) -> bytes:
+        worker = self._idle.get()
+        try:
+            if not worker.alive():
+                self._restart(worker)
+            try:
+                return worker.synthesize(text, length_scale)
+            except PiperWorkerError:
+                # Crash or hang mid-request: replace the process and retry once
+                self._restart(worker)
+                return worker.synthesize(text, length_scale)
+        finally:
+            self._idle.put(worker)
+
+    def frontend_stats(self) -> Optional[dict]:
+        """
+        Phoneme memo stats summed over the workers, or None if disabled.
+        """
+        return merge_stats([w.frontend for w in self._workers])
+
+    def _health_loop(self):
+        while not self._closed.wait(self._health_interval_s):
+            for _ in range(self.size):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not worker.alive() or not worker.ping():
+                        self._restart(worker)
+                finally:
+                    self._idle.put(worker)
@@ -0,0 +1,87 @@
+# server/piper_worker.py
+"""
+Long-lived Piper synthesis worker. Loads the voice once, then serves
+newline-delimited JSON requests on stdin:
+
+    {"id": "1", "text": "Hello", "length_scale": 1.0}
+    {"id": "2", "ping": true}
+
+For every request it writes one JSON header line per PCM chunk followed by
+exactly that many bytes of raw 16-bit mono PCM, then a closing
+{"id": ..., "done": true} line. Errors are reported as {"id": ..., "error": ...}.
+"""
+import sys, json, argparse
+
+from .frontend import PhonemeMemo, PiperFrontend
+
+def _load_voice(model: str, config: str):
+    try:
+        from piper.voice import PiperVoice
+    except ImportError:
+        raise RuntimeError("piper-tts is not installed (pip install piper-tts)")
+    return PiperVoice.load(model, config_path=config or None)
+
+def _ids_chunks(voice, frontend: PiperFrontend, text: str, length_scale: float):
+    ids = frontend.phoneme_ids(text)
+    if hasattr(voice, "synthesize_ids_to_raw"):
+        # piper-tts 1.2
+        yield voice.synthesize_ids_to_raw(ids, length_scale=length_scale)
+    else:
+        import numpy as np
+        from piper import SynthesisConfig
+        audio = voice.phoneme_ids_to_audio(ids, SynthesisConfig(length_scale=length_scale))
+        yield (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+def _chunks(voice, text: str, length_scale: float, frontend: PiperFrontend = None):
+    if frontend is not None:
+        yield from _ids_chunks(voice, frontend, text, length_scale)
+    elif hasattr(voice, "synthesize_stream_raw"):
+        # piper-tts 1.2: one int16 chunk per sentence
+        yield from voice.synthesize_stream_raw(text, length_scale=length_scale)
+    else:
+        from piper import SynthesisConfig
+        for chunk in voice.synthesize(text, syn_config=SynthesisConfig(length_scale=length_scale)):
+            yield chunk.audio_int16_bytes
+
+def _send(out, header: dict, payload: bytes = b""):
+    out.write(json.dumps(header).encode("utf-8") + b"\n")
+    if payload:
+        out.write(payload)
+    out.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Persistent Piper TTS worker")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--config", default="")
+    parser.add_argument("--phoneme-memo-size", type=int, default=0, help="memoize per-word phonemes (0 = off)")
+    parser.add_argument("--phoneme-db", default="", help="SQLite file shared with other workers")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout.buffer
+    voice = _load_voice(args.model, args.config)
+    frontend = None
+    if args.phoneme_memo_size > 0 and hasattr(voice, "phonemize") and hasattr(voice, "phonemes_to_ids") \
+            and (hasattr(voice, "synthesize_ids_to_raw") or hasattr(voice, "phoneme_ids_to_audio")):
+        frontend = PiperFrontend(voice, PhonemeMemo(f"piper|{args.model}", args.phoneme_memo_size, args.phoneme_db or None))
+    _send(out, {"ready": True, "sample_rate": int(voice.config.sample_rate)})
+
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            if not req.get("ping"):
+                for pcm in _chunks(voice, req["text"], float(req.get("length_scale", 1.0)), frontend):
+                    _send(out, {"id": req_id, "bytes": len(pcm)}, pcm)
+            done = {"id": req_id, "done": True}
+            if frontend is not None:
+                done["frontend"] = frontend.memo.stats()
+            _send(out, done)
+        except Exception as e:
+            _send(out, {"id": req_id, "error": str(e)})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# server/quantize.py
+"""
+Int8 dynamic quantization of Coqui models for CPU inference
+(TTS_QUANTIZE=int8). Linear and recurrent layers of the acoustic model and
+vocoder get int8 weights, and activations are quantized on the fly. PyTorch
+has no dynamic kernels for convolutions, so those stay fp32. Quantized
+weights are cached on disk under TTS_QUANT_DIR, so later starts swap in
+empty int8 layers and load them instead of re-quantizing.
+
+    python -m server.quantize --voice naija_female
+
+benchmarks fp32 against int8 for one voice: latency, weight memory and
+spectral similarity to the fp32 output.
+"""
+import os, re, sys, json, time, logging, argparse, tempfile
+from contextlib import suppress
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .audio import spectral_similarity, to_float32
+from .voices import load_voice_config, model_bytes, resolve_voice
+
+log = logging.getLogger("odiadev.tts.quantize")
+
+QUANT_MODES = ("off", "int8")
+# 'int8' quantizes every Coqui model; voice_config.json entries may override with "quantize"
+TTS_QUANTIZE = os.getenv("TTS_QUANTIZE", "off").lower()
+# Quantized weight cache; defaults to <TTS_MODEL_DIR>/quantized
+TTS_QUANT_DIR = os.getenv("TTS_QUANT_DIR") or None
+
+def cache_path(model_name: str, root: Optional[str] = None) -> str:
+    import torch
+    root = root or TTS_QUANT_DIR or os.path.join(os.getenv("TTS_MODEL_DIR") or tempfile.gettempdir(), "quantized")
+    # Packed weights are only guaranteed to load on the torch version that wrote them
+    name = re.sub(r"[^A-Za-z0-9._-]+", "--", f"{model_name}-int8-torch{torch.__version__}")
+    return os.path.join(root, name + ".pt")
+
+def _targets(tts) -> Dict[str, object]:
+    modules = {name: getattr(tts.synthesizer, name, None) for name in ("tts_model", "vocoder_model")}
+    return {name: module for name, module in modules.items() if hasattr(module, "state_dict")}
+
+def _select_backend():
+    import torch
+    # fbgemm needs x86 AVX2; ARM instances (Graviton) quantize with qnnpack
+    if "fbgemm" not in torch.backends.quantized.supported_engines and "qnnpack" in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = "qnnpack"
+
+def _empty_int8(module):
+    # The layer quantize_dynamic would produce, without quantizing anything
+    import torch
+    from torch import nn
+    from torch.ao.nn.quantized import dynamic as nnqd
+    kind = type(module)
+    if kind is nn.Linear:
+        return nnqd.Linear(module.in_features, module.out_features, bias_=module.bias is not None, dtype=torch.qint8)
+    if kind in (nn.LSTM, nn.GRU):
+        q = nnqd.LSTM if kind is nn.LSTM else nnqd.GRU
+        return q(module.input_size, module.hidden_size, module.num_layers, module.bias, module.batch_first,
+                 module.dropout, module.bidirectional, dtype=torch.qint8)
+    return None
+
+def _swap_empty(module):
+    for name, child in module.named_children():
+        empty = _empty_int8(child)
+        if empty is not None:
+            setattr(module, name, empty)
+        else:
+            _swap_empty(child)
+
+def _quantize_module(module):
+    import torch
+    from torch import nn
+    return torch.ao.quantization.quantize_dynamic(module, {nn.Linear, nn.LSTM, nn.GRU}, dtype=torch.qint8, inplace=True)
+
+def _save(state: dict, path: str):
+    import torch
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        torch.save(state, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def apply(tts, model_name: str, root: Optional[str] = None) -> dict:
+    """
+    Quantizes a loaded Coqui TTS in place: from the on-disk cache when one
+    exists, otherwise by quantizing and writing the cache. A cache that no
+    longer matches the model is deleted and the error re-raised; tts may be
+    half-converted then, so the caller reloads it and tries again.
+    Returns {"cached", "ms", "fp32_mb", "int8_mb"}.
+    """
+    import torch
+    _select_backend()
+    start = time.time()
+    fp32 = model_bytes(tts)
+    targets = _targets(tts)
+    path = cache_path(model_name, root)
+    cached = os.path.exists(path)
+    if cached:
+        try:
+            state = torch.load(path, map_location="cpu", weights_only=False)
+            for name, module in targets.items():
+                _swap_empty(module)
+                module.load_state_dict(state[name])
+        except Exception:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            raise
+    else:
+        for module in targets.values():
+            _quantize_module(module)
+        _save({name: module.state_dict() for name, module in targets.items()}, path)
+    for module in targets.values():
+        module.eval()
+    report = {"cached": cached, "ms": int((time.time() - start) * 1000),
+              "fp32_mb": round(fp32 / 2**20, 1), "int8_mb": round(model_bytes(tts) / 2**20, 1)}
+    log.info("quantized %s to int8: %s", model_name, report)
+    return report
+
+def _render(tts, text: str, speaker: Optional[str]) -> np.ndarray:
+    import torch
+    # Same sampling noise for both precisions, so differences come from the weights
+    torch.manual_seed(0)
+    kwargs = {"speaker": speaker} if speaker else {}
+    return to_float32(np.asarray(tts.tts(text=text, **kwargs)))
+
+def _timed(tts, texts: List[str], speaker: Optional[str], runs: int):
+    _render(tts, texts[0], speaker)  # kernel and allocator warm-up
+    best, outputs = None, None
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        outs = [_render(tts, text, speaker) for text in texts]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best, outputs = elapsed, outs
+    return best, outputs
+
+def benchmark(tts, model_name: str, texts: List[str], speaker: Optional[str] = None, runs: int = 3) -> dict:
+    """
+    Renders texts with tts in fp32, quantizes it in place, renders again and
+    compares: best-of-runs latency, real-time factor, weight memory, and the
+    spectral similarity of each int8 rendering to its fp32 counterpart.
+    """
+    sr = tts.synthesizer.output_sample_rate
+    fp32_s, fp32_out = _timed(tts, texts, speaker, runs)
+    quant = apply(tts, model_name)
+    int8_s, int8_out = _timed(tts, texts, speaker, runs)
+    audio_s = sum(len(pcm) for pcm in fp32_out) / sr
+    scores = [round(spectral_similarity(a, b), 4) for a, b in zip(fp32_out, int8_out)]
+    return {
+        "model": model_name,
+        "texts": len(texts),
+        "audio_s": round(audio_s, 2),
+        "fp32": {"ms": round(fp32_s * 1000, 1), "rtf": round(fp32_s / audio_s, 4), "weights_mb": quant["fp32_mb"]},
+        "int8": {"ms": round(int8_s * 1000, 1), "rtf": round(int8_s / audio_s, 4), "weights_mb": quant["int8_mb"]},
+        "speedup": round(fp32_s / int8_s, 2),
+        "memory_saved_mb": round(quant["fp32_mb"] - quant["int8_mb"], 1),
+        "memory_saved_ratio": round(1 - quant["int8_mb"] / quant["fp32_mb"], 3) if quant["fp32_mb"] else None,
+        "similarity": round(float(np.mean(scores)), 4),
+        "similarity_min": min(scores),
+        "per_text": scores,
+    }
+
+def main(argv=None) -> int:
+    from .warm import load_phrases
+    parser = argparse.ArgumentParser(description="Benchmark int8 dynamic quantization against fp32 for one voice")
+    parser.add_argument("--voice", help="voice from voice_config.json (default: its default_voice)")
+    parser.add_argument("--model", help="Coqui model name; overrides --voice")
+    parser.add_argument("--text", action="append", dest="texts", help="repeatable (default: lines of the company scripts)")
+    parser.add_argument("--max-texts", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="timed passes; the fastest is reported")
+    parser.add_argument("--min-similarity", type=float, default=0.9, help="quality gate on the mean similarity")
+    args = parser.parse_args(argv)
+
+    spec = resolve_voice(load_voice_config(), args.voice, os.getenv("COQUI_MODEL_NAME", "tts_models/en/vctk/vits"))
+    model_name = args.model or spec.model
+    texts = (args.texts or load_phrases() or ["Welcome to ODIADEV."])[:max(1, args.max_texts)]
+
+    from TTS.api import TTS as COQUI_TTS
+    tts = COQUI_TTS(model_name)
+    speakers = (getattr(tts, "speakers", None) or []) if getattr(tts, "is_multi_speaker", False) else []
+    speaker = (spec.speaker if spec.speaker in speakers else speakers[0]) if speakers else None
+    report = benchmark(tts, model_name, texts, speaker, args.runs)
+    report.update(voice=spec.name, min_similarity=args.min_similarity, accept=report["similarity"] >= args.min_similarity)
+    print(json.dumps(report, indent=2))
+    return 0 if report["accept"] else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
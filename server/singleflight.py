@@ -0,0 +1,79 @@
+# server/singleflight.py
+import os, zlib, logging, threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("odiadev.tts.singleflight")
+
+# Lock files are striped by key hash so the lock directory stays bounded
+LOCK_STRIPES = 4096
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader)
+    runs fn and every caller that arrives while it runs waits for and shares
+    its result or exception.
+
+    With lock_dir set, the leader also holds an flock on a striped lock file,
+    so leaders in other processes sharing the directory (uvicorn workers)
+    queue behind it. fn must therefore re-check the cache before doing work.
+    before_unlock(key) runs while the file lock is still held, e.g. to land
+    the key's write-behind cache write so the next process finds it.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, before_unlock: Optional[Callable[[str], None]] = None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self._before_unlock = before_unlock
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"leaders": 0, "followers": 0}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns (fn's result, shared); shared is True when another caller's
+        run produced it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            self._stats["leaders" if leader else "followers"] += 1
+        if not leader:
+            return call.result(), True
+        try:
+            result = self._run_locked(key, fn)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def _run_locked(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.lock_dir:
+            return fn()
+        stripe = zlib.crc32(key.encode("utf-8")) % LOCK_STRIPES
+        with open(os.path.join(self.lock_dir, f"{stripe:04x}.lock"), "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                result = fn()
+                if self._before_unlock is not None:
+                    self._before_unlock(key)
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls), cross_process=bool(self.lock_dir))
@@ -0,0 +1,80 @@
+# server/stretch.py
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .audio import to_float32
+
+# fast: fully vectorized phase vocoder; high: WSOLA, whose waveform-similarity search keeps
+# speech transients crisp and avoids phasiness at the cost of a per-frame search loop
+QUALITIES = ("fast", "high")
+
+def _frame_len(sample_rate: int, seconds: float, pow2: bool = False) -> int:
+    n = max(16, int(sample_rate * seconds))
+    if pow2:
+        n = 1 << int(round(np.log2(n)))
+    return n + (n % 2)
+
+def _wsola(pcm: np.ndarray, sample_rate: int, rate: float) -> np.ndarray:
+    n = _frame_len(sample_rate, 0.03)
+    hs = n // 2
+    tol = hs // 2
+    win = np.hanning(n + 1)[:-1]
+    out_len = int(round(len(pcm) / rate))
+    n_frames = out_len // hs + 1
+    ha = hs * rate
+    x = np.pad(pcm, (tol, n + 2 * tol + hs + int(np.ceil(ha))))
+    frames = sliding_window_view(x, n)
+    out = np.zeros(n_frames * hs + n, dtype=np.float64)
+    env = np.zeros_like(out)
+    prev = tol
+    for k in range(n_frames):
+        if k:
+            # Pick the candidate around the nominal position that best continues the previous frame
+            lo = int(round(k * ha))
+            natural = x[prev + hs:prev + hs + n]
+            prev = lo + int(np.argmax(frames[lo:lo + 2 * tol + 1] @ natural))
+        out[k * hs:k * hs + n] += win * x[prev:prev + n]
+        env[k * hs:k * hs + n] += win
+    out = np.divide(out, env, out=np.zeros_like(out), where=env > 1e-3)
+    return out[:out_len].astype(np.float32)
+
+def _phase_vocoder(pcm: np.ndarray, sample_rate: int, rate: float) -> np.ndarray:
+    n_fft = _frame_len(sample_rate, 0.046, pow2=True)
+    hop = n_fft // 4
+    win = np.hanning(n_fft + 1)[:-1]
+    x = np.pad(pcm, (n_fft // 2, n_fft // 2 + hop))
+    spec = np.fft.rfft(sliding_window_view(x, n_fft)[::hop] * win, axis=1)
+
+    # Interpolate magnitudes at the new frame times; advance phase by each bin's measured frequency
+    steps = np.arange(0, spec.shape[0] - 1, rate)
+    idx = steps.astype(int)
+    frac = (steps - idx)[:, None]
+    mag = (1 - frac) * np.abs(spec[idx]) + frac * np.abs(spec[idx + 1])
+    omega = 2 * np.pi * hop * np.arange(spec.shape[1]) / n_fft
+    dphi = np.angle(spec[idx + 1]) - np.angle(spec[idx]) - omega
+    dphi -= 2 * np.pi * np.round(dphi / (2 * np.pi))
+    advance = np.cumsum(omega + dphi, axis=0)
+    phase = np.angle(spec[0]) + np.vstack([np.zeros((1, spec.shape[1])), advance[:-1]])
+    frames = np.fft.irfft(mag * np.exp(1j * phase), n_fft, axis=1) * win
+
+    # Overlap-add, normalized by the summed squared window
+    pos = (np.arange(len(steps)) * hop)[:, None] + np.arange(n_fft)
+    out = np.zeros(pos[-1, -1] + 1)
+    env = np.zeros_like(out)
+    np.add.at(out, pos, frames)
+    np.add.at(env, pos, np.broadcast_to(win ** 2, pos.shape))
+    out = np.divide(out, env, out=np.zeros_like(out), where=env > 1e-3)
+    return out[n_fft // 2:n_fft // 2 + int(round(len(pcm) / rate))].astype(np.float32)
+
+def time_stretch(pcm: np.ndarray, sample_rate: int, rate: float, quality: str = "fast") -> np.ndarray:
+    """
+    Plays mono PCM `rate` times faster without changing its pitch; the
+    result is len(pcm) / rate samples long. quality is one of QUALITIES.
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"unknown stretch quality: {quality}")
+    pcm = to_float32(pcm)
+    if rate == 1.0 or len(pcm) == 0:
+        return pcm
+    stretch = _phase_vocoder if quality == "fast" else _wsola
+    return stretch(pcm.astype(np.float64), sample_rate, rate)
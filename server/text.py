@@ -0,0 +1,177 @@
+# server/text.py
+import re, unicodedata
+from typing import List
+
+# Sentence end: . ! ? (optionally followed by closing quotes/brackets) then whitespace,
+# or a line break. A full stop after one of _ABBREVIATIONS ("Mr.", "e.g.") does not end
+# a sentence unless a line break follows.
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\n+")
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "no", "e.g", "i.e", "etc", "vs"}
+
+def _after_abbreviation(text: str, end: int) -> bool:
+    # end: index of the full stop
+    words = text[:end].rsplit(None, 1)
+    return bool(words) and words[-1].lstrip("\"'([").lower() in _ABBREVIATIONS
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Splits text into sentences in reading order, dropping empty pieces.
+    """
+    parts, start = [], 0
+    for m in _SENTENCE_END.finditer(text):
+        if "\n" not in m.group() and text[m.start() - 1] == "." and _after_abbreviation(text, m.start() - 1):
+            continue
+        parts.append(text[start:m.start()])
+        start = m.end()
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+# ---------- Normalization
+# Canonical ASCII forms for punctuation that clients send in many variants
+_PUNCT = str.maketrans({
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"', "«": '"', "»": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+    "…": "...", " ": " ", " ": " ", " ": " ", "​": "",
+})
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+         "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_SCALES = [(10 ** 12, "trillion"), (10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand")]
+_ORDINAL_IRREGULAR = {"one": "first", "two": "second", "three": "third", "five": "fifth",
+                      "eight": "eighth", "nine": "ninth", "twelve": "twelfth"}
+
+def number_to_words(n: int) -> str:
+    """
+    English words for a non-negative integer, e.g. 1500 -> "one thousand five hundred".
+    """
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        return _TENS[n // 10] + ("-" + _ONES[n % 10] if n % 10 else "")
+    if n < 1000:
+        rest = n % 100
+        return _ONES[n // 100] + " hundred" + (" and " + number_to_words(rest) if rest else "")
+    for value, name in _SCALES:
+        if n >= value:
+            head, rest = divmod(n, value)
+            words = number_to_words(head) + " " + name
+            if rest:
+                words += (" and " if rest < 100 else " ") + number_to_words(rest)
+            return words
+    return str(n)
+
+def _ordinal_words(n: int) -> str:
+    words = number_to_words(n)
+    head, sep, last = words.rpartition("-") if "-" in words.rsplit(" ", 1)[-1] else words.rpartition(" ")
+    if last in _ORDINAL_IRREGULAR:
+        last = _ORDINAL_IRREGULAR[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return head + sep + last
+
+def _digits(s: str) -> str:
+    return " ".join(_ONES[int(d)] for d in s)
+
+def _plain_number(raw: str) -> str:
+    whole, _, frac = raw.replace(",", "").partition(".")
+    # Phone numbers, PINs and codes read digit by digit
+    if (len(whole) > 1 and whole.startswith("0")) or len(whole) > 15:
+        words = _digits(whole)
+    else:
+        words = number_to_words(int(whole))
+    return words + (" point " + _digits(frac) if frac else "")
+
+_MULTIPLIERS = {"k": "thousand", "thousand": "thousand", "m": "million", "mn": "million", "million": "million",
+                "b": "billion", "bn": "billion", "billion": "billion"}
+
+def _digit_groups(m: "re.Match") -> str:
+    groups = m.group(1).split("-")
+    # Ranges like 10-15 stay numbers; three or more groups, or a leading zero, are read digit by digit
+    if len(groups) < 3 and not any(len(g) > 1 and g.startswith("0") for g in groups):
+        return m.group(0)
+    return ", ".join(_digits(g) for g in groups)
+
+def _naira(raw: str, multiplier: str = None) -> str:
+    if multiplier:
+        # N5.5m -> "five point five million naira"; no kobo in shorthand amounts
+        return _plain_number(raw) + " " + _MULTIPLIERS[multiplier.lower()] + " naira"
+    whole, _, frac = raw.replace(",", "").partition(".")
+    words = number_to_words(int(whole)) + " naira"
+    kobo = int((frac + "00")[:2]) if frac else 0
+    return words + (" " + number_to_words(kobo) + " kobo" if kobo else "")
+
+def _clock(m: "re.Match") -> str:
+    hour, sep, minute, meridiem = m.groups()
+    if (minute is None or sep == ".") and meridiem is None:
+        return m.group(0)  # a bare number or a decimal, not a time
+    if hour == "24":
+        return "midnight" if minute == "00" and meridiem is None else m.group(0)
+    words = number_to_words(int(hour))
+    if minute not in (None, "00"):
+        words += " " + ("oh " + _ONES[int(minute)] if minute.startswith("0") else number_to_words(int(minute)))
+    elif not meridiem:
+        words += " o'clock"
+    if not meridiem:
+        return words
+    # Spelled as letters: "a.m." would end a sentence for split_sentences
+    words += " " + " ".join(meridiem.replace(".", "").upper())
+    # A full stop the pattern swallowed still ends the sentence when one follows (or the text ends)
+    if meridiem.endswith(".") and re.match(r"\s*$|\s+[A-Z]", m.string[m.end():]):
+        words += "."
+    return words
+
+_NUM = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_MULTIPLIER = r"(?:\s?(?i:(k|mn|m|bn|b|thousand|million|billion))\b)?"
+_NAIRA_PREFIX = re.compile(r"(?:₦|\bNGN\s?|\bN(?=\d))\s?(" + _NUM + r")" + _MULTIPLIER)
+_NAIRA_SUFFIX = re.compile(r"\b(" + _NUM + r")" + _MULTIPLIER + r"\s?(?:naira|NGN)\b", re.IGNORECASE)
+# Numbers stand alone: no digit, letter or "<digit>." before them and no digit, letter or
+# ".<digit>" after, so versions (v1.2.3) and unit-suffixed values (3.5kg, 1.5m) are left as they are
+_ALONE_BEFORE = r"(?<!\w)(?<!\d\.)"
+_ALONE_AFTER = r"(?!\w|\.\d)"
+# 9:30, 9:30am, 10.30am, 5pm, 14:05, 24:00, 7:00 p.m. (not 1:2 ratios, 9:30:15 timestamps or 10.30 decimals)
+_CLOCK = re.compile(_ALONE_BEFORE + r"([01]?\d|2[0-4])(?:([:.])([0-5]\d))?(?![\d:]|\.\d)(?:\s?([ap]\.?m\.?)(?![a-z]))?",
+                    re.IGNORECASE)
+# Phone and account numbers written in dash-joined groups: 0800-123-4567, 080-1234
+_DIGIT_GROUPS = re.compile(_ALONE_BEFORE + r"(?<!-)(\d+(?:-\d+)+)(?!-)" + _ALONE_AFTER)
+_PERCENT = re.compile(r"\b(" + _NUM + r")\s?%")
+_ORDINAL = re.compile(r"\b(\d+)(?:st|nd|rd|th)\b", re.IGNORECASE)
+_NUMBER = re.compile(_ALONE_BEFORE + r"(" + _NUM + r")" + _ALONE_AFTER)
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.!?;:])")
+_REPEATED_PUNCT = re.compile(r"([!?,;:])\1+")
+
+NORMALIZE_LEVELS = ("off", "basic", "full")
+
+def normalize(text: str, level: str = "full") -> str:
+    """
+    Deterministic text normalization applied before cache lookup and
+    synthesis, so trivially different inputs share one rendering.
+
+    off   - text unchanged
+    basic - Unicode NFC, canonical quotes/dashes/ellipses, collapsed
+            whitespace, no space before punctuation, repeated !?,;: squashed
+    full  - basic plus clock times, Naira amounts, percentages, ordinals and
+            numbers spelled out ("N1,500.50" -> "one thousand five hundred
+            naira fifty kobo", "N5.5m" -> "five point five million naira",
+            "9:30am" -> "nine thirty A M", "0800-123-4567" digit by digit).
+            Numbers run into letters or other digits (v1.2.3, 3.5kg) are
+            left alone
+    """
+    if level == "off":
+        return text
+    text = unicodedata.normalize("NFC", text).translate(_PUNCT)
+    text = " ".join(text.split())
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    text = _REPEATED_PUNCT.sub(r"\1", text)
+    if level == "full":
+        text = _CLOCK.sub(_clock, text)
+        text = _DIGIT_GROUPS.sub(_digit_groups, text)
+        text = _NAIRA_PREFIX.sub(lambda m: _naira(*m.groups()), text)
+        text = _NAIRA_SUFFIX.sub(lambda m: _naira(*m.groups()), text)
+        text = _PERCENT.sub(lambda m: _plain_number(m.group(1)) + " percent", text)
+        text = _ORDINAL.sub(lambda m: _ordinal_words(int(m.group(1))), text)
+        text = _NUMBER.sub(lambda m: _plain_number(m.group(1)), text)
+    return text
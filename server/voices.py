@@ -0,0 +1,181 @@
+# server/voices.py
+import os, gc, json, time, logging, threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("odiadev.tts.voices")
+
+TTS_VOICE_CONFIG = os.getenv("TTS_VOICE_CONFIG", "voices/voice_config.json")
+DEFAULT_VOICES = ["naija_female", "naija_male"]
+
+def load_voice_config(path: str = TTS_VOICE_CONFIG) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return config if isinstance(config.get("voices"), dict) else {}
+
+def voice_names(config: dict) -> List[str]:
+    return list(config.get("voices", {})) or list(DEFAULT_VOICES)
+
+class VoiceSpec:
+    """
+    What a logical voice resolves to: a model plus, for multi-speaker
+    models, a speaker name or a reference wav.
+    """
+    __slots__ = ("name", "model", "speaker", "speaker_wav")
+
+    def __init__(self, name: Optional[str], model: str, speaker: Optional[str] = None, speaker_wav: Optional[str] = None):
+        self.name, self.model, self.speaker, self.speaker_wav = name, model, speaker, speaker_wav
+
+def resolve_voice(config: dict, voice: Optional[str], default_model: str) -> VoiceSpec:
+    """
+    Looks voice (or the config's default_voice) up in voice_config.json;
+    unknown voices fall back to default_model.
+    """
+    name = voice or config.get("default_voice")
+    entry = config.get("voices", {}).get(name)
+    if not entry or not entry.get("model"):
+        return VoiceSpec(name, default_model)
+    return VoiceSpec(name, entry["model"], entry.get("speaker"), entry.get("speaker_wav"))
+
+def model_bytes(tts) -> int:
+    """
+    Weight bytes of a loaded Coqui TTS (acoustic model plus vocoder, plus
+    the ONNX graph when it runs through onnxruntime), int8 layers included.
+    """
+    synth = getattr(tts, "synthesizer", None)
+    total = getattr(getattr(tts, "onnx_runner", None), "graph_bytes", 0)
+    for module in (getattr(synth, "tts_model", None), getattr(synth, "vocoder_model", None)):
+        if hasattr(module, "state_dict"):
+            # state_dict rather than parameters(): int8 layers keep packed weights outside parameters
+            total += sum(_tensor_bytes(v) for v in module.state_dict().values())
+    return total
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    return value.numel() * value.element_size() if hasattr(value, "element_size") else 0
+
+class _Resident:
+    __slots__ = ("model", "instance", "bytes", "users", "last_used", "load_lock")
+
+    def __init__(self, model: str):
+        self.model, self.instance, self.bytes, self.users = model, None, 0, 0
+        self.last_used = time.time()
+        self.load_lock = threading.Lock()
+
+class VoiceRegistry:
+    """
+    Loads models on first use and keeps one instance per model, so voices
+    that are speakers of the same multi-speaker model share it. Once the
+    resident models' weights exceed budget_bytes (0 = unbounded), idle
+    models are evicted least recently used first; a model in use is never
+    evicted.
+    """
+
+    def __init__(self, config: dict, default_model: str, loader: Callable[[str], object],
+                 budget_bytes: int = 0, sizer: Callable[[object], int] = model_bytes):
+        self.config = config
+        self.default_model = default_model
+        self.budget_bytes = budget_bytes
+        self._loader = loader
+        self._sizer = sizer
+        self._lock = threading.Lock()
+        self._models = {}
+        self._stats = {"loads": 0, "evictions": 0, "load_ms": 0}
+
+    def voices(self) -> List[str]:
+        return voice_names(self.config)
+
+    def resolve(self, voice: Optional[str]) -> VoiceSpec:
+        return resolve_voice(self.config, voice, self.default_model)
+
+    @contextmanager
+    def use(self, voice: Optional[str]) -> Iterator[Tuple[object, VoiceSpec]]:
+        """
+        Yields (model instance, spec) for voice, loading the model if needed
+        and pinning it against eviction until the block exits.
+        """
+        spec = self.resolve(voice)
+        entry = self._acquire(spec.model)
+        try:
+            yield entry.instance, spec
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.time()
+
+    def _acquire(self, model: str) -> _Resident:
+        with self._lock:
+            entry = self._models.setdefault(model, _Resident(model))
+            entry.users += 1
+        try:
+            with entry.load_lock:
+                if entry.instance is None:
+                    start = time.time()
+                    instance = self._loader(model)
+                    size = self._sizer(instance)
+                    ms = int((time.time() - start) * 1000)
+                    with self._lock:
+                        entry.instance, entry.bytes = instance, size
+                        self._stats["loads"] += 1
+                        self._stats["load_ms"] += ms
+                    log.info("loaded %s (%.0f MB) in %s ms", model, size / 2**20, ms)
+        except BaseException:
+            with self._lock:
+                entry.users -= 1
+                if entry.instance is None and entry.users == 0 and self._models.get(model) is entry:
+                    del self._models[model]
+            raise
+        self._evict(keep=model)
+        return entry
+
+    def _evict(self, keep: str):
+        if self.budget_bytes <= 0:
+            return
+        evicted = []
+        with self._lock:
+            total = sum(e.bytes for e in self._models.values())
+            idle = sorted((e for e in self._models.values() if e.users == 0 and e.model != keep and e.instance is not None),
+                          key=lambda e: e.last_used)
+            for entry in idle:
+                if total <= self.budget_bytes:
+                    break
+                del self._models[entry.model]
+                entry.instance = None
+                total -= entry.bytes
+                self._stats["evictions"] += 1
+                evicted.append(entry.model)
+        if evicted:
+            gc.collect()
+            log.info("evicted idle models %s to stay under %.0f MB", evicted, self.budget_bytes / 2**20)
+        if total > self.budget_bytes:
+            log.warning("models in use need %.0f MB, over the %.0f MB budget", total / 2**20, self.budget_bytes / 2**20)
+
+    def has_room(self) -> bool:
+        """
+        Whether one more model the size of the largest resident one still
+        fits the budget, i.e. loading it would not evict anything.
+        """
+        if self.budget_bytes <= 0:
+            return True
+        with self._lock:
+            sizes = [e.bytes for e in self._models.values() if e.instance is not None]
+        return sum(sizes) + max(sizes, default=0) <= self.budget_bytes
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return [m for m, e in self._models.items() if e.instance is not None]
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            resident = [{"model": e.model, "mb": round(e.bytes / 2**20, 1), "users": e.users,
+                         "idle_s": 0 if e.users else round(now - e.last_used, 1)}
+                        for e in self._models.values() if e.instance is not None]
+            out = dict(self._stats)
+        out.update(budget_mb=round(self.budget_bytes / 2**20), resident_mb=round(sum(r["mb"] for r in resident), 1),
+                   resident=resident)
+        return out
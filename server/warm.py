@@ -0,0 +1,98 @@
+# server/warm.py
+import os, sys, glob, json, time, logging, argparse, itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from .encoders import FORMATS
+from .voices import load_voice_config, voice_names
+
+log = logging.getLogger("odiadev.tts.warm")
+
+# Phrase files rendered when none are given: the company scripts, one prompt per line
+TTS_WARM_PHRASES = os.getenv("TTS_WARM_PHRASES", "odiadev_*_script.txt")
+TTS_WARM_CONCURRENCY = int(os.getenv("TTS_WARM_CONCURRENCY", "2"))
+# Upper bound on phrase x voice x speed x format per /admin/cache/warm call
+TTS_WARM_MAX_ITEMS = int(os.getenv("TTS_WARM_MAX_ITEMS", "5000"))
+
+def config_voices() -> List[str]:
+    return voice_names(load_voice_config())
+
+def load_phrases(paths: Iterable[str] = ()) -> List[str]:
+    """
+    Reads phrase files (globs allowed; TTS_WARM_PHRASES when none given):
+    one prompt per non-empty line, '#' lines skipped, duplicates dropped.
+    """
+    files = sorted({p for pattern in (list(paths) or [TTS_WARM_PHRASES]) for p in glob.glob(pattern)})
+    phrases = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            phrases.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+    return list(dict.fromkeys(phrases))
+
+def warm(engine, phrases: List[str], voices: List[Optional[str]], speeds: List[float], formats: List[str],
+         concurrency: int = TTS_WARM_CONCURRENCY) -> dict:
+    """
+    Pre-renders every phrase x voice x speed x format through engine.synth,
+    at most `concurrency` at a time, skipping variants already cached.
+    Returns a report with one entry per variant and totals.
+    """
+    start = time.time()
+
+    def one(phrase, voice, speed, fmt):
+        item = {"text": phrase[:80], "voice": voice, "speed": speed, "format": fmt}
+        if engine.cached(phrase, voice, speed, fmt):
+            return dict(item, status="cached", ms=0)
+        try:
+            _, hit, ms, duration_ms = engine.synth(phrase, voice, speed, fmt)
+        except Exception as e:
+            log.exception("warming failed for %r", phrase[:80])
+            return dict(item, status="failed", error=str(e))
+        # hit: served from cached PCM/fragments (encode only) or by a concurrent identical render
+        return dict(item, status="rendered", ms=ms, duration_ms=duration_ms, inference=not hit)
+
+    jobs = list(itertools.product(phrases, voices, speeds, formats))
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="tts-warm") as pool:
+        items = list(pool.map(lambda job: one(*job), jobs))
+    engine.flush()
+
+    counts = {s: sum(1 for i in items if i["status"] == s) for s in ("rendered", "cached", "failed")}
+    rendered = [i for i in items if i["status"] == "rendered"]
+    return dict(
+        counts,
+        total=len(items),
+        elapsed_ms=int((time.time() - start) * 1000),
+        render_ms=sum(i["ms"] for i in rendered),
+        audio_ms=sum(i.get("duration_ms") or 0 for i in rendered),
+        items=items,
+    )
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="warm-cache", description="Pre-render known prompts into the TTS cache.")
+    parser.add_argument("phrases", nargs="*", help=f"phrase files or globs (default: {TTS_WARM_PHRASES})")
+    parser.add_argument("--voice", action="append", dest="voices", help="repeatable (default: every configured voice)")
+    parser.add_argument("--speed", action="append", dest="speeds", type=float, help="repeatable (default: 1.0)")
+    parser.add_argument("--format", action="append", dest="formats", help="repeatable (default: mp3)")
+    parser.add_argument("--concurrency", type=int, default=TTS_WARM_CONCURRENCY)
+    parser.add_argument("--report", help="write the full JSON report here")
+    args = parser.parse_args(argv)
+
+    from .engine import TTSEngine
+    formats = args.formats or ["mp3"]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        parser.error(f"unsupported format(s): {', '.join(bad)}")
+    phrases = load_phrases(args.phrases)
+    if not phrases:
+        parser.error("no phrases found")
+
+    report = warm(TTSEngine(), phrases, args.voices or config_voices(), args.speeds or [1.0], formats, args.concurrency)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    summary = {k: v for k, v in report.items() if k != "items"}
+    print(json.dumps(summary))
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
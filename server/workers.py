@@ -0,0 +1,119 @@
+# server/workers.py
+import os, logging, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import cpu
+from .cpu import usable_cores
+
+log = logging.getLogger("odiadev.tts.workers")
+
+# Per-process engine, created by _init_worker
+_worker_engine = None
+
+def core_slices(size: int) -> List[List[int]]:
+    """
+    Splits the cores this process may run on into `size` contiguous,
+    non-overlapping slices (at least one core each).
+    """
+    cores = usable_cores()
+    size = max(1, size)
+    if size <= len(cores):
+        return [[int(c) for c in part] for part in np.array_split(cores, size)]
+    # More workers than cores: share cores round-robin
+    return [[cores[i % len(cores)]] for i in range(size)]
+
+def _init_worker(slots, size: int):
+    global _worker_engine
+    cores = slots.get()
+    # The engine's own apply_affinity (TTS_CPU_AFFINITY) must not widen the slice again
+    cpu.pin(cores)
+    from .engine import TTSEngine, TTS_MODEL_RAM_MB
+    # One inference at a time per worker, using the whole core slice; every
+    # worker loads its own models, so each gets an equal share of the budget.
+    # Workers only render: the audio cache (and its eviction) belongs to the API process
+    _worker_engine = TTSEngine(workers=0, infer_plan=(1, max(1, len(cores))), model_ram_mb=TTS_MODEL_RAM_MB // size,
+                               disk_cache=False)
+    ms = _worker_engine.warmup()
+    log.info("synthesis worker %s warm in %s ms on cores %s", os.getpid(), ms, cores)
+
+def _worker_info() -> Tuple[int, int]:
+    return os.getpid(), _worker_engine.sample_rate
+
+def _worker_render_batch(texts: List[str], voice: Optional[str], speed: float) -> Tuple[List[np.ndarray], int]:
+    # Voices may map to models with different output rates; the API process has no models to ask
+    return _worker_engine.render_batch(texts, voice, speed), _worker_engine._voice_rate(voice)
+
+def _worker_voice_rate(voice: Optional[str]) -> int:
+    return _worker_engine._voice_rate(voice)
+
+class SynthesisPool:
+    """
+    Pool of synthesis processes, each holding its own preloaded model and
+    pinned to its own slice of the CPU cores. The API process only
+    dispatches text and receives PCM. A worker that dies (e.g. OOM-killed)
+    breaks the whole executor; it is rebuilt and the render retried once.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._executor = self._build()
+        self.sample_rate = None
+        self.restarts = 0
+        # voice -> output sample rate, as reported by the workers
+        self._rates = {}
+
+    def _build(self) -> ProcessPoolExecutor:
+        ctx = multiprocessing.get_context("spawn")
+        slots = ctx.Queue()
+        for cores in core_slices(self.size):
+            slots.put(cores)
+        return ProcessPoolExecutor(max_workers=self.size, mp_context=ctx,
+                                   initializer=_init_worker, initargs=(slots, self.size))
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            # Concurrent renders see the same broken executor; replace it once
+            if self._executor is not broken:
+                return
+            self.restarts += 1
+            log.warning("synthesis pool broken (a worker died); restarting it")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._build()
+
+    def start(self) -> int:
+        """
+        Spawns and warms every worker; returns the model sample rate.
+        """
+        infos = [f.result() for f in [self._executor.submit(_worker_info) for _ in range(self.size)]]
+        self.sample_rate = infos[0][1]
+        log.info("synthesis pool ready: %s workers", len({pid for pid, _ in infos}))
+        return self.sample_rate
+
+    def _call(self, fn, *args):
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._rebuild(executor)
+            return self._executor.submit(fn, *args).result()
+
+    def render_batch(self, texts: List[str], voice: Optional[str], speed: float = 1.0) -> List[np.ndarray]:
+        pcms, sample_rate = self._call(_worker_render_batch, texts, voice, speed)
+        self._rates[voice] = sample_rate
+        return pcms
+
+    def voice_rate(self, voice: Optional[str]) -> int:
+        """
+        Output sample rate of voice's model; known once voice has rendered.
+        """
+        if voice not in self._rates:
+            self._rates[voice] = self._call(_worker_voice_rate, voice)
+        return self._rates[voice]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
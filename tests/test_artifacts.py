@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import artifacts, engine as engine_module
+from tests.test_server_engine import FakeVCTK, make_engine
+
+class FakeTensor:
+    """Just enough of a torch tensor for storage de-duplication"""
+    dtype = "float32"
+
+    def __init__(self, ptr, shape=(2, 2)):
+        self.ptr, self.shape = ptr, shape
+
+    def data_ptr(self):
+        return self.ptr
+
+    def numel(self):
+        return 4
+
+    def detach(self):
+        return self
+
+    def contiguous(self):
+        return self
+
+class FakeGlow:
+    """Glow-TTS stand-in: store_inverse adds weight_inv and drops the flows' weight norm"""
+
+    def __init__(self):
+        self.keys = ["decoder.flows.0.weight", "decoder.flows.1.wn.weight_g", "decoder.flows.1.wn.weight_v"]
+        self.steps = []
+
+    def eval(self):
+        self.steps.append("eval")
+        return self
+
+    def state_dict(self):
+        return {k: FakeTensor(i) for i, k in enumerate(self.keys)}
+
+    def store_inverse(self):
+        self.steps.append("store_inverse")
+        self.keys = ["decoder.flows.0.weight", "decoder.flows.0.weight_inv", "decoder.flows.1.wn.weight"]
+
+class TestArtifacts(unittest.TestCase):
+    """Artifact layout and the engine's fallback; export/load need Coqui TTS"""
+
+    def test_config_files_are_copied_and_relocated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = os.path.join(tmp, "scale_stats.npy")
+            with open(stats, "wb") as f:
+                f.write(b"stats")
+            assets = os.path.join(tmp, "assets")
+            os.makedirs(assets)
+            config = {"audio": {"stats_path": stats, "sample_rate": 22050},
+                      "model_args": {"speakers_file": stats, "name": "relative/not-a-file"}}
+            copied = {}
+            out = artifacts._relocate(config, assets, copied)
+            self.assertEqual(out["audio"]["stats_path"], "@artifact/assets/0-scale_stats.npy")
+            self.assertEqual(out["model_args"]["speakers_file"], out["audio"]["stats_path"])
+            self.assertEqual(out["model_args"]["name"], "relative/not-a-file")
+            self.assertEqual(os.listdir(assets), ["0-scale_stats.npy"])
+            json.dumps(out)
+
+    def test_tied_weights_saved_once(self):
+        shared = FakeTensor(100)
+        tensors, aliases = artifacts._dedupe({"emb.weight": shared, "proj.weight": shared, "bias": FakeTensor(200)})
+        self.assertEqual(sorted(tensors), ["bias", "emb.weight"])
+        self.assertEqual(aliases, {"proj.weight": "emb.weight"})
+
+    def test_eval_time_layout_is_replayed(self):
+        """A Glow-TTS export holds inverted flow weights; the fresh model is given them before loading"""
+        exported = ["decoder.flows.0.weight", "decoder.flows.0.weight_inv", "decoder.flows.1.wn.weight"]
+        model = FakeGlow()
+        artifacts._match_layout(model, exported)
+        self.assertEqual(model.steps, ["eval", "store_inverse"])
+        self.assertEqual(sorted(model.state_dict()), sorted(exported))
+        # Already in the exported layout: nothing to replay
+        artifacts._match_layout(model, exported)
+        self.assertEqual(model.steps, ["eval", "store_inverse", "eval"])
+
+    def test_verify_reports_mismatched_round_trip(self):
+        source, restored = FakeVCTK(), FakeVCTK()
+        source.synthesizer.tts_model, restored.synthesizer.tts_model = FakeGlow(), FakeGlow()
+        source.synthesizer.tts_model.store_inverse()
+        with patch.object(artifacts, "load", return_value=restored):
+            with self.assertRaises(ValueError):
+                artifacts.verify(source, "m")
+            restored.synthesizer.tts_model.store_inverse()
+            artifacts.verify(source, "m")
+
+    def test_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = artifacts.artifact_dir("tts_models/en/vctk/vits", tmp)
+            self.assertEqual(os.path.basename(path), "tts_models--en--vctk--vits")
+            self.assertFalse(artifacts.available("tts_models/en/vctk/vits", tmp))
+            os.makedirs(path)
+            open(os.path.join(path, artifacts.MANIFEST), "w").close()
+            self.assertTrue(artifacts.available("tts_models/en/vctk/vits", tmp))
+
+    def test_unusable_artifacts_fall_back_to_coqui(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with patch.object(tempfile, "tempdir", tmp.name):
+            engine = make_engine()
+        self.addCleanup(engine.flush)
+        loaded = []
+        with patch.object(artifacts, "available", return_value=True), \
+             patch.object(artifacts, "load", side_effect=ValueError("stale")), \
+             patch.object(engine_module, "_lazy_import_coqui", return_value=lambda name: loaded.append(name) or FakeVCTK()):
+            self.assertIsInstance(engine._open_coqui("m"), FakeVCTK)
+        self.assertEqual(loaded, ["m"])
+
+if __name__ == '__main__':
+    unittest.main()
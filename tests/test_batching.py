@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from server.batching import BatchScheduler
+
+class FakeEngine:
+    """Records each render_batch call; PCM length encodes the text length"""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def render_batch(self, texts, voice, speed):
+        self.release.wait()
+        self.batches.append((voice, speed, list(texts)))
+        return [np.full(len(t), speed, dtype=np.float32) for t in texts]
+
+class TestBatchScheduler(unittest.TestCase):
+    """Dynamic micro-batching in front of the engine"""
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Requests inside the window go through one forward pass"""
+        engine = FakeEngine()
+        scheduler = BatchScheduler(engine, window_ms=200, max_batch=8)
+        futures = [scheduler.submit("Hello %d" % i, "naija_female", 1.0) for i in range(5)]
+        results = [f.result(timeout=5) for f in futures]
+        self.assertEqual(len(engine.batches), 1)
+        self.assertEqual([len(r) for r in results], [7] * 5)
+        self.assertEqual(scheduler.stats()["batch_size_histogram"], {"5": 1})
+
+    def test_groups_by_voice_speed_and_cap(self):
+        """Different voices/speeds never share a batch and max_batch is honoured"""
+        engine = FakeEngine()
+        engine.release.clear()
+        scheduler = BatchScheduler(engine, window_ms=200, max_batch=2)
+        futures = [scheduler.submit("a", "naija_female", 1.0) for _ in range(3)]
+        futures.append(scheduler.submit("b", "naija_male", 1.0))
+        futures.append(scheduler.submit("c", "naija_male", 1.2))
+        engine.release.set()
+        self.assertEqual(futures[-1].result(timeout=5)[0], np.float32(1.2))
+        for f in futures:
+            f.result(timeout=5)
+        sizes = sorted(len(texts) for _, _, texts in engine.batches)
+        self.assertEqual(sizes, [1, 1, 1, 2])
+        for _, _, texts in engine.batches:
+            self.assertEqual(len(set(texts)), 1)
+
+    def test_errors_reach_every_caller(self):
+        """A failed batch fails each waiting future"""
+        engine = FakeEngine()
+        engine.render_batch = lambda texts, voice, speed: 1 / 0
+        scheduler = BatchScheduler(engine, window_ms=50)
+        future = scheduler.submit("Hello", "naija_female", 1.0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import bench, engine as engine_module
+from tests.test_server_engine import make_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestBench(unittest.TestCase):
+    """Offline benchmark harness against the fake Coqui model"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._tempdir = patch.object(tempfile, "tempdir", self._tmp.name)
+        self._tempdir.start()
+
+    def tearDown(self):
+        self._tempdir.stop()
+        self._tmp.cleanup()
+
+    def test_corpus_is_fixed_and_bucketed(self):
+        items = bench.corpus([os.path.join(ROOT, "odiadev_*_script.txt")], per_bucket=2)
+        self.assertEqual([i["bucket"] for i in items], ["short", "short", "medium", "medium", "long", "long"])
+        self.assertEqual(items, bench.corpus([os.path.join(ROOT, "odiadev_*_script.txt")], per_bucket=2))
+        self.assertTrue(all(len(i["text"]) > 300 for i in items if i["bucket"] == "long"))
+
+    def test_summarize(self):
+        samples = [{"ms": ms, "audio_ms": 1000} for ms in (100, 200, 300, 400)]
+        summary = bench.summarize(samples)
+        self.assertEqual((summary["p50_ms"], summary["p95_ms"], summary["rtf"]), (300, 400, 0.25))
+        self.assertIsNone(bench.summarize([])["p50_ms"])
+
+    def test_cold_then_warm(self):
+        engine = make_engine()
+        items = [{"bucket": "short", "text": "Hello there."}, {"bucket": "medium", "text": "Welcome to ODIADEV. How far?"}]
+        with patch.object(engine_module, "TTSEngine", lambda workers=None: engine):
+            result = bench.run_config(items, None, "wav", warm_passes=2)
+        self.assertEqual((result["cold"]["n"], result["cold"]["hits"]), (2, 0))
+        self.assertEqual((result["warm"]["n"], result["warm"]["hits"]), (4, 4))
+        self.assertGreater(result["cold"]["audio_s"], 0)
+        self.assertEqual(sorted(result["by_bucket"]), ["medium", "short"])
+        self.assertGreater(result["peak_rss_mb"], 0)
+        self.assertEqual(len(engine._tts.calls), 4)  # warm-up plus three sentences
+
+    def test_compare(self):
+        meta = {"corpus": {"sha1": "x"}}
+        before = {"meta": meta, "results": {"coqui/a/wav/auto": {"startup_ms": 100.0, "cold": {"rtf": 0.5}},
+                                            "coqui/b/wav/auto": {"startup_ms": 1.0}}}
+        after = {"meta": meta, "results": {"coqui/a/wav/auto": {"startup_ms": 50.0, "cold": {"rtf": 0.6}}}}
+        diff = bench.compare(before, after)
+        self.assertEqual(list(diff), ["coqui/a/wav/auto"])
+        self.assertEqual(diff["coqui/a/wav/auto"]["startup_ms"]["change"], -0.5)
+        self.assertEqual(diff["coqui/a/wav/auto"]["cold.rtf"]["change"], 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
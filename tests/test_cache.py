@@ -0,0 +1,192 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import time
+import threading
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.cache import DiskCache
+
+class TestDiskCache(unittest.TestCase):
+    """Budgeted on-disk cache with LRU/LFU eviction"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def make_cache(self, **kwargs):
+        kwargs.setdefault("sweep_interval_s", 0)
+        cache = DiskCache(self.root, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def fill(self, cache, names, size=100):
+        for name in names:
+            cache.put(name, b"x" * size)
+            cache.flush()
+            time.sleep(0.01)
+
+    def test_lru_evicts_least_recently_used(self):
+        """Going over the byte budget drops the oldest-accessed entries first"""
+        cache = self.make_cache(max_bytes=450, low_water=0.8)
+        self.fill(cache, ["a.wav", "b.wav", "c.wav", "d.wav"])
+        self.assertIsNotNone(cache.get("a.wav"))
+        self.fill(cache, ["e.wav"])
+        self.assertIsNone(cache.get("b.wav"))
+        self.assertIsNone(cache.get("c.wav"))
+        self.assertIsNotNone(cache.get("a.wav"))
+        self.assertIsNotNone(cache.get("e.wav"))
+        stats = cache.stats()
+        self.assertLessEqual(stats["size_bytes"], 450)
+        self.assertEqual(stats["evictions"], 2)
+
+    def test_lfu_keeps_frequently_used(self):
+        """LFU keeps hot entries even when they are older"""
+        cache = self.make_cache(max_entries=3, policy="lfu", low_water=1.0)
+        self.fill(cache, ["hot.mp3", "cold.mp3", "warm.mp3"])
+        for _ in range(3):
+            cache.get("hot.mp3")
+        cache.get("warm.mp3")
+        self.fill(cache, ["new.mp3"])
+        self.assertFalse(os.path.exists(cache._path("cold.mp3")))
+        self.assertEqual(cache.stats()["entries"], 3)
+
+    def test_index_survives_restart(self):
+        """A new process answers lookups from the persisted index"""
+        cache = self.make_cache()
+        cache.put(os.path.join("fragments", "abcd.wav"), b"x" * 100, voice="naija_female")
+        cache.put("ef01.mp3", b"y" * 50, voice="naija_male", model="m1")
+        cache.flush()
+        cache.get("ef01.mp3")
+        cache.close()
+        restarted = self.make_cache()
+        stats = restarted.stats()
+        self.assertEqual((stats["entries"], stats["size_bytes"]), (2, 150))
+        self.assertEqual(restarted._index["ef01.mp3"]["hits"], 1)
+        self.assertEqual(restarted.get("ef01.mp3"), b"y" * 50)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "ef", "01", "ef01.mp3")))
+
+    def test_misses_skip_sqlite_until_shared(self):
+        """Misses are answered in memory; another process's writes show up via shared= or the sweeper"""
+        ours, theirs = self.make_cache(), self.make_cache()
+        theirs.put("ab12.mp3", b"z" * 10)
+        theirs.flush()
+        with patch.object(ours, "_db_lookup", wraps=ours._db_lookup) as lookup:
+            self.assertIsNone(ours.get("ab12.mp3"))
+            self.assertFalse(ours.contains("ab12.mp3"))
+            lookup.assert_not_called()
+            self.assertEqual(ours.get("ab12.mp3", shared=True), b"z" * 10)
+        theirs.put("cd34.mp3", b"w" * 10)
+        theirs.flush()
+        ours._sync()
+        self.assertEqual(ours.get("cd34.mp3"), b"w" * 10)
+
+    def test_processes_sharing_a_directory_evict_by_shared_use(self):
+        """Eviction sees other processes' hits and deletions, not just its own"""
+        ours = self.make_cache()
+        self.fill(ours, ["a.mp3", "b.mp3"])
+        theirs = self.make_cache(max_entries=2, low_water=1.0)
+        self.assertEqual(ours.get("a.mp3"), b"x" * 100)
+        self.assertEqual(theirs.get("a.mp3"), b"x" * 100)
+        # Our sweep records our hit on a.mp3; theirs must not evict it as least recently used
+        ours._sync()
+        self.fill(theirs, ["c.mp3"])
+        self.assertEqual(theirs.stats()["evictions"], 1)
+        self.assertEqual(ours.get("a.mp3"), b"x" * 100)
+        ours._sync()
+        self.assertFalse(ours.contains("b.mp3"))
+        self.assertEqual(ours.stats()["entries"], 2)
+        # Hit counts add up across processes
+        theirs._sync()
+        self.assertEqual(theirs._db_lookup("a.mp3")["hits"], 3)
+
+    def test_land_writes_one_entry_ahead_of_the_queue(self):
+        """land() makes one queued entry visible to other processes without draining the rest"""
+        ours, theirs = self.make_cache(), self.make_cache()
+        gate = threading.Event()
+        ours._writer.submit(gate.wait)
+        ours.put("aaaa.mp3", b"a" * 10)
+        ours.put("bbbb.mp3", b"b" * 10)
+        ours.land("bbbb.mp3")
+        self.assertEqual(theirs.get("bbbb.mp3", shared=True), b"b" * 10)
+        self.assertIsNone(theirs.get("aaaa.mp3", shared=True))
+        gate.set()
+        ours.flush()
+        self.assertEqual(theirs.get("aaaa.mp3", shared=True), b"a" * 10)
+        self.assertEqual(ours.stats()["writes"], 2)
+
+    def test_index_rows_committed_in_batches(self):
+        """Queued writes share one SQLite commit"""
+        cache = self.make_cache()
+        commits, commit_rows = [], cache._commit_rows
+        cache._commit_rows = lambda: commits.append(len(cache._rows)) or commit_rows()
+        # Hold the writer so all ten puts are queued together
+        gate = cache._writer.submit(time.sleep, 0.1)
+        for i in range(10):
+            cache.put(f"{i:04d}.mp3", b"x")
+        gate.result()
+        cache.flush()
+        self.assertEqual(commits[0], 10)
+        self.assertEqual(len(cache.query(fmt="mp3")), 10)
+
+    def test_rebuild_from_disk(self):
+        """Without an index the files on disk are re-indexed and moved into shards"""
+        os.makedirs(os.path.join(self.root, "fragments"))
+        with open(os.path.join(self.root, "fragments", "1234.wav"), "wb") as f:
+            f.write(b"a" * 10)
+        with open(os.path.join(self.root, "5678.mp3"), "wb") as f:
+            f.write(b"b" * 20)
+        open(os.path.join(self.root, "5678.mp3.1.tmp"), "wb").close()
+        os.makedirs(os.path.join(self.root, "locks"))
+        open(os.path.join(self.root, "locks", "0001.lock"), "wb").close()
+        cache = self.make_cache()
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.get(os.path.join("fragments", "1234.wav")), b"a" * 10)
+        self.assertEqual(cache.get("5678.mp3"), b"b" * 20)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "5678.mp3.1.tmp")))
+
+    def test_queued_write_served_before_it_lands(self):
+        """A write still queued behind the writer thread is already a hit"""
+        cache = self.make_cache()
+        gate = threading.Event()
+        cache._writer.submit(gate.wait)
+        cache.put("abcd.mp3", b"m" * 10, voice="v", duration_ms=5)
+        self.assertEqual(cache.get("abcd.mp3"), b"m" * 10)
+        self.assertEqual(cache.meta("abcd.mp3")["duration_ms"], 5)
+        self.assertFalse(os.path.exists(cache._path("abcd.mp3")))
+        gate.set()
+        cache.flush()
+        self.assertEqual(cache._pending, {})
+        self.assertEqual(cache.get("abcd.mp3"), b"m" * 10)
+
+    def test_purge_by_metadata(self):
+        """Entries can be listed and purged by voice or model"""
+        cache = self.make_cache()
+        cache.put("aa01.mp3", b"1", voice="naija_female", model="m1")
+        cache.put("aa02.mp3", b"2", voice="naija_male", model="m1")
+        cache.put("aa03.mp3", b"3", voice="naija_male", model="m2")
+        self.assertEqual(cache.purge(voice="naija_male"), 2)
+        self.assertEqual(cache.query(model="m1"), ["aa01.mp3"])
+        self.assertIsNone(cache.get("aa02.mp3"))
+        with self.assertRaises(ValueError):
+            cache.query(colour="blue")
+
+    def test_hit_ratio(self):
+        """Stats report hits, misses and hit ratio"""
+        cache = self.make_cache()
+        self.fill(cache, ["a.wav"])
+        cache.get("a.wav")
+        cache.get("missing.wav")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import cpu, workers
+from server import engine as engine_module
+from server.cpu import InferenceExecutor, parse_cores, plan
+from tests.test_server_engine import FakeCoqui, make_engine
+
+class TestCPUGovernance(unittest.TestCase):
+    """Thread plan, affinity parsing and the bounded inference executor"""
+
+    def test_parse_cores(self):
+        self.assertEqual(parse_cores("0-3,8, 2"), [0, 1, 2, 3, 8])
+        self.assertEqual(parse_cores(""), [])
+        with self.assertRaises(ValueError):
+            parse_cores("a-b")
+
+    def test_plan_fills_in_the_unset_half(self):
+        self.assertEqual(plan(16, 0, 0), (4, 4))
+        self.assertEqual(plan(16, 8, 0), (8, 2))
+        self.assertEqual(plan(16, 0, 16), (1, 16))
+        self.assertEqual(plan(2, 0, 0), (1, 2))
+        self.assertEqual(plan(4, 8, 0), (8, 1))
+
+    def test_executor_bounds_concurrency(self):
+        infer = InferenceExecutor(2, 1)
+        self.addCleanup(infer.close)
+        lock, running, peak = threading.Lock(), [0], [0]
+
+        def work():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            # Re-entrant calls from a pool thread run inline instead of deadlocking
+            return infer.run(threading.current_thread)
+
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            names = list(clients.map(lambda _: infer.run(work).name, range(8)))
+        self.assertEqual(peak[0], 2)
+        self.assertTrue(all(n.startswith("tts-infer") for n in names))
+        stats = infer.stats()
+        self.assertEqual((stats["tasks"], stats["concurrency"], stats["waiting"]), (8, 2, 0))
+
+    def test_engine_renders_on_the_executor(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with patch.object(tempfile, "tempdir", tmp.name):
+            engine = make_engine()
+        self.addCleanup(engine.flush)
+        seen = []
+
+        class Recording(FakeCoqui):
+            def tts(self, text, **kwargs):
+                seen.append(threading.current_thread().name)
+                return super().tts(text, **kwargs)
+
+        engine._tts = Recording()
+        engine._infer = InferenceExecutor(1, 1)
+        self.addCleanup(engine._infer.close)
+        engine.synth("Hello there. Good morning.", None, 1.0, "wav")
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(all(n.startswith("tts-infer") for n in seen))
+        self.assertEqual(engine.stats()["inference"]["tasks"], 2)
+
+    def test_affinity_applied_once(self):
+        calls = []
+        with patch.object(os, "sched_setaffinity", lambda pid, cores: calls.append(cores), create=True), \
+             patch.object(os, "sched_getaffinity", return_value={0, 1}, create=True), \
+             patch.object(cpu, "_affinity_applied", False):
+            self.assertEqual(cpu.apply_affinity("0-1"), [0, 1])
+            cpu.apply_affinity("0-1")
+            self.assertIsNone(cpu.apply_affinity(""))
+        self.assertEqual(calls, [[0, 1]])
+
+    def test_worker_keeps_its_core_slice(self):
+        """A synthesis worker stays on its slice after its engine applies TTS_CPU_AFFINITY"""
+        calls = []
+
+        class FakeEngine:
+            def __init__(self, **kwargs):
+                cpu.apply_affinity("0-7")
+
+            def warmup(self):
+                return 0
+
+        slots = queue.Queue()
+        slots.put([2, 3])
+        with patch.object(os, "sched_setaffinity", lambda pid, cores: calls.append(cores), create=True), \
+             patch.object(os, "sched_getaffinity", return_value={2, 3}, create=True), \
+             patch.object(cpu, "_affinity_applied", False), \
+             patch.object(engine_module, "TTSEngine", FakeEngine), patch.object(workers, "_worker_engine", None):
+            workers._init_worker(slots, 4)
+        self.assertEqual(calls, [[2, 3]])
+
+if __name__ == '__main__':
+    unittest.main()
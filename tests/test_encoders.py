@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import io
+import wave
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from server import encoders
+from server.audio import resample
+
+SAMPLE_RATE = 22050
+
+def tone(seconds=1.0, sample_rate=SAMPLE_RATE):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+class TestEncoders(unittest.TestCase):
+    """In-process audio encoding"""
+
+    def test_wav_resampled_to_target_rate(self):
+        """A target sample rate is honoured and duration preserved"""
+        data = encoders.encode(tone(), SAMPLE_RATE, "wav", target_rate=16000)
+        with wave.open(io.BytesIO(data)) as w:
+            self.assertEqual(w.getframerate(), 16000)
+            self.assertEqual(w.getnframes(), 16000)
+
+    def test_resample_keeps_tone(self):
+        """Band-limited resampling keeps a 220 Hz tone at 220 Hz"""
+        out = resample(tone(), SAMPLE_RATE, 16000)
+        peak = np.argmax(np.abs(np.fft.rfft(out))) * 16000 / len(out)
+        self.assertAlmostEqual(peak, 220, delta=2)
+
+    @unittest.skipIf(encoders.ENCODERS["mp3"]["backend"] == "ffmpeg", "no in-process mp3 encoder")
+    def test_mp3_bitrate(self):
+        """mp3 output size tracks the requested constant bitrate"""
+        low = encoders.encode(tone(2.0), SAMPLE_RATE, "mp3", bitrate_kbps=32)
+        high = encoders.encode(tone(2.0), SAMPLE_RATE, "mp3", bitrate_kbps=128)
+        self.assertAlmostEqual(len(low), 32 * 1000 / 8 * 2, delta=1500)
+        self.assertGreater(len(high), 3 * len(low))
+
+    @unittest.skipIf(encoders.ENCODERS["ogg"]["backend"] == "ffmpeg", "no in-process ogg encoder")
+    def test_ogg_in_process(self):
+        """ogg/vorbis is produced without spawning ffmpeg"""
+        data = encoders.encode(tone(), SAMPLE_RATE, "ogg")
+        self.assertTrue(data.startswith(b"OggS"))
+        self.assertIn("ogg", encoders.stats()["formats"])
+
+    @unittest.skipIf(encoders.ENCODERS["opus"]["backend"] == "ffmpeg", "no in-process opus encoder")
+    def test_opus_profiles_are_small(self):
+        """Low-bandwidth Opus profiles come out several times smaller than default mp3"""
+        pcm = tone(4.0)
+        opus_16k = encoders.encode(pcm, SAMPLE_RATE, "opus_16k")
+        opus_24k = encoders.encode(pcm, SAMPLE_RATE, "opus_24k")
+        self.assertTrue(opus_16k.startswith(b"OggS"))
+        self.assertLess(len(opus_16k), len(opus_24k))
+        self.assertLess(len(opus_16k) * 8 / 4 / 1000, 22)
+        self.assertEqual(encoders.media_type("opus_16k"), "audio/ogg")
+        self.assertEqual(encoders.media_type("aac_32k"), "audio/aac")
+
+    @unittest.skipIf(encoders.soundfile is None, "libsndfile not available to decode")
+    def test_stream_encoder_is_one_stream(self):
+        """Pieces fed to a StreamEncoder decode back as one stream of the full length"""
+        pcm = tone(2.0)
+        for fmt, rate in (("ogg", SAMPLE_RATE), ("opus_16k", 16000), ("mp3", SAMPLE_RATE)):
+            if encoders.STREAM_ENCODERS[encoders._settings(fmt)[1]]["backend"] == "ffmpeg":
+                continue
+            if fmt == "mp3" and "MPEG_LAYER_III" not in encoders._SF_MP3:
+                continue
+            stream = encoders.StreamEncoder(fmt, SAMPLE_RATE)
+            data = b"".join(stream.write(piece) for piece in np.array_split(pcm, 4)) + stream.close()
+            decoded, sr = encoders.soundfile.read(io.BytesIO(data))
+            self.assertEqual(sr, rate)
+            # mp3 adds its encoder delay and padding once, not at every piece
+            self.assertAlmostEqual(len(decoded) / sr, 2.0, delta=0.1, msg=fmt)
+
+    def test_drain_holds_only_undrained_bytes(self):
+        """The stream sink hands bytes out once and keeps stream offsets without keeping the bytes"""
+        sink = encoders._Drain()
+        sink.write(b"OggS1234")
+        self.assertEqual(sink.drain(), b"OggS1234")
+        sink.write(b"abcd")
+        sink.seek(-2, io.SEEK_CUR)
+        sink.write(b"XY")
+        self.assertEqual((sink.tell(), sink.seek(0, io.SEEK_END)), (12, 12))
+        self.assertEqual(sink.drain(), b"abXY")
+        self.assertEqual(len(sink._tail), 0)
+        sink.seek(4)
+        with self.assertRaises(OSError):
+            sink.write(b"late")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.frontend import CoquiFrontend, PhonemeMemo, PiperFrontend, tokens
+
+class FakePhonemizer:
+    """espeak stand-in: upper-cases words, keeps punctuation and spaces"""
+
+    def __init__(self):
+        self.calls = []
+
+    def phonemize(self, text, separator="", language=None):
+        self.calls.append(text)
+        return text.upper()
+
+class FakeTokenizer:
+    """Mirrors the shape of Coqui's TTSTokenizer"""
+    use_phonemes = True
+    add_blank = True
+    use_eos_bos = True
+
+    def __init__(self):
+        self.phonemizer = FakePhonemizer()
+        self.text_cleaner = lambda text: " ".join(text.lower().split())
+
+    def encode(self, text):
+        return [ord(c) for c in text]
+
+    def intersperse_blank_char(self, ids, use_blank_char=False):
+        out = [0] * (len(ids) * 2 + 1)
+        out[1::2] = ids
+        return out
+
+    def pad_with_bos_eos(self, ids):
+        return [1] + list(ids) + [2]
+
+    def text_to_ids(self, text, language=None):
+        ids = self.encode(self.phonemizer.phonemize(self.text_cleaner(text), separator="", language=language))
+        return self.pad_with_bos_eos(self.intersperse_blank_char(ids, True))
+
+class FakePiperVoice:
+    def __init__(self):
+        self.calls = []
+
+    def phonemize(self, text):
+        self.calls.append(text)
+        return [list(text.lower())]
+
+    def phonemes_to_ids(self, phonemes):
+        return [ord(p) for p in phonemes]
+
+class TestPhonemeFrontend(unittest.TestCase):
+    """Word-level phoneme memoization in front of the acoustic model"""
+
+    def test_tokens(self):
+        self.assertEqual(tokens("Pay N500, don't  wait!"), ["Pay", " ", "N500", ",", " ", "don't", "  ", "wait", "!"])
+
+    def test_coqui_ids_match_tokenizer_and_reuse_words(self):
+        """Assembled IDs equal the tokenizer's own; each word is phonemized once"""
+        tokenizer = FakeTokenizer()
+        expected = tokenizer.text_to_ids("Welcome to Lagos, welcome!")
+        frontend = CoquiFrontend.install(tokenizer, PhonemeMemo("test"))
+        tokenizer.phonemizer.calls.clear()
+        self.assertEqual(tokenizer.text_to_ids("Welcome to Lagos, welcome!"), expected)
+        tokenizer.text_to_ids("Lagos to Abuja.")
+        self.assertEqual(tokenizer.phonemizer.calls, ["welcome", "to", "lagos", "abuja"])
+        stats = frontend.memo.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 4))
+
+    def test_character_models_left_alone(self):
+        tokenizer = FakeTokenizer()
+        tokenizer.use_phonemes = False
+        self.assertIsNone(CoquiFrontend.install(tokenizer, PhonemeMemo("test")))
+
+    def test_lru_bound_and_shared_db(self):
+        """Evicted words come back from the shared file instead of espeak"""
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "frontend", "phonemes.sqlite3")
+            computed = []
+            compute = lambda word: computed.append(word) or [len(word)]
+            memo = PhonemeMemo("ns", size=2, db_path=db)
+            for word in ("a", "bb", "ccc", "a"):
+                memo.lookup(word, compute)
+            self.assertEqual(computed, ["a", "bb", "ccc"])
+            self.assertEqual(memo.stats()["entries"], 2)
+            self.assertEqual(memo.stats()["disk_hits"], 1)
+            # Another worker process sharing the file
+            other = PhonemeMemo("ns", db_path=db)
+            self.assertEqual(other.lookup("bb", compute), [2])
+            self.assertEqual(len(computed), 3)
+            self.assertEqual(PhonemeMemo("other-model", db_path=db).lookup("bb", compute), [2])
+            self.assertEqual(len(computed), 4)
+
+    def test_piper_phonemes_assembled_from_words(self):
+        voice = FakePiperVoice()
+        frontend = PiperFrontend(voice, PhonemeMemo("piper"))
+        self.assertEqual(frontend.phoneme_ids("Hi, hi."), [ord(c) for c in "hi, hi."])
+        self.assertEqual(voice.calls, ["Hi", "hi"])
+        frontend.phoneme_ids("Hi")
+        self.assertEqual(len(voice.calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
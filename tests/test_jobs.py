@@ -0,0 +1,192 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import io
+import json
+import time
+import wave
+import asyncio
+import tempfile
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from server import app as server_app
+from server import encoders, jobs
+from server.audio import crossfade
+from server.jobs import JobManager, chunk_text
+from tests.test_server_engine import SAMPLE_RATE, make_engine
+
+def wait_for(manager, job_id, timeout_s=10):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+class TestChunking(unittest.TestCase):
+    """Sentence packing and the crossfade join"""
+
+    def test_chunks_pack_whole_sentences(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(40))
+        chunks = chunk_text(text, max_chars=100)
+        self.assertEqual(sum(len(c) for c in chunks), 40)
+        for c in chunks:
+            self.assertTrue(len(c) == 1 or len(" ".join(c)) <= 100)
+        # Oversized sentences break at clauses, then words, then anywhere
+        self.assertEqual(chunk_text("First part of it, and the second part.", max_chars=25),
+                         [["First part of it,"], ["and the second part."]])
+        self.assertEqual(chunk_text("Unpunctuated", max_chars=5), [["Unpun"], ["ctuat"], ["ed"]])
+
+    def test_unpunctuated_text_is_still_chunked(self):
+        text = " ".join(["word"] * 5000)
+        chunks = chunk_text(text, max_chars=100)
+        self.assertEqual(sum(len(s.split()) for c in chunks for s in c), 5000)
+        self.assertTrue(all(len(s) <= 100 for c in chunks for s in c))
+        self.assertTrue(all(len(" ".join(c)) <= 100 for c in chunks))
+
+    def test_crossfade_overlaps_and_keeps_gap(self):
+        a, b = np.ones(1000, dtype=np.float32), np.ones(1000, dtype=np.float32)
+        fade = int(SAMPLE_RATE * 10 / 1000)
+        joined = crossfade(a, b, SAMPLE_RATE, 10)
+        self.assertEqual(len(joined), 2000 - fade)
+        gapped = crossfade(a, b, SAMPLE_RATE, 10, gap_ms=50)
+        self.assertEqual(len(gapped), 2000 + SAMPLE_RATE * 50 // 1000)
+        # No clicks: the ends fade to silence around the gap
+        self.assertLess(abs(gapped[1000 - 1]), 0.2)
+
+class TestJobManager(unittest.TestCase):
+    """Jobs render end to end with a fake Coqui model and survive a restart"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.object(tempfile, "tempdir", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = make_engine()
+        # Write-behind cache writes must land before the directory goes
+        self.addCleanup(self.engine.flush)
+
+    def manager(self, **kwargs):
+        manager = JobManager(self.engine, root=os.path.join(self.tmp.name, "jobs"), **kwargs)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_wav_job_renders_every_sentence(self):
+        text = " ".join(f"This is sentence {i}." for i in range(12))
+        with patch.object(jobs, "TTS_JOB_CHUNK_CHARS", 60), patch.object(jobs, "TTS_JOB_CONCURRENCY", 3):
+            manager = self.manager()
+            job = manager.submit(text, None, 1.0, "wav", owner="k")
+            self.assertEqual(job["status"], "queued")
+            self.assertGreater(job["chunks_total"], 1)
+            self.assertNotIn("text", job)
+            done = wait_for(manager, job["id"])
+        self.assertEqual(done["status"], "done", done["error"])
+        self.assertEqual(done["chunks_done"], done["chunks_total"])
+        self.assertEqual(len(self.engine._tts.calls), 12)
+        with wave.open(done["path"], "rb") as w:
+            self.assertEqual(w.getframerate(), SAMPLE_RATE)
+            self.assertEqual(done["duration_ms"], int(w.getnframes() * 1000 / SAMPLE_RATE))
+        self.assertIsNone(manager.get(job["id"], owner="someone-else"))
+
+    @unittest.skipIf(encoders.soundfile is None or encoders.STREAM_ENCODERS["ogg"]["backend"] == "ffmpeg",
+                     "no in-process ogg encoder/decoder")
+    def test_ogg_job_is_one_stream(self):
+        """Encoded jobs decode back in full, not just their first chunk"""
+        text = " ".join(f"This is sentence {i}." for i in range(12))
+        with patch.object(jobs, "TTS_JOB_CHUNK_CHARS", 60):
+            manager = self.manager()
+            done = wait_for(manager, manager.submit(text, None, 1.0, "ogg")["id"])
+        self.assertEqual(done["status"], "done", done["error"])
+        self.assertGreater(done["chunks_total"], 1)
+        decoded, sr = encoders.soundfile.read(done["path"])
+        self.assertAlmostEqual(len(decoded) * 1000 / sr, done["duration_ms"], delta=50)
+
+    def test_restart_requeues_unfinished_jobs(self):
+        manager = self.manager()
+        now = time.time()
+        manager.store.insert(id="left-over", owner="k", status="running", created=now, updated=now, voice=None,
+                             speed=1.0, fmt="wav", chars=9, text="Hi there.", chunks_total=1)
+        manager.start()
+        self.assertEqual(wait_for(manager, "left-over")["status"], "done")
+
+    def test_failures_are_recorded(self):
+        manager = self.manager()
+        with patch.object(self.engine, "render_sentences", side_effect=RuntimeError("model exploded")):
+            job = manager.submit("Hello.", None, 1.0, "wav")
+            done = wait_for(manager, job["id"])
+        self.assertEqual(done["status"], "failed")
+        self.assertIn("model exploded", done["error"])
+
+    def test_events_end_with_terminal_state(self):
+        manager = self.manager()
+        job = manager.submit("Hello there. How are you?", None, 1.0, "wav")
+
+        async def collect():
+            return [e async for e in jobs.events(manager, job["id"], interval_s=0.01)]
+
+        events = asyncio.run(collect())
+        self.assertTrue(events[-1].startswith("event: done"))
+        self.assertEqual(json.loads(events[-1].split("data: ", 1)[1])["progress"], 1.0)
+
+class TestJobRoutes(unittest.TestCase):
+    """/v1/tts/jobs creation, polling and download"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patchers = [patch.object(tempfile, "tempdir", self.tmp.name), patch.object(server_app, "TTS_WARMUP", "off"),
+                    patch.object(server_app, "_put_usage_async")]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        manager = JobManager(engine, root=os.path.join(self.tmp.name, "jobs"))
+        patcher = patch.object(server_app, "_jobs", manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server_app.app.dependency_overrides[server_app._auth] = lambda: {"id": "k"}
+        self.addCleanup(server_app.app.dependency_overrides.clear)
+
+    def test_create_poll_download(self):
+        with TestClient(server_app.app) as client:
+            response = client.post("/v1/tts/jobs", json={"text": "Good morning. Welcome to ODIADEV.", "format": "wav"})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+            wait_for(server_app._jobs, job_id)
+            status = client.get(f"/v1/tts/jobs/{job_id}").json()
+            self.assertEqual(status["status"], "done")
+            audio = client.get(status["audio_url"])
+            self.assertEqual(audio.status_code, 200)
+            self.assertEqual(audio.headers["content-type"], "audio/wav")
+            with wave.open(io.BytesIO(audio.content), "rb") as w:
+                self.assertGreater(w.getnframes(), 0)
+            self.assertEqual(client.get("/v1/tts/jobs/missing").status_code, 404)
+            self.assertEqual(client.post("/v1/tts/jobs", json={"text": "hi", "format": "auto"}).status_code, 422)
+
+    def test_s3_link_presigned_per_status_request(self):
+        """Only the S3 key is stored; every status request gets a fresh link"""
+        links = iter(["https://s3/first", "https://s3/second"])
+        with patch.object(server_app._jobs, "_on_done", server_app._job_done), patch.object(server_app, "S3_BUCKET", "bucket"), \
+             patch.object(server_app, "_put_s3", return_value=True), \
+             patch.object(server_app, "_presign", side_effect=lambda key: next(links)) as presign, \
+             TestClient(server_app.app) as client:
+            job_id = client.post("/v1/tts/jobs", json={"text": "Good morning.", "format": "wav"}).json()["id"]
+            wait_for(server_app._jobs, job_id)
+            first = client.get(f"/v1/tts/jobs/{job_id}").json()
+            second = client.get(f"/v1/tts/jobs/{job_id}").json()
+        self.assertEqual((first["audio_url"], second["audio_url"]), ("https://s3/first", "https://s3/second"))
+        self.assertNotIn("s3_key", first)
+        presign.assert_called_with(f"tts-cache/jobs/{job_id}.wav")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from server import onnx_backend
+from server.onnx_backend import OnnxVits, graph_path
+from tests.test_server_engine import FakeVCTK, make_engine
+
+class FakeInput:
+    def __init__(self, name):
+        self.name = name
+
+class FakeSession:
+    """onnxruntime.InferenceSession stand-in: 100 samples per input ID"""
+
+    def __init__(self, inputs=("input", "input_lengths", "scales", "sid")):
+        self.inputs = [FakeInput(n) for n in inputs]
+        self.feeds = []
+
+    def get_inputs(self):
+        return self.inputs
+
+    def run(self, outputs, feed):
+        self.feeds.append(feed)
+        n = int(feed["input"].shape[1] * 100 * feed["scales"][1])
+        return [np.full((1, 1, n), 0.5, dtype=np.float32)]
+
+class FakeVits:
+    inference_noise_scale = 0.667
+    inference_noise_scale_dp = 0.8
+    length_scale = 1.0
+
+    def export_onnx(self, output_path, verbose=True):
+        with open(output_path, "wb") as f:
+            f.write(b"graph")
+
+class TestOnnxBackend(unittest.TestCase):
+    """ONNX Runtime path for Coqui VITS, without onnxruntime installed"""
+
+    def test_feed_carries_per_call_scales(self):
+        sess = FakeSession()
+        runner = OnnxVits(FakeVits(), sess)
+        out = runner.synthesize([5, 6, 7], speaker_id=3, length_scale=0.8)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertEqual(out.shape, (240,))
+        feed = sess.feeds[0]
+        self.assertEqual(feed["input"].dtype, np.int64)
+        np.testing.assert_allclose(feed["scales"], [0.667, 0.8, 0.8], rtol=1e-6)
+        self.assertEqual(feed["sid"].tolist(), [3])
+        # Single-speaker graphs have no sid input
+        sess = FakeSession(("input", "input_lengths", "scales"))
+        OnnxVits(FakeVits(), sess).synthesize([1], speaker_id=3)
+        self.assertNotIn("sid", sess.feeds[0])
+
+    def test_export_is_atomic_and_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = graph_path("tts_models/en/vctk/vits", tmp)
+            self.assertEqual(os.path.basename(path), "tts_models--en--vctk--vits.onnx")
+            onnx_backend.export(FakeVits(), path)
+            self.assertEqual(os.listdir(tmp), [os.path.basename(path)])
+
+    def test_engine_renders_through_runner(self):
+        """Coqui voices go through the ONNX runner with speed folded into length_scale"""
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        tts = FakeVCTK()
+        vits = FakeVits()
+        vits.tokenizer = type("Tok", (), {"text_to_ids": staticmethod(lambda text: [1] * len(text))})()
+        vits.speaker_manager = type("SM", (), {"name_to_id": {"p225": 0, "p226": 1}})()
+        tts.synthesizer.tts_model = vits
+        tts.onnx_runner = OnnxVits(vits, FakeSession())
+        engine._tts = tts
+        pcm = engine.render("Hello", speed=1.25)
+        self.assertEqual(len(pcm), 400)
+        self.assertEqual(tts.calls, [])
+        self.assertEqual(tts.onnx_runner.sess.feeds[0]["sid"].tolist(), [0])
+
+    def test_reference_wav_voices_keep_torch(self):
+        """Models with a speaker_wav voice keep their PyTorch weights for tts.tts()"""
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        engine._voice_config = {"voices": {"a": {"model": "m1"}, "b": {"model": "m2", "speaker_wav": "ref.wav"}}}
+        self.assertFalse(engine._needs_torch("m1"))
+        self.assertTrue(engine._needs_torch("m2"))
+        engine._speaker_wav = "global.wav"
+        self.assertTrue(engine._needs_torch("m1"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.piper_pool import PiperPool
+
+# Speaks the piper_worker protocol without piper: 2 bytes of PCM per character,
+# and exits hard on the text "crash"
+FAKE_WORKER = r'''
+import sys, json
+out = sys.stdout.buffer
+def send(h, p=b""):
+    out.write(json.dumps(h).encode() + b"\n" + p); out.flush()
+send({"ready": True, "sample_rate": 16000})
+for line in sys.stdin.buffer:
+    req = json.loads(line)
+    if req.get("text") == "crash":
+        sys.exit(1)
+    if not req.get("ping"):
+        for word in req["text"].split():
+            send({"id": req["id"], "bytes": 2 * len(word)}, b"\x01\x00" * len(word))
+    send({"id": req["id"], "done": True})
+'''
+
+class TestPiperPool(unittest.TestCase):
+    """Persistent Piper workers driven over the NDJSON protocol"""
+
+    def setUp(self):
+        self.pool = PiperPool("unused.onnx", size=2, timeout_s=10, health_interval_s=0)
+        for worker in self.pool._workers:
+            worker._cmd = [sys.executable, "-c", FAKE_WORKER]
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reuses_processes_across_requests(self):
+        """Many requests are served by the same two processes"""
+        pids = {w._proc.pid for w in self.pool._workers}
+        for _ in range(10):
+            self.assertEqual(self.pool.synthesize("Welcome to ODIADEV"), b"\x01\x00" * 16)
+        self.assertEqual({w._proc.pid for w in self.pool._workers}, pids)
+        self.assertEqual(self.pool.sample_rate, 16000)
+
+    def test_restarts_crashed_worker(self):
+        """A worker that dies mid-request is replaced and the pool keeps serving"""
+        with self.assertRaises(Exception):
+            self.pool.synthesize("crash")
+        self.assertGreaterEqual(self.pool.restarts, 1)
+        for _ in range(4):
+            self.assertEqual(self.pool.synthesize("Lagos"), b"\x01\x00" * 5)
+        self.assertTrue(all(w.alive() for w in self.pool._workers))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from server import quantize
+from server.audio import spectral_similarity
+from tests.test_server_engine import FakeVCTK, make_engine
+
+SAMPLE_RATE = 22050
+
+def voiced(seconds=2.0, f0=120.0):
+    """Harmonic, amplitude-modulated stand-in for speech"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.2 * np.sin(2 * np.pi * 0.7 * t))) / SAMPLE_RATE
+    env = (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) ** 2
+    return (0.1 * env * sum(np.sin(k * phase) / k for k in range(1, 30))).astype(np.float32)
+
+class TestQuantize(unittest.TestCase):
+    """int8 mode selection and the similarity score used as its quality gate"""
+
+    def test_similarity_tolerates_timing_not_content(self):
+        pcm = voiced()
+        self.assertAlmostEqual(spectral_similarity(pcm, pcm), 1.0, places=6)
+        # Slightly shorter rendering of the same content still aligns
+        self.assertGreater(spectral_similarity(pcm, pcm[:int(len(pcm) * 0.95)]), 0.95)
+        noise = np.random.default_rng(0).normal(0, 0.1, len(pcm)).astype(np.float32)
+        self.assertLess(spectral_similarity(pcm, noise), 0.5)
+
+    def test_voice_config_overrides_mode_and_keys_differ(self):
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        engine._voice_config = {"voices": {"a": {"model": "m1", "quantize": "off"}, "b": {"model": "m2"}}}
+        with patch.object(quantize, "TTS_QUANTIZE", "int8"):
+            self.assertEqual(engine._quantize_mode("m1"), "off")
+            self.assertEqual(engine._quantize_mode("m2"), "int8")
+            int8_key = engine._key("Hello.", "b", 1.0)
+            engine.engine = "onnx"
+            self.assertEqual(engine._quantize_mode("m2"), "off")
+            engine.engine = "coqui"
+        # fp32 and int8 renders never share a cache entry
+        self.assertNotEqual(engine._key("Hello.", "b", 1.0), int8_key)
+
+    def test_failed_quantization_serves_fp32(self):
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        loads = []
+        factory = lambda name: loads.append(name) or FakeVCTK()
+        with patch.object(quantize, "apply", side_effect=RuntimeError("no int8 kernels")):
+            tts = engine._quantize(factory, FakeVCTK(), "m")
+        self.assertIsInstance(tts, FakeVCTK)
+        self.assertEqual(loads, ["m", "m"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from server import app as server_app
+
+class TestServerLifecycle(unittest.TestCase):
+    """Liveness/readiness behaviour of the FastAPI TTS server"""
+
+    def setUp(self):
+        server_app._warmup_state.update({"status": "pending", "ms": None, "error": None})
+
+    def test_health_is_live_before_warmup(self):
+        """/health answers even while the model is still cold"""
+        with patch.object(server_app, "TTS_WARMUP", "off"):
+            with TestClient(server_app.app) as client:
+                server_app._warmup_state["status"] = "warming"
+                response = client.get("/health")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["status"], "ok")
+                self.assertEqual(client.get("/ready").status_code, 503)
+
+    def test_ready_after_blocking_warmup(self):
+        """Blocking warm-up finishes before the first request is served"""
+        with patch.object(server_app, "TTS_WARMUP", "blocking"), \
+             patch.object(server_app._engine, "warmup", return_value=42) as warmup:
+            with TestClient(server_app.app) as client:
+                response = client.get("/ready")
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.json()["ready"])
+                self.assertEqual(response.json()["ms"], 42)
+                warmup.assert_called_once()
+
+    def test_failed_warmup_never_ready(self):
+        """A failed warm-up keeps the pod live but out of rotation"""
+        with patch.object(server_app, "TTS_WARMUP", "blocking"), \
+             patch.object(server_app._engine, "warmup", side_effect=RuntimeError("boom")):
+            with TestClient(server_app.app) as client:
+                self.assertEqual(client.get("/health").status_code, 200)
+                response = client.get("/ready")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response.json()["error"], "boom")
+
+    def test_cache_purge_requires_filter(self):
+        """Purging the whole cache by accident is refused"""
+        with patch.object(server_app, "TTS_WARMUP", "off"), patch.object(server_app, "ADMIN_TOKEN", "secret"):
+            with TestClient(server_app.app) as client:
+                self.assertEqual(client.post("/admin/cache/purge", json={"voice": "x"}).status_code, 403)
+                headers = {"x-admin-token": "secret"}
+                self.assertEqual(client.post("/admin/cache/purge", json={}, headers=headers).status_code, 400)
+                with patch.object(server_app._engine.cache, "purge", return_value=3) as purge:
+                    response = client.post("/admin/cache/purge", json={"voice": "naija_male", "format": "mp3"}, headers=headers)
+                self.assertEqual(response.json()["purged"], 3)
+                purge.assert_called_once_with(voice="naija_male", fmt="mp3")
+
+    def test_cache_warm_validates_and_reports(self):
+        """Warming needs phrases and valid variants; it runs in the background and reports through its status URL"""
+        with patch.object(server_app, "TTS_WARMUP", "off"):
+            with TestClient(server_app.app) as client:
+                self.assertEqual(client.post("/admin/cache/warm", json={}).status_code, 400)
+                bad = client.post("/admin/cache/warm", json={"phrases": ["Hi."], "formats": ["flac"]})
+                self.assertEqual(bad.status_code, 400)
+                with patch.object(server_app.warm, "warm", return_value={"rendered": 2}) as run:
+                    response = client.post("/admin/cache/warm", json={"phrases": ["Hi.", "Hi."], "voices": ["naija_male"],
+                                                                      "speeds": [1.0, 1.2]})
+                    self.assertEqual(response.status_code, 202)
+                    self.assertEqual(response.json()["total"], 2)
+                    deadline = time.time() + 5
+                    status = client.get(response.json()["status_url"]).json()
+                    while status["status"] == "running" and time.time() < deadline:
+                        time.sleep(0.01)
+                        status = client.get(response.json()["status_url"]).json()
+                self.assertEqual((status["status"], status["report"]), ("done", {"rendered": 2}))
+                run.assert_called_once_with(server_app._engine, ["Hi."], ["naija_male"], [1.0, 1.2], ["mp3"], 2)
+                self.assertEqual(client.get("/admin/cache/warm/missing").status_code, 404)
+
+class TestAutoFormat(unittest.TestCase):
+    """format=auto picks a delivery profile from the client's network"""
+
+    def setUp(self):
+        patcher = patch.object(server_app, "TTS_WARMUP", "off")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, headers=None, **body):
+        with patch.object(server_app, "_put_usage_async"), \
+             patch.object(server_app, "_upload_to_s3", return_value=None), \
+             patch.object(server_app._engine, "synth", return_value=(b"audio", False, 1, 100)) as synth:
+            server_app.app.dependency_overrides[server_app._auth] = lambda: {"id": "k"}
+            try:
+                with TestClient(server_app.app) as client:
+                    response = client.post("/v1/tts", json=dict(text="hi", format="auto", **body), headers=headers or {})
+            finally:
+                server_app.app.dependency_overrides.clear()
+        return response, synth
+
+    def test_client_hints_choose_profile(self):
+        """Save-Data, ECT and Downlink/RTT map to progressively richer profiles"""
+        cases = [({"Save-Data": "on"}, "opus_16k"), ({"ECT": "slow-2g"}, "opus_16k"), ({"ECT": "3g"}, "opus_24k"),
+                 ({"Downlink": "1.2"}, "opus_24k"), ({"RTT": "1500"}, "opus_16k"), ({"Downlink": "10", "RTT": "50"}, "mp3"),
+                 ({}, "mp3")]
+        for headers, expected in cases:
+            response, synth = self.post(headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["X-Audio-Format"], expected, headers)
+            self.assertEqual(synth.call_args[0][3], expected)
+            self.assertIn("Save-Data", response.headers["Vary"])
+
+    def test_explicit_network_wins(self):
+        """network= overrides whatever the hints say"""
+        response, _ = self.post({"ECT": "4g"}, network="2g")
+        self.assertEqual(response.headers["X-Audio-Format"], "opus_16k")
+        self.assertEqual(response.headers["content-type"], "audio/ogg")
+        self.assertEqual(self.post(network="5g")[0].status_code, 422)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,358 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import io
+import wave
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import engine as engine_module
+from server.engine import TTSEngine, SENTENCE_PAUSE_MS
+from server.text import normalize, number_to_words, split_sentences
+from server.voices import VoiceRegistry
+from server import workers as workers_module
+from server.workers import core_slices
+
+SAMPLE_RATE = 16000
+
+class FakeCoqui:
+    """Stands in for TTS.api.TTS: one 10 ms frame of PCM per character"""
+
+    def __init__(self):
+        self.calls = []
+        self.speeds = []
+
+    def tts(self, text, **kwargs):
+        self.calls.append(text)
+        self.speeds.append(kwargs.get("speed", 1.0))
+        return [0.25] * (len(text) * 160)
+
+class FakeVCTK(FakeCoqui):
+    """Multi-speaker stand-in that records which speaker rendered"""
+    is_multi_speaker = True
+    speakers = ["p225", "p226"]
+
+    def __init__(self):
+        super().__init__()
+        self.synthesizer = type("Synth", (), {"output_sample_rate": SAMPLE_RATE})()
+        self.speaker_calls = []
+
+    def tts(self, text, **kwargs):
+        self.speaker_calls.append(kwargs.get("speaker"))
+        return super().tts(text, **kwargs)
+
+def make_engine():
+    engine = TTSEngine()
+    engine.engine = "coqui"
+    engine._tts = FakeCoqui()
+    engine.sample_rate = SAMPLE_RATE
+    engine.model_loaded = True
+    return engine
+
+class TestTTSEngine(unittest.TestCase):
+    """Offline checks of TTSEngine with a fake Coqui model"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._tempdir = patch.object(tempfile, "tempdir", self._tmp.name)
+        self._tempdir.start()
+        self._engines = []
+
+    def make_engine(self):
+        engine = make_engine()
+        self._engines.append(engine)
+        return engine
+
+    def tearDown(self):
+        for engine in self._engines:
+            engine.flush()
+        self._tempdir.stop()
+        self._tmp.cleanup()
+
+    def test_split_sentences(self):
+        """Sentences split on terminal punctuation and line breaks"""
+        self.assertEqual(
+            split_sentences('Welcome to ODIADEV. How far?  "Fine." Next\nline!'),
+            ["Welcome to ODIADEV.", "How far?", '"Fine."', "Next", "line!"],
+        )
+        self.assertEqual(split_sentences("   "), [])
+        # Titles and Latin abbreviations keep their sentence together
+        self.assertEqual(split_sentences("Contact Mr. Ade today. Thanks"), ["Contact Mr. Ade today.", "Thanks"])
+        self.assertEqual(split_sentences("See e.g. this one. Dr. Okafor will call."),
+                         ["See e.g. this one.", "Dr. Okafor will call."])
+        self.assertEqual(split_sentences("Fruit, bread etc.\nDone."), ["Fruit, bread etc.", "Done."])
+
+    def test_normalize_levels(self):
+        """Whitespace/quote variants collapse; full level spells out numbers and Naira"""
+        variants = ["Hello  world ", "Hello world", "Hello\u00a0world", "Hello world  "]
+        self.assertEqual({normalize(v, "basic") for v in variants}, {"Hello world"})
+        self.assertEqual(normalize("\u201cOk\u201d \u2014 fine\u2026", "basic"), '"Ok" - fine...')
+        self.assertEqual(normalize("Pay \u20a61,500.50 now", "full"), "Pay one thousand five hundred naira fifty kobo now")
+        self.assertEqual(normalize("N500 or 2000 naira", "full"), "five hundred naira or two thousand naira")
+        self.assertEqual(normalize("Call 0801234", "full"), "Call zero eight zero one two three four")
+        self.assertEqual(normalize("25% on the 21st", "full"), "twenty-five percent on the twenty-first")
+        self.assertEqual(normalize("Ref 0123.45", "full"), "Ref zero one two three point four five")
+        self.assertEqual(normalize("Pay N5.5m or \u20a62k", "full"), "Pay five point five million naira or two thousand naira")
+        self.assertEqual(normalize("Opens 9:30am, closes 5 p.m.", "full"), "Opens nine thirty A M, closes five P M.")
+        self.assertEqual(normalize("At 14:05 or 9:00.", "full"), "At fourteen oh five or nine o'clock.")
+        self.assertEqual(normalize("Meet at 10.30am, or 12.5 past", "full"), "Meet at ten thirty A M, or twelve point five past")
+        self.assertEqual(normalize("Closes 24:00", "full"), "Closes midnight")
+        self.assertEqual(normalize("Call 0800-123-4567 in 10-15 minutes", "full"),
+                         "Call zero eight zero zero, one two three, four five six seven in ten-fifteen minutes")
+        # Versions and unit-suffixed values are not spelled out piecemeal
+        for kept in ("1.5m users", "3.5kg", "2.5GB", "v1.2.3"):
+            self.assertEqual(normalize(kept, "full"), kept)
+        self.assertEqual(normalize("It costs 5.", "full"), "It costs five.")
+        self.assertEqual(normalize("Pay N500  now", "off"), "Pay N500  now")
+        self.assertEqual(number_to_words(1000101), "one million one hundred and one")
+
+    def test_normalized_variants_share_cache(self):
+        """Texts that differ only in spacing or quotes hit the same cache entry"""
+        engine = self.make_engine()
+        engine.synth("Welcome to \u2018ODIADEV\u2019.", "naija_female", 1.0, "wav")
+        engine.flush()
+        _, hit, _, _ = engine.synth("Welcome  to 'ODIADEV' .", "naija_female", 1.0, "wav")
+        self.assertTrue(hit)
+        self.assertEqual(engine._tts.calls, ["Welcome to 'ODIADEV'."])
+
+    def test_formats_derived_from_canonical(self):
+        """A second format of the same text is encoded from the canonical PCM, not re-synthesized"""
+        engine = self.make_engine()
+        with patch("server.engine.encode", side_effect=lambda pcm, sr, fmt: b"ENC:" + fmt.encode()) as enc:
+            first, hit, _, _ = engine.synth("One. Two.", "naija_female", 1.0, "mp3")
+            self.assertEqual((first, hit), (b"ENC:mp3", False))
+            engine.flush()
+            second, hit, _, _ = engine.synth("One. Two.", "naija_female", 1.0, "ogg")
+            self.assertEqual((second, hit), (b"ENC:ogg", True))
+            engine.flush()
+            wav, hit, _, _ = engine.synth("One. Two.", "naija_female", 1.0, "wav")
+            self.assertTrue(hit and wav.startswith(b"RIFF"))
+            self.assertEqual(enc.call_count, 2)
+        self.assertEqual(engine._tts.calls, ["One.", "Two."])
+        self.assertEqual(engine.stats()["derived_hits"], 1)
+        self.assertEqual(sorted(n.rsplit(".", 1)[1] for n in engine.cache._index if "/" not in n), ["mp3", "ogg", "wav"])
+
+    def test_warmup_marks_engine_warm(self):
+        """Warm-up runs one throwaway synthesis"""
+        engine = self.make_engine()
+        engine.warmup()
+        self.assertTrue(engine.warm)
+        self.assertEqual(len(engine._tts.calls), 1)
+
+    def test_warmup_loads_configured_voices_within_budget(self):
+        """Warm-up primes each configured voice's model until the RAM budget is full"""
+        config = {"default_voice": "naija_female",
+                  "voices": {"naija_female": {"model": "vctk", "speaker": "p225"},
+                             "naija_male": {"model": "vctk", "speaker": "p226"},
+                             "yoruba": {"model": "yo"}, "igbo": {"model": "ig"}}}
+        loaded = {}
+        engine = self.make_engine()
+        engine._voice_config = config
+        engine._voices = VoiceRegistry(config, engine._model_name, lambda m: loaded.setdefault(m, FakeVCTK()),
+                                       budget_bytes=250, sizer=lambda m: 100)
+        engine.warmup()
+        self.assertEqual(sorted(loaded), ["vctk", "yo"])
+        self.assertEqual(engine.stats()["models"]["evictions"], 0)
+
+    def test_stream_wav_is_one_header_then_pcm(self):
+        """Streaming wav yields a single header followed by each sentence's PCM"""
+        engine = self.make_engine()
+        chunks = list(engine.synth_stream("Hello there. Bye now.", "naija_female", 1.0, "wav"))
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].startswith(b"RIFF"))
+        self.assertFalse(chunks[1].startswith(b"RIFF"))
+        pause = SAMPLE_RATE * SENTENCE_PAUSE_MS // 1000
+        self.assertEqual(len(chunks[1]), (len("Bye now.") * 160 + pause) * 2)
+        self.assertEqual(engine._tts.calls, ["Hello there.", "Bye now."])
+
+    def test_stream_ogg_is_one_logical_stream(self):
+        """Streamed ogg sentences share one encoder, so decoders play past the first sentence"""
+        from server import encoders
+        if encoders.soundfile is None or encoders.STREAM_ENCODERS["ogg"]["backend"] != "soundfile":
+            self.skipTest("no in-process ogg encoder")
+        engine = self.make_engine()
+        data = b"".join(engine.synth_stream("Hello there. Bye now.", "naija_female", 1.0, "ogg"))
+        self.assertEqual(data.count(b"OggS\x00\x02"), 1)  # one beginning-of-stream page
+        decoded, _ = encoders.soundfile.read(io.BytesIO(data))
+        pause = SAMPLE_RATE * SENTENCE_PAUSE_MS // 1000
+        self.assertEqual(len(decoded), (len("Hello there.") + len("Bye now.")) * 160 + pause)
+
+    def test_shared_sentences_reuse_fragments(self):
+        """Prompts sharing a sentence only synthesize the new one"""
+        engine = self.make_engine()
+        _, hit, _, _ = engine.synth("Welcome to ODIADEV. Your code is ABC.", "naija_female", 1.0, "wav")
+        self.assertFalse(hit)
+        engine.flush()
+        _, hit, _, _ = engine.synth("Welcome  to ODIADEV.  Your code is XYZ.", "naija_female", 1.0, "wav")
+        self.assertFalse(hit)
+        engine.flush()
+        self.assertEqual(engine._tts.calls, ["Welcome to ODIADEV.", "Your code is ABC.", "Your code is XYZ."])
+        data, hit, _, _ = engine.synth("Your code is XYZ. Welcome to ODIADEV.", "naija_female", 1.0, "wav")
+        self.assertTrue(hit)
+        self.assertEqual(len(engine._tts.calls), 3)
+        with wave.open(io.BytesIO(data)) as w:
+            pause = SAMPLE_RATE * SENTENCE_PAUSE_MS // 1000
+            self.assertEqual(w.getnframes(), (17 + 19) * 160 + pause)
+        stats = engine.stats()
+        self.assertEqual(stats["fragment_hits"], 3)
+        self.assertEqual(stats["fragment_misses"], 3)
+
+    def test_full_text_hit_served_from_disk(self):
+        """Repeated text comes back byte-identical from the write-behind cache"""
+        engine = self.make_engine()
+        first, hit, _, _ = engine.synth("Hello Lagos.", "naija_female", 1.0, "wav")
+        self.assertFalse(hit)
+        engine.flush()
+        second, hit, _, _ = engine.synth("Hello Lagos.", "naija_female", 1.0, "wav")
+        self.assertTrue(hit)
+        self.assertEqual(first, second)
+        self.assertEqual(engine.stats()["full_hits"], 1)
+
+    def test_concurrent_identical_requests_share_one_synthesis(self):
+        """A burst of identical misses runs the model once; the rest wait on it"""
+        engine = self.make_engine()
+        gate = threading.Event()
+        tts = engine._tts.tts
+        def slow_tts(text, **kwargs):
+            gate.wait(5)
+            return tts(text, **kwargs)
+        with patch.object(engine._tts, "tts", side_effect=slow_tts):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                futures = [pool.submit(engine.synth, "Campaign prompt.", "naija_female", 1.0, "mp3") for _ in range(8)]
+                time.sleep(0.2)
+                gate.set()
+                results = [f.result() for f in futures]
+        self.assertEqual(engine._tts.calls, ["Campaign prompt."])
+        self.assertEqual(len({data for data, _, _, _ in results}), 1)
+        self.assertEqual(sorted(hit for _, hit, _, _ in results), [False] + [True] * 7)
+        self.assertEqual(engine.stats()["coalesced"], 7)
+
+    def test_stretch_mode_derives_speeds_from_one_render(self):
+        """In stretch mode every speed reuses the cached 1.0 render"""
+        engine = self.make_engine()
+        with patch.object(engine_module, "TTS_SPEED_MODE", "stretch"):
+            wav_10 = engine.synth("ABC. XYZ.", None, 1.0, "wav")[0]
+            wav_08 = engine.synth("ABC. XYZ.", None, 0.8, "wav")[0]
+            wav_125 = engine.synth("ABC. XYZ.", None, 1.25, "wav")[0]
+            self.assertEqual(engine._tts.speeds, [1.0, 1.0])
+            self.assertEqual(engine.stats()["stretched_fragments"], 4)
+            # Fragments are 40 and 40 ms plus the pause; each is stretched, the pause is not
+            frames = [wave.open(io.BytesIO(w)).getnframes() for w in (wav_10, wav_08, wav_125)]
+            pause = SENTENCE_PAUSE_MS * SAMPLE_RATE // 1000
+            self.assertEqual(frames[0], 2 * 640 + pause)
+            self.assertEqual(frames[1], 2 * 800 + pause)
+            self.assertEqual(frames[2], 2 * 512 + pause)
+            engine.flush()
+            self.assertTrue(engine.synth("ABC. XYZ.", None, 0.8, "wav")[1])
+        # Model mode does not pick up the stretched variant
+        engine.synth("ABC. XYZ.", None, 0.8, "wav")
+        self.assertEqual(engine._tts.speeds[-2:], [0.8, 0.8])
+
+    def test_speed_is_per_call_on_length_scale_models(self):
+        """VITS-style models get speed through length_scale, per thread, without shared writes"""
+        class Vits:
+            def __init__(self):
+                self.length_scale = 1.0
+
+        class FakeVits(FakeCoqui):
+            def __init__(self, gate):
+                super().__init__()
+                self.synthesizer = type("Synth", (), {"output_sample_rate": SAMPLE_RATE, "tts_model": Vits()})()
+                self.scales, self.gate = [], gate
+
+            def tts(self, text, **kwargs):
+                self.gate.wait()
+                self.scales.append((kwargs.get("speed"), self.synthesizer.tts_model.length_scale))
+                return super().tts(text, **kwargs)
+
+        engine = self.make_engine()
+        engine._tts = FakeVits(threading.Barrier(2))
+        engine_module._per_call_speed(engine._tts.synthesizer.tts_model)
+        model = engine._tts.synthesizer.tts_model
+        self.assertEqual(type(model).__name__, "Vits")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda speed: engine.render("Hello.", speed), [0.5, 1.25]))
+        self.assertEqual(sorted(engine._tts.scales), [(0.5, 2.0), (1.25, 0.8)])
+        self.assertEqual(model.length_scale, 1.0)
+        model.length_scale = 1.1
+        self.assertEqual(model.length_scale, 1.1)
+
+    def test_voices_use_their_model_and_speaker(self):
+        """Each voice renders with its configured model/speaker; speakers share one model"""
+        config = {"voices": {"naija_female": {"model": "vctk", "speaker": "p225"},
+                             "naija_male": {"model": "vctk", "speaker": "p226"},
+                             "yoruba": {"model": "yo"}}}
+        loaded = {}
+        engine = self.make_engine()
+        engine._voice_config = config
+        engine._voices = VoiceRegistry(config, engine._model_name, lambda m: loaded.setdefault(m, FakeVCTK()))
+        engine.synth("Hello.", "naija_female", 1.0, "wav")
+        engine.synth("Hello.", "naija_male", 1.0, "wav")
+        engine.synth("Hello.", "yoruba", 1.0, "wav")
+        self.assertEqual(sorted(loaded), ["vctk", "yo"])
+        self.assertEqual(loaded["vctk"].speaker_calls, ["p225", "p226"])
+        self.assertEqual(loaded["yo"].speaker_calls, ["p225"])
+        engine.flush()
+        self.assertEqual(len(engine.cache.query(model="vctk")), 4)
+        self.assertEqual(engine.stats()["models"]["loads"], 2)
+
+    def test_batches_run_as_wide_as_the_inference_plan(self):
+        """In-process batching runs one batch per concurrent inference slot"""
+        with patch.object(engine_module, "TTS_BATCH_WINDOW_MS", 10):
+            engine = TTSEngine(workers=0, infer_plan=(3, 2))
+            self.addCleanup(engine.flush)
+            self.assertEqual(engine._batcher.concurrency, 3)
+            self.assertEqual(TTSEngine(workers=2)._batcher.concurrency, 2)
+
+    def test_worker_engines_keep_no_audio_cache(self):
+        """Synthesis workers leave the audio cache and its eviction to the API process"""
+        engine = TTSEngine(workers=0, disk_cache=False)
+        self.assertFalse(engine.cache.enabled)
+        if engine_module.TTS_PHONEME_CACHE == "on" and engine_module.TTS_DISK_CACHE != "off":
+            self.assertTrue(engine._phoneme_db().startswith(engine.cache.root))
+
+    def test_broken_worker_pool_is_rebuilt(self):
+        """A dead synthesis worker breaks the executor; it is replaced and the render retried"""
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+
+        class FakeExecutor:
+            def __init__(self, broken):
+                self.broken, self.shut = broken, False
+
+            def submit(self, fn, *args):
+                future = Future()
+                if self.broken:
+                    future.set_exception(BrokenProcessPool("worker died"))
+                else:
+                    future.set_result(([f"pcm:{t}" for t in args[0]], 16000))
+                return future
+
+            def shutdown(self, **kwargs):
+                self.shut = True
+
+        built = [FakeExecutor(broken=True), FakeExecutor(broken=False)]
+        with patch.object(workers_module.SynthesisPool, "_build", side_effect=built):
+            pool = workers_module.SynthesisPool(2)
+            self.assertEqual(pool.render_batch(["Hi."], "naija_male"), ["pcm:Hi."])
+        self.assertTrue(built[0].shut)
+        # The worker's rate for the voice is remembered for the API process
+        self.assertEqual(pool.voice_rate("naija_male"), 16000)
+        self.assertEqual(pool.restarts, 1)
+
+    def test_core_slices_do_not_overlap(self):
+        """Synthesis workers get disjoint core slices covering every core"""
+        with patch.object(os, "sched_getaffinity", return_value=set(range(8)), create=True):
+            self.assertEqual(core_slices(3), [[0, 1, 2], [3, 4, 5], [6, 7]])
+            self.assertEqual(core_slices(1), [list(range(8))])
+        with patch.object(os, "sched_getaffinity", return_value={0, 1}, create=True):
+            self.assertEqual(core_slices(3), [[0], [1], [0]])
+
+if __name__ == '__main__':
+    unittest.main()
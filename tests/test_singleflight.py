@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    """Coalescing of identical in-flight work"""
+
+    def test_concurrent_callers_share_one_run(self):
+        """Callers arriving while the leader runs get its result"""
+        flights = SingleFlight()
+        runs, gate = [], threading.Event()
+        def work():
+            runs.append(1)
+            gate.wait(5)
+            return "audio"
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            futures = [pool.submit(flights.do, "k", work) for _ in range(6)]
+            time.sleep(0.1)
+            gate.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(results), [("audio", False)] + [("audio", True)] * 5)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+        # Once finished, the next call runs again
+        self.assertEqual(flights.do("k", lambda: "again"), ("again", False))
+
+    def test_errors_reach_every_waiter(self):
+        """A failed leader fails its followers too, and the key is released"""
+        flights = SingleFlight()
+        gate = threading.Event()
+        def boom():
+            gate.wait(5)
+            raise RuntimeError("model crashed")
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(flights.do, "k", boom) for _ in range(3)]
+            time.sleep(0.1)
+            gate.set()
+            for f in futures:
+                with self.assertRaises(RuntimeError):
+                    f.result()
+        self.assertEqual(flights.do("k", lambda: 1), (1, False))
+
+    def test_file_lock_serializes_independent_instances(self):
+        """Instances sharing a lock directory (as uvicorn workers do) never overlap"""
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flushed = []
+            a = SingleFlight(lock_dir, before_unlock=flushed.append)
+            b = SingleFlight(lock_dir)
+            active, overlaps = [], []
+            def work(name):
+                active.append(name)
+                if len(active) > 1:
+                    overlaps.append(name)
+                time.sleep(0.1)
+                active.remove(name)
+                return name
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                fa = pool.submit(a.do, "k", lambda: work("a"))
+                fb = pool.submit(b.do, "k", lambda: work("b"))
+                self.assertEqual((fa.result()[0], fb.result()[0]), ("a", "b"))
+            self.assertEqual(overlaps, [])
+            self.assertEqual(flushed, ["k"])
+            self.assertTrue(a.stats()["cross_process"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from server.stretch import QUALITIES, time_stretch
+
+SAMPLE_RATE = 22050
+
+def peak_hz(pcm):
+    return np.fft.rfftfreq(len(pcm), 1 / SAMPLE_RATE)[np.argmax(np.abs(np.fft.rfft(pcm)))]
+
+class TestTimeStretch(unittest.TestCase):
+    """Pitch-preserving time-stretch used to derive speed variants"""
+
+    def setUp(self):
+        t = np.arange(SAMPLE_RATE * 2) / SAMPLE_RATE
+        self.tone = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    def test_length_scales_and_pitch_holds(self):
+        """Output is len/rate samples long at the original pitch and level"""
+        for quality in QUALITIES:
+            for rate in (0.75, 1.25, 1.5):
+                out = time_stretch(self.tone, SAMPLE_RATE, rate, quality)
+                self.assertEqual(out.dtype, np.float32)
+                self.assertEqual(len(out), round(len(self.tone) / rate))
+                self.assertAlmostEqual(peak_hz(out), 220, delta=2)
+                rms = np.sqrt(np.mean(out[2000:-2000] ** 2))
+                self.assertAlmostEqual(rms, 0.5 / np.sqrt(2), delta=0.06)
+
+    def test_identity_and_edge_cases(self):
+        """Rate 1.0 is a no-op; tiny inputs survive; unknown qualities are refused"""
+        self.assertIs(time_stretch(self.tone, SAMPLE_RATE, 1.0), self.tone)
+        self.assertEqual(len(time_stretch(self.tone[:50], SAMPLE_RATE, 1.25, "high")), 40)
+        with self.assertRaises(ValueError):
+            time_stretch(self.tone, SAMPLE_RATE, 1.2, "best")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.voices import VoiceRegistry, load_voice_config, resolve_voice
+
+MB = 1024 * 1024
+
+CONFIG = {
+    "default_voice": "naija_female",
+    "voices": {
+        "naija_female": {"model": "tts_models/en/vctk/vits", "speaker": "p225"},
+        "naija_male": {"model": "tts_models/en/vctk/vits", "speaker": "p226"},
+        "yoruba": {"model": "tts_models/yo/custom/vits"},
+        "hausa": {"model": "tts_models/ha/custom/vits"},
+    },
+}
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+class TestVoiceRegistry(unittest.TestCase):
+    """Voice -> model mapping with on-demand loading and a RAM budget"""
+
+    def make_registry(self, budget_mb=0):
+        self.loads = []
+        def loader(model):
+            self.loads.append(model)
+            return FakeModel(model)
+        return VoiceRegistry(CONFIG, "default/model", loader, budget_bytes=budget_mb * MB, sizer=lambda m: 100 * MB)
+
+    def test_resolution(self):
+        """Configured voices map to model + speaker; others use the default model"""
+        spec = resolve_voice(CONFIG, "naija_male", "default/model")
+        self.assertEqual((spec.model, spec.speaker), ("tts_models/en/vctk/vits", "p226"))
+        self.assertEqual(resolve_voice(CONFIG, None, "default/model").speaker, "p225")
+        self.assertEqual(resolve_voice(CONFIG, "unknown", "default/model").model, "default/model")
+        self.assertEqual(load_voice_config("/nonexistent.json"), {})
+        self.assertIn("naija_female", load_voice_config(os.path.join("voices", "voice_config.json"))["voices"])
+
+    def test_speakers_of_one_model_share_an_instance(self):
+        registry = self.make_registry()
+        with registry.use("naija_female") as (female, _), registry.use("naija_male") as (male, spec):
+            self.assertIs(female, male)
+            self.assertEqual(spec.speaker, "p226")
+        self.assertEqual(self.loads, ["tts_models/en/vctk/vits"])
+
+    def test_idle_models_evicted_lru_under_budget(self):
+        """Past the budget the least recently used idle model goes first"""
+        registry = self.make_registry(budget_mb=250)
+        for voice in ("naija_female", "yoruba"):
+            self.assertTrue(registry.has_room())
+            with registry.use(voice):
+                pass
+        self.assertFalse(registry.has_room())
+        with registry.use("naija_female"):
+            pass
+        with registry.use("hausa"):
+            pass
+        self.assertEqual(sorted(registry.loaded()), ["tts_models/en/vctk/vits", "tts_models/ha/custom/vits"])
+        self.assertEqual(registry.stats()["evictions"], 1)
+        with registry.use("yoruba"):
+            pass
+        self.assertEqual(self.loads.count("tts_models/yo/custom/vits"), 2)
+
+    def test_models_in_use_are_never_evicted(self):
+        registry = self.make_registry(budget_mb=150)
+        with registry.use("yoruba") as (yoruba, _):
+            with registry.use("hausa"):
+                self.assertEqual(len(registry.loaded()), 2)
+            self.assertIs(yoruba.name, "tts_models/yo/custom/vits")
+        self.assertEqual(registry.stats()["resident_mb"], 200.0)
+
+    def test_concurrent_first_use_loads_once(self):
+        registry = self.make_registry()
+        threads = [threading.Thread(target=lambda: registry.use("yoruba").__enter__()) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loads, ["tts_models/yo/custom/vits"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import warm
+from tests.test_server_engine import make_engine
+
+class TestCacheWarming(unittest.TestCase):
+    """Pre-rendering known prompts into the cache"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._tempdir = patch.object(tempfile, "tempdir", self._tmp.name)
+        self._tempdir.start()
+
+    def tearDown(self):
+        self._tempdir.stop()
+        self._tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self._tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_load_phrases_from_script_files(self):
+        """One prompt per line; blanks, comments and repeats are dropped"""
+        self.write("odiadev_a_script.txt", "Welcome to ODIADEV.\n\n# note\nPress one.\n")
+        self.write("odiadev_b_script.txt", "Press one.\nGoodbye.\n")
+        phrases = warm.load_phrases([os.path.join(self._tmp.name, "odiadev_*_script.txt")])
+        self.assertEqual(phrases, ["Welcome to ODIADEV.", "Press one.", "Goodbye."])
+
+    def test_warm_renders_once_then_skips(self):
+        """Every variant is rendered on the first run and reported cached on the next"""
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        report = warm.warm(engine, ["Press one.", "Goodbye."], ["naija_female", "naija_male"], [1.0], ["wav", "mp3"])
+        self.assertEqual((report["total"], report["rendered"], report["cached"], report["failed"]), (8, 8, 0, 0))
+        self.assertGreater(report["audio_ms"], 0)
+        calls = len(engine._tts.calls)
+        report = warm.warm(engine, ["Press one.", "Goodbye."], ["naija_female", "naija_male"], [1.0], ["wav", "mp3"])
+        self.assertEqual((report["rendered"], report["cached"]), (0, 8))
+        self.assertEqual(len(engine._tts.calls), calls)
+
+    def test_cli_writes_report(self):
+        """warm-cache renders the given phrase file and exits 0"""
+        phrases = self.write("prompts.txt", "Press one.\n")
+        out = os.path.join(self._tmp.name, "report.json")
+        engine = make_engine()
+        self.addCleanup(engine.flush)
+        with patch("server.engine.TTSEngine", return_value=engine), patch("builtins.print"):
+            code = warm.main([phrases, "--voice", "naija_female", "--format", "ogg", "--report", out])
+        self.assertEqual(code, 0)
+        with open(out) as f:
+            report = json.load(f)
+        self.assertEqual(report["rendered"], 1)
+        self.assertEqual(report["items"][0]["format"], "ogg")
+
+if __name__ == '__main__':
+    unittest.main()